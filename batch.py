@@ -0,0 +1,186 @@
+import asyncio
+import math
+import os
+import time
+from collections import defaultdict
+from typing import List
+from urllib.parse import urlsplit
+
+import quiz_service
+from database import AsyncSessionLocal
+from llm_governor import LLMOverloaded
+from metrics import stage_timer
+from models import URLRequest
+from near_duplicates import simhash_of
+from quiz_cache import quiz_cache, normalize_url, content_hash, resolved_url_key
+from storage import QuizRecord, save_quizzes
+
+# Batch configuration (override through environment variables)
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "500"))
+BATCH_FETCH_PER_HOST = int(os.getenv("BATCH_FETCH_PER_HOST", "8"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+BATCH_LLM_PER_MINUTE = float(os.getenv("BATCH_LLM_PER_MINUTE", "0"))  # 0 disables rate limiting
+
+# Cache lookups are quick; capping them keeps a large batch from draining the DB pool
+DB_LOOKUP_CONCURRENCY = 4
+
+
+class HostLimiter:
+    """Caps concurrent fetches per host"""
+
+    def __init__(self, per_host: int = BATCH_FETCH_PER_HOST):
+        self.per_host = per_host
+        self._semaphores = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+
+    def __call__(self, url: str) -> asyncio.Semaphore:
+        return self._semaphores[(urlsplit(url).hostname or "").lower()]
+
+
+class RateLimitedPool:
+    """
+    Runs coroutines with at most `concurrency` in flight and, when per_minute
+    is set, starts them no faster than that rate.
+    """
+
+    def __init__(self, concurrency: int = BATCH_LLM_CONCURRENCY, per_minute: float = BATCH_LLM_PER_MINUTE):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_start = 0.0
+
+    async def run(self, fn):
+        async with self._semaphore:
+            if self._interval:
+                # Reserve the next start slot before sleeping, so waiters queue up in order
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + self._interval
+                await asyncio.sleep(start - now)
+            return await fn()
+
+
+class QuizBatch:
+    """
+    Generates quizzes for a list of URLs concurrently.
+
+    Fetches go through the per-host limiter and generations through the
+    shared LLM pool (a map_reduce generation holds one slot for all of its
+    sections); articles repeated within the batch in the same mode are
+    generated once.
+    events() yields per-URL results in completion order. New quizzes are
+    written with a single bulk insert when every URL has finished.
+    """
+
+    def __init__(self, requests: List[URLRequest], hosts: HostLimiter = None, pool: RateLimitedPool = None):
+        self.requests = requests
+        self.hosts = hosts or host_limiter
+        self.pool = pool or llm_pool
+        self._db_slots = asyncio.Semaphore(DB_LOOKUP_CONCURRENCY)
+        self._generations = {}
+        self._records = {}
+        self._generated_keys = []
+
+    async def events(self):
+        """
+        Yields ("result", {...}) or ("error", {...}) per URL, then ("done", summary).
+
+        The batch runs as its own task, so it still finishes and saves its
+        quizzes if the consumer goes away.
+        """
+        queue = asyncio.Queue()
+        runner = asyncio.ensure_future(self._run(queue))
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+        yield "done", await runner
+
+    async def _run(self, queue: asyncio.Queue) -> dict:
+        try:
+            tasks = [asyncio.ensure_future(self._process(i, r)) for i, r in enumerate(self.requests)]
+            failed = 0
+            for next_done in asyncio.as_completed(tasks):
+                event = await next_done
+                failed += event[0] == "error"
+                queue.put_nowait(event)
+            summary = {
+                "total": len(self.requests),
+                "succeeded": len(self.requests) - failed,
+                "failed": failed,
+                "generated": len(self._records),
+                "saved": await self._save(),
+            }
+        finally:
+            queue.put_nowait(None)
+        return summary
+
+    async def _process(self, index: int, request: URLRequest):
+        url = request.url
+        try:
+            url_key = normalize_url(url)
+            if not request.force_refresh:
+                async with self._db_slots, AsyncSessionLocal() as db:
+                    cached_quiz = await quiz_cache.get_by_url(db, url_key)
+                if cached_quiz:
+                    return self._result(index, url, cached_quiz, True)
+
+            async with self.hosts(url):
+                scraped_data = await quiz_service.scrape_flight.do(
+                    url_key, lambda: quiz_service.scrape_wikipedia(url)
+                )
+            digest = content_hash(scraped_data["content"])
+            article_key = resolved_url_key(url_key, scraped_data["title"])
+            if not request.force_refresh:
+                async with self._db_slots, AsyncSessionLocal() as db:
+                    cached_quiz = await quiz_service.find_existing(
+                        db, url_key, article_key, digest, scraped_data["content"]
+                    )
+                if cached_quiz:
+                    return self._result(index, url, cached_quiz, True)
+
+            quiz = await self._generate(digest, scraped_data, request.mode)
+            if digest not in self._records:
+                self._records[digest] = QuizRecord(
+                    url, article_key, digest, scraped_data["title"], scraped_data["content"], quiz
+                )
+            self._generated_keys.append((url_key, digest))
+            return self._result(index, url, quiz, False)
+
+        except ValueError as e:
+            return "error", {"index": index, "url": url, "status": 400, "detail": str(e)}
+        except LLMOverloaded as e:
+            return "error", {
+                "index": index, "url": url, "status": 503, "detail": str(e), "retry_after": math.ceil(e.retry_after)
+            }
+        except Exception as e:
+            return "error", {"index": index, "url": url, "status": 500, "detail": f"Internal server error: {str(e)}"}
+
+    def _generate(self, digest: str, scraped_data: dict, mode: str):
+        task = self._generations.get((mode, digest))
+        if task is None:
+            task = asyncio.ensure_future(self.pool.run(lambda: quiz_service.generate(scraped_data, mode)))
+            self._generations[(mode, digest)] = task
+        return asyncio.shield(task)
+
+    def _result(self, index: int, url: str, quiz, cached: bool):
+        return "result", {"index": index, "url": url, "cached": cached, "quiz": quiz.model_dump()}
+
+    async def _save(self) -> int:
+        if not self._records:
+            return 0
+        records = [
+            record._replace(simhash=await asyncio.to_thread(simhash_of, record.content))
+            for record in self._records.values()
+        ]
+        with stage_timer("db_write"):
+            async with AsyncSessionLocal() as db:
+                saved = await save_quizzes(db, records)
+                await db.commit()
+        for url_key, digest in self._generated_keys:
+            quiz_cache.put(url_key, digest, self._records[digest].quiz)
+        return saved
+
+
+# Shared by every batch, so concurrent batches respect the same limits
+host_limiter = HostLimiter()
+llm_pool = RateLimitedPool()
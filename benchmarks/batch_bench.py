@@ -0,0 +1,97 @@
+"""
+Articles/sec of /generate_quiz/batch at several concurrency levels, against
+sequential /generate_quiz calls.
+
+Pages come from a local StubWikipediaServer (real HTTP, real parsing) and
+quizzes from the fake LLM; every run uses fresh article titles so nothing
+is served from the cache.
+
+    python -m benchmarks.batch_bench --urls 100 --levels 1 4 16 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.common import setup_offline_env, print_table
+
+setup_offline_env()
+os.environ["FETCH_CACHE_DIR"] = ""
+
+import httpx
+
+import batch
+import main
+import quiz_service
+from database import init_db
+from fake_llm import FakeQuizGenerator
+from tests.fakes import StubWikipediaServer
+from fetcher import wikipedia_fetcher
+
+
+def urls_for(run: str, count: int):
+    return [f"https://en.wikipedia.org/wiki/{run}_article_{i}" for i in range(count)]
+
+
+async def run_sequential(client: httpx.AsyncClient, urls) -> int:
+    failed = 0
+    for url in urls:
+        response = await client.post("/generate_quiz", json={"url": url})
+        failed += response.status_code != 200
+    return failed
+
+
+async def run_batch(client: httpx.AsyncClient, urls) -> int:
+    response = await client.post("/generate_quiz/batch", json=[{"url": url} for url in urls])
+    response.raise_for_status()
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    done = events[-1]
+    if done["event"] != "done":
+        raise RuntimeError(f"batch did not finish: {done}")
+    return done["data"]["failed"]
+
+
+async def run(args):
+    await init_db()
+    quiz_service.quiz_generator = FakeQuizGenerator(latency=args.llm_latency)
+
+    rows = []
+    with StubWikipediaServer(latency=args.page_latency) as server:
+        wikipedia_fetcher.origin = server.base_url
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            runs = [("sequential", 1)] if args.sequential else []
+            runs += [("batch", level) for level in args.levels]
+            for mode, level in runs:
+                batch.host_limiter = batch.HostLimiter(per_host=level)
+                batch.llm_pool = batch.RateLimitedPool(concurrency=level, per_minute=args.llm_per_minute)
+                urls = urls_for(f"{mode}_{level}", args.urls)
+                connections_before = server.connections
+
+                started = time.perf_counter()
+                if mode == "sequential":
+                    failed = await run_sequential(client, urls)
+                else:
+                    failed = await run_batch(client, urls)
+                elapsed = time.perf_counter() - started
+
+                rows.append([
+                    mode, level, args.urls, failed,
+                    f"{elapsed:.2f}", f"{args.urls / elapsed:.1f}",
+                    server.connections - connections_before,
+                ])
+        await wikipedia_fetcher.aclose()
+
+    print_table(["mode", "concurrency", "urls", "failed", "seconds", "articles/s", "new connections"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--urls", type=int, default=100)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--page-latency", type=float, default=0.05, help="stub server delay per page (seconds)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM delay per quiz (seconds)")
+    parser.add_argument("--llm-per-minute", type=float, default=0, help="LLM start rate limit, 0 for none")
+    parser.add_argument("--no-sequential", dest="sequential", action="store_false", help="skip the sequential baseline")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,52 @@
+import os
+import resource
+import socket
+import tempfile
+
+
+def setup_offline_env(db_path: str = None) -> str:
+    """
+    Point the app at a throwaway SQLite file and the fake LLM backend.
+
+    Must run before main/database are imported, since both read their
+    configuration at import time.
+    """
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="quizbench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("QUIZ_LLM_BACKEND", "fake")
+    # Every request comes from one address, and stub latencies are scaled
+    # down, so the per-client and LLM quota guards would throttle the
+    # benchmark itself; benchmarks that measure them opt back in
+    for name in ("RATE_LIMIT_GENERATE", "RATE_LIMIT_BATCH", "RATE_LIMIT_JOBS"):
+        os.environ.setdefault(name, "off")
+    for name in ("LLM_MAX_CONCURRENCY", "LLM_TOKENS_PER_MINUTE"):
+        os.environ.setdefault(name, "0")
+    return db_path
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
@@ -0,0 +1,96 @@
+"""
+Concurrent-request throughput of /generate_quiz with /history probes in flight.
+
+The app runs in-process against a fake scraper and LLM. "blocking" mode
+reproduces the previous synchronous clients by sleeping on the event loop
+thread; "async" mode uses the non-blocking request path.
+
+    python -m benchmarks.concurrency_bench --requests 40 --concurrency 20
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+import httpx
+
+import main
+import quiz_service
+from database import init_db
+from fake_llm import FakeQuizGenerator
+
+
+def make_scraper(latency: float, blocking: bool):
+    async def fake_scrape(url: str):
+        if blocking:
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+        title = url.rsplit("/", 1)[-1]
+        return {"title": title, "content": f"{title} article body. " * 50}
+    return fake_scrape
+
+
+async def run_mode(mode: str, args) -> list:
+    blocking = mode == "blocking"
+    quiz_service.scrape_wikipedia = make_scraper(args.scrape_latency, blocking)
+    quiz_service.quiz_generator = FakeQuizGenerator(latency=args.llm_latency, blocking=blocking)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+        history_latencies = []
+        done = asyncio.Event()
+
+        async def generate(i: int):
+            async with semaphore:
+                response = await client.post("/generate_quiz", json={
+                    "url": f"https://en.wikipedia.org/wiki/{mode}_{i}",
+                    "force_refresh": True,
+                })
+                response.raise_for_status()
+
+        async def probe_history():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/history")
+                history_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        prober = asyncio.create_task(probe_history())
+        started = time.perf_counter()
+        await asyncio.gather(*(generate(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    return [
+        mode,
+        args.requests,
+        f"{elapsed:.2f}",
+        f"{args.requests / elapsed:.1f}",
+        f"{percentile(history_latencies, 50) * 1000:.0f}",
+        f"{percentile(history_latencies, 95) * 1000:.0f}",
+    ]
+
+
+async def run(args):
+    # ASGITransport does not run the lifespan hook that creates the schema
+    await init_db()
+    rows = []
+    for mode in args.modes:
+        rows.append(await run_mode(mode, args))
+    print_table(["mode", "requests", "seconds", "req/s", "history p50 ms", "history p95 ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scrape-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--modes", nargs="+", default=["blocking", "async"], choices=["blocking", "async"])
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,129 @@
+"""
+Prompt tokens vs. article coverage: fixed character truncation against
+token-budgeted condensing.
+
+Builds a corpus of synthetic articles whose sections each carry a few key
+facts (a named entity and a year), the material a quiz question is built
+from. Filler prose is drawn from a Zipf-distributed vocabulary with
+section-specific topic words. For each strategy it reports prompt size,
+the share of sections represented and the share of key facts that reach
+the model.
+
+    python -m benchmarks.condense_bench --articles 40 --budgets 500 1000 1500 3000
+"""
+import argparse
+import itertools
+import random
+import time
+
+from benchmarks.common import percentile, print_table
+from condense import SENTENCE_RE, condense, estimate_tokens
+
+LEGACY_SCRAPE_CHARS = 12000
+LEGACY_PROMPT_CHARS = 5000
+
+SYLLABLES = ["ka", "ro", "mi", "te", "su", "la", "ven", "dor", "is", "an", "pre", "tor", "ul", "ex", "qua", "ni"]
+
+
+class Corpus:
+    def __init__(self, seed: int = 11, vocabulary: int = 4000):
+        self.rng = random.Random(seed)
+        self.words = [self._word() for _ in range(vocabulary)]
+        self.cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+
+    def _word(self, low: int = 1, high: int = 4) -> str:
+        return "".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(low, high)))
+
+    def sentence(self, topic: list, fact: str = None) -> str:
+        words = self.rng.choices(self.words, cum_weights=self.cum_weights, k=self.rng.randint(10, 22))
+        for _ in range(self.rng.randint(1, 3)):
+            words[self.rng.randrange(len(words))] = self.rng.choice(topic)
+        if fact:
+            words.insert(self.rng.randrange(1, len(words)), fact)
+        words[0] = words[0].capitalize()
+        return " ".join(words) + "."
+
+    def article(self, sections: int, paragraphs: int):
+        """Returns (sections as the scraper emits them, key facts per section)"""
+        out = []
+        facts = []
+        for s in range(sections):
+            topic = [self._word(2, 3) for _ in range(6)]
+            section_facts = [f"{self._word(2, 3).capitalize()} {self._word(2, 3).capitalize()}" for _ in range(3)]
+            pending = [f"{name} in {self.rng.randint(1400, 2020)}" for name in section_facts]
+            section_paragraphs = []
+            for p in range(paragraphs):
+                sentences = []
+                for _ in range(self.rng.randint(3, 6)):
+                    # Facts cluster in a couple of paragraphs, as in real articles
+                    fact = pending.pop() if pending and p < 2 and self.rng.random() < 0.5 else None
+                    sentences.append(self.sentence(topic, fact))
+                section_paragraphs.append(" ".join(sentences))
+            if pending:
+                section_paragraphs[0] += " " + " ".join(self.sentence(topic, fact) for fact in pending)
+            heading = "" if s == 0 else self._word(2, 3).capitalize()
+            out.append({"heading": heading, "paragraphs": section_paragraphs})
+            facts.append(section_facts)
+        return out, facts
+
+
+def legacy_prompt(sections) -> str:
+    content = " ".join(p for s in sections for p in s["paragraphs"])
+    return content[:LEGACY_SCRAPE_CHARS][:LEGACY_PROMPT_CHARS]
+
+
+def coverage(prompt: str, sections, facts):
+    covered_sections = sum(
+        any(sentence in prompt for p in s["paragraphs"] for sentence in SENTENCE_RE.split(p))
+        for s in sections
+    )
+    all_facts = [f for section_facts in facts for f in section_facts]
+    covered_facts = sum(f in prompt for f in all_facts)
+    quizzable = sum(any(f in prompt for f in section_facts) for section_facts in facts)
+    return covered_sections / len(sections), quizzable / len(sections), covered_facts / len(all_facts)
+
+
+def run(args):
+    corpus = Corpus()
+    shapes = [(4, 3), (10, 5), (25, 6), (40, 8)]
+    articles = [corpus.article(*shapes[i % len(shapes)]) for i in range(args.articles)]
+    full_tokens = [estimate_tokens(" ".join(p for s in a for p in s["paragraphs"])) for a, _ in articles]
+    print(f"Corpus: {len(articles)} articles, median {percentile(full_tokens, 50)} tokens, max {max(full_tokens)} tokens\n")
+
+    strategies = [("truncate 5000 chars", None)] + [(f"condense {b} tokens", b) for b in args.budgets]
+    rows = []
+    for name, budget in strategies:
+        tokens, sections, quizzable, facts, timings = [], [], [], [], []
+        for article_sections, article_facts in articles:
+            started = time.perf_counter()
+            if budget is None:
+                prompt = legacy_prompt(article_sections)
+            else:
+                prompt = condense(article_sections, budget=budget).text
+            timings.append((time.perf_counter() - started) * 1000)
+            tokens.append(estimate_tokens(prompt))
+            s, q, f = coverage(prompt, article_sections, article_facts)
+            sections.append(s)
+            quizzable.append(q)
+            facts.append(f)
+
+        def mean_pct(values):
+            return f"{100 * sum(values) / len(values):.0f}%"
+
+        rows.append([
+            name,
+            f"{sum(tokens) / len(tokens):.0f}",
+            max(tokens),
+            mean_pct(sections),
+            mean_pct(quizzable),
+            mean_pct(facts),
+            f"{percentile(timings, 50):.1f}",
+        ])
+    print_table(["strategy", "mean prompt tokens", "max tokens", "sections seen", "sections with facts", "key facts seen", "p50 ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--articles", type=int, default=40)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[500, 1000, 1500, 3000])
+    run(parser.parse_args())
@@ -0,0 +1,223 @@
+"""
+Duplicate detection: URL keys, content fingerprints and near-duplicate lookups.
+
+1. Spellings of one article URL (mobile host, index.php?title=, ?oldid=,
+   fragments, percent-encoding, lower-case first letter) and how many cache
+   keys they map to, under the previous normalize_url and the current one.
+2. fingerprint() time by article length.
+3. NearDuplicateIndex.find() against --rows stored SimHashes: --articles
+   real articles plus random filler. Queries are copies of stored articles
+   with a share of their words replaced, either scattered at random (the
+   worst case, every edit breaks three shingles) or as one passage (like a
+   rewritten paragraph), unrelated articles, and identical copies on
+   another wiki, which must not match. A copy that is matched is a quiz
+   served without an LLM call. Also the per-request overhead every lookup
+   pays before any candidate is compared: the refresh scan when no quiz
+   was saved since the last lookup, and a lookup from a host with no
+   stored quizzes, which skips fingerprinting.
+
+    python -m benchmarks.dedup_bench --rows 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+from urllib.parse import quote, urlsplit, urlunsplit
+
+import numpy as np
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+from sqlalchemy import insert
+
+from database import AsyncSessionLocal, Quiz, init_db
+from fake_llm import make_fake_quiz
+from tests.fakes import make_article_html
+from near_duplicates import NearDuplicateIndex, fingerprint, simhash_of
+from quiz_cache import content_hash, normalize_url
+from scraper import parse_wikipedia_html
+from storage import QuizRecord, save_quizzes
+
+EDIT_RATES = [0.0, 0.01, 0.02, 0.05, 0.1]
+BATCH = 5000
+
+
+def legacy_normalize_url(url: str) -> str:
+    # normalize_url before Wikipedia URLs were canonicalized
+    parts = urlsplit(url.strip())
+    scheme = "https" if parts.scheme in ("", "http", "https") else parts.scheme.lower()
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, parts.netloc.lower(), path, parts.query, ""))
+
+
+def url_variants(title: str) -> list:
+    path = title.replace(" ", "_")
+    return [
+        f"https://en.wikipedia.org/wiki/{path}",
+        f"http://en.wikipedia.org/wiki/{path}",
+        f"https://en.m.wikipedia.org/wiki/{path}",
+        f"https://en.wikipedia.org/wiki/{path}#History",
+        f"https://en.wikipedia.org/wiki/{path}?oldid=1187654321",
+        f"https://en.wikipedia.org/w/index.php?title={path}&oldid=1187654321",
+        f"https://en.wikipedia.org/wiki/{quote(title)}",
+        f"https://en.wikipedia.org/wiki/{path[0].lower()}{path[1:]}",
+        f"https://www.en.wikipedia.org/wiki/{quote(path, safe='')}",
+    ]
+
+
+def url_rows(titles: list) -> list:
+    rows = []
+    for name, normalize in (("previous", legacy_normalize_url), ("current", normalize_url)):
+        keys = [len({normalize(url) for url in url_variants(title)}) for title in titles]
+        rows.append([name, len(url_variants(titles[0])), f"{sum(keys) / len(keys):.1f}"])
+    return rows
+
+
+def article(title: str, sections: int, seed: int) -> dict:
+    return parse_wikipedia_html(make_article_html(title, sections=sections, seed=seed))
+
+
+def edited(content: str, rate: float, rng: random.Random, passage: bool) -> str:
+    words = content.split(" ")
+    count = int(len(words) * rate)
+    if passage:
+        start = rng.randrange(len(words) - count)
+        positions = range(start, start + count)
+    else:
+        positions = rng.sample(range(len(words)), count)
+    for i in positions:
+        words[i] = "edited"
+    return " ".join(words)
+
+
+def fingerprint_rows(repeat: int) -> list:
+    rows = []
+    for sections in (2, 8, 32):
+        content = article("Timing", sections, seed=sections)["content"]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fingerprint(content)
+            timings.append((time.perf_counter() - started) * 1000)
+        rows.append([len(content.split()), f"{len(content) / 1024:.0f}", f"{percentile(timings, 50):.2f}"])
+    return rows
+
+
+async def seed(articles: list, rows: int):
+    await init_db()
+    records = [
+        QuizRecord(
+            f"https://en.wikipedia.org/wiki/Stored_{i}", f"https://en.wikipedia.org/wiki/Stored_{i}", content_hash(a["content"]),
+            a["title"], a["content"], make_fake_quiz(a["title"]), simhash_of(a["content"]),
+        )
+        for i, a in enumerate(articles)
+    ]
+    async with AsyncSessionLocal() as db:
+        await save_quizzes(db, records)
+        await db.commit()
+    # Filler rows carry a random SimHash and no article, on the same wiki
+    rng = np.random.default_rng(0)
+    for start in range(0, rows - len(articles), BATCH):
+        count = min(BATCH, rows - len(articles) - start)
+        hashes = rng.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max, count, dtype=np.int64)
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(Quiz), [
+                {"url": f"filler_{start + i}", "canonical_url": f"https://en.wikipedia.org/wiki/Filler_{start + i}",
+                 "content_hash": f"filler_{start + i}",
+                 "title": "Filler", "simhash": int(value)}
+                for i, value in enumerate(hashes)
+            ])
+            await db.commit()
+
+
+async def find_rows(index: NearDuplicateIndex, articles: list, unrelated: list) -> list:
+    rng = random.Random(1)
+    rows = []
+    queries = [("identical copy", "en", [a["content"] for a in articles])]
+    for passage in (False, True):
+        for rate in EDIT_RATES[1:]:
+            queries.append((
+                f"{rate:.0%} of words edited, {'one passage' if passage else 'scattered'}", "en",
+                [edited(a["content"], rate, rng, passage) for a in articles],
+            ))
+    queries.append(("unrelated article", "en", [a["content"] for a in unrelated]))
+    queries.append(("identical copy, another wiki", "de", [a["content"] for a in articles]))
+    async with AsyncSessionLocal() as db:
+        for name, language, contents in queries:
+            timings, matched = [], 0
+            for i, content in enumerate(contents):
+                url_key = f"https://{language}.wikipedia.org/wiki/Query_{i}"
+                started = time.perf_counter()
+                matched += await index.find(db, content, url_key) is not None
+                timings.append((time.perf_counter() - started) * 1000)
+            rows.append([name, len(contents), f"{matched / len(contents):.0%}",
+                         f"{percentile(timings, 50):.1f}", f"{percentile(timings, 95):.1f}"])
+    return rows
+
+
+async def overhead_rows(index: NearDuplicateIndex, repeat: int) -> list:
+    rows = []
+    async with AsyncSessionLocal() as db:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await index.refresh(db)
+            timings.append((time.perf_counter() - started) * 1000)
+        rows.append(["refresh, nothing new", f"{percentile(timings, 50):.2f}", f"{percentile(timings, 95):.2f}"])
+        timings = []
+        for i in range(repeat):
+            started = time.perf_counter()
+            await index.find(db, "", f"https://fr.wikipedia.org/wiki/Query_{i}")
+            timings.append((time.perf_counter() - started) * 1000)
+        rows.append(["find, host with no quizzes", f"{percentile(timings, 50):.2f}", f"{percentile(timings, 95):.2f}"])
+    return rows
+
+
+def scan_ms(index: NearDuplicateIndex, repeat: int) -> float:
+    timings = []
+    for value in np.random.default_rng(2).integers(0, 2**63, repeat):
+        started = time.perf_counter()
+        index.candidates(int(value))
+        timings.append((time.perf_counter() - started) * 1000)
+    return percentile(timings, 50)
+
+
+async def run(args):
+    titles = [f"Article {i} (topic)" for i in range(args.articles)]
+    articles = [article(title, args.sections, seed=i) for i, title in enumerate(titles)]
+    unrelated = [article(f"Other {i}", args.sections, seed=10_000 + i) for i in range(args.articles)]
+
+    print_table(["normalize_url", "spellings per article", "cache keys per article"], url_rows(titles))
+    print()
+    print_table(["article words", "article KB", "fingerprint p50 ms"], fingerprint_rows(args.repeat))
+    print()
+
+    started = time.perf_counter()
+    await seed(articles, args.rows)
+    print(f"Seeded {args.rows} quizzes in {time.perf_counter() - started:.1f}s")
+    index = NearDuplicateIndex()
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await index.refresh(db)
+    print(f"Loaded {len(index)} SimHashes in {(time.perf_counter() - started) * 1000:.0f} ms; "
+          f"candidate scan p50 {scan_ms(index, args.repeat):.2f} ms")
+    print()
+    print_table(["overhead per lookup", "p50 ms", "p95 ms"], await overhead_rows(index, args.repeat))
+    print()
+    print_table(["query", "queries", "matched", "find p50 ms", "find p95 ms"], await find_rows(index, articles, unrelated))
+    print(f"Candidates compared: {index.stats['candidates']}, matches: {index.stats['matches']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="SimHashes in the index")
+    parser.add_argument("--articles", type=int, default=100, help="real articles stored, and queries per row")
+    parser.add_argument("--sections", type=int, default=8, help="article length in sections")
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Offline dump store: ingestion throughput and memory, and lookup latency.
+
+Writes synthetic MediaWiki XML dumps (bz2, pages-articles format) of two
+sizes and ingests each in a forked child, so peak RSS is measured in
+isolation and can be compared across sizes: streaming keeps it flat. Then
+times title lookups in the larger store (hits, redirects, misses) and
+scrape_wikipedia served from the store against the same articles fetched
+over HTTP from a local StubWikipediaServer and parsed.
+
+    python -m benchmarks.dump_bench --articles 500 2000 --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+os.environ["FETCH_CACHE_DIR"] = ""
+
+import ingest_dump
+import scraper
+from dump_store import DumpStore
+from tests.fakes import StubWikipediaServer, write_xml_dump
+from fetcher import wikipedia_fetcher
+
+
+def ingest_child(dump_path: str, store_path: str, workers: int, results):
+    logging.getLogger("scraper").setLevel(logging.ERROR)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    counts = ingest_dump.ingest(dump_path, store_path, workers=workers, progress_every=0)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put(dict(counts, peak_mb=(peak_kb - baseline_kb) / 1024))
+
+
+def ingest_isolated(dump_path: str, store_path: str, workers: int) -> dict:
+    results = multiprocessing.Queue()
+    child = multiprocessing.Process(target=ingest_child, args=(dump_path, store_path, workers, results))
+    child.start()
+    counts = results.get()
+    child.join()
+    return counts
+
+
+def time_lookups(store: DumpStore, titles: list) -> list:
+    timings = []
+    for title in titles:
+        started = time.perf_counter()
+        store.get(title)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return timings
+
+
+async def compare_sources(urls: list) -> list:
+    rows = []
+    for source in ("web", "dump"):
+        scraper.CONTENT_SOURCE = source
+        timings = []
+        for url in urls:
+            started = time.perf_counter()
+            await scraper.scrape_wikipedia(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        rows.append([
+            source, len(urls), f"{sum(timings) / len(timings):.2f}",
+            f"{percentile(timings, 50):.2f}", f"{percentile(timings, 99):.2f}",
+        ])
+    await wikipedia_fetcher.aclose()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--articles", type=int, nargs="+", default=[500, 2000], help="dump sizes to ingest")
+    parser.add_argument("--workers", type=int, default=1, help="ingest_dump.py --workers")
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--scrapes", type=int, default=100)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="dumpbench-")
+    rows = []
+    for size in args.articles:
+        dump_path = os.path.join(work_dir, f"enwiki-{size}.xml.bz2")
+        pages = write_xml_dump(dump_path, size)
+        dump_mb = os.path.getsize(dump_path) / 2**20
+        store_path = os.path.join(work_dir, f"store-{size}")
+        counts = ingest_isolated(dump_path, store_path, args.workers)
+        total = sum(pages.values())
+        rows.append([
+            size, total, f"{dump_mb:.1f}", f"{counts['seconds']:.1f}", f"{total / counts['seconds']:.0f}",
+            f"{dump_mb / counts['seconds']:.2f}", f"{counts['bytes'] / 2**20:.1f}", f"{counts['peak_mb']:.1f}",
+        ])
+    print(f"Ingestion ({args.workers} worker{'s' if args.workers > 1 else ''})")
+    print_table(
+        ["articles", "pages", "dump MB (bz2)", "seconds", "pages/s", "dump MB/s", "store MB", "peak MB"],
+        rows,
+    )
+
+    size = args.articles[-1]
+    store = DumpStore(os.path.join(work_dir, f"store-{size}"))
+    rng = random.Random(0)
+    lookups = {
+        "hit": [f"Article {rng.randrange(size)}" for _ in range(args.lookups)],
+        # "Art <n>" redirects exist for every tenth article
+        "redirect": [f"Art {10 * rng.randrange((size + 9) // 10)}" for _ in range(args.lookups)],
+        "miss": [f"Missing {i}" for i in range(args.lookups)],
+    }
+    store.get(lookups["hit"][0])  # map the files before timing
+    rows = []
+    for name, titles in lookups.items():
+        timings = time_lookups(store, titles)
+        rows.append([name, len(titles), f"{percentile(timings, 50):.1f}", f"{percentile(timings, 99):.1f}"])
+    print(f"\nLookups in the {size}-article store")
+    print_table(["lookup", "count", "p50 us", "p99 us"], rows)
+
+    urls = [f"https://en.wikipedia.org/wiki/Article_{rng.randrange(size)}" for _ in range(args.scrapes)]
+    scraper.dump_store = store
+    with StubWikipediaServer() as server:
+        wikipedia_fetcher.origin = server.base_url
+        rows = asyncio.run(compare_sources(urls))
+    print("\nscrape_wikipedia per article (web: local stub server over HTTP, then parse)")
+    print_table(["CONTENT_SOURCE", "articles", "mean ms", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+/history query cost at scale: legacy full-table load vs projected keyset pages.
+
+Seeds a SQLite database with --rows quizzes (each carrying --payload-kb of
+scraped_content and quiz JSON), then times each query shape in a forked
+child so peak RSS is measured per query.
+
+    python -m benchmarks.history_bench --rows 500000 --payload-kb 2
+"""
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import setup_offline_env, print_table
+
+setup_offline_env()
+
+from sqlalchemy import insert, select
+
+from database import AsyncSessionLocal, Base, Quiz, engine
+from history import fetch_history_page, encode_cursor
+from models import QuizHistoryItem
+
+
+def seed(rows: int, payload_kb: float):
+    payload = "x" * int(payload_kb * 1024 / 2)
+    start = datetime(2020, 1, 1)
+    batch = []
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                "url": f"https://en.wikipedia.org/wiki/Article_{i}",
+                "title": f"Article {i:07d}",
+                # Several quizzes share a timestamp, exercising the id tiebreak
+                "date_generated": start + timedelta(seconds=i // 3),
+                "scraped_content": payload,
+                "full_quiz_data": payload,
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(Quiz), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Quiz), batch)
+
+
+async def legacy_full_load():
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Quiz).order_by(Quiz.date_generated.desc()))
+        return [QuizHistoryItem.model_validate(q) for q in result.scalars().all()]
+
+
+async def page(cursor=None, title_prefix=None):
+    async with AsyncSessionLocal() as db:
+        items, _ = await fetch_history_page(db, 50, cursor, title_prefix)
+        return items
+
+
+async def deep_cursor(rows: int) -> str:
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(Quiz.id, Quiz.date_generated)
+            .order_by(Quiz.date_generated.desc(), Quiz.id.desc())
+            .offset(rows * 9 // 10).limit(1)
+        )).first()
+    return encode_cursor(row.date_generated, row.id)
+
+
+def measure(name: str, rows: int, repeat: int, results):
+    async def run():
+        cursor = await deep_cursor(rows) if name == "deep page (90%)" else None
+        scenarios = {
+            "legacy full load": legacy_full_load,
+            "first page": page,
+            "deep page (90%)": lambda: page(cursor),
+            "title prefix": lambda: page(title_prefix="Article 00042"),
+        }
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            items = await scenarios[name]()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings, len(items)
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings, count = asyncio.run(run())
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((name, sorted(timings)[len(timings) // 2], count, (peak_kb - baseline_kb) / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--payload-kb", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.rows, args.payload_kb)
+    print(f"Seeded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    context = multiprocessing.get_context("fork")
+    rows = []
+    for name in ["legacy full load", "first page", "deep page (90%)", "title prefix"]:
+        queue = context.Queue()
+        child = context.Process(target=measure, args=(name, args.rows, args.repeat, queue))
+        child.start()
+        name, median_ms, count, peak_mb = queue.get()
+        child.join()
+        rows.append([name, count, f"{median_ms:.1f}", f"{peak_mb:.1f}"])
+    print_table(["query", "rows returned", "median ms", "peak RSS MB"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Cost of the metrics and logging instrumentation: per operation and end to end.
+
+The first table times each instrument on its own (ns/op) with metrics on and
+off, next to the logging calls the pipeline makes and the print() they
+replaced. The second runs whole /generate_quiz requests in-process -- real
+scraper on generated Wikipedia pages, LLMQuizGenerator on a zero-latency
+StubGeminiModel, SQLite writes -- so that the pipeline's own CPU work, not
+LLM latency, is what the instrumentation is compared against.
+
+    python -m benchmarks.instrumentation_bench --requests 200 --rounds 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import sys
+import time
+import timeit
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+import httpx
+
+import main
+import metrics
+import quiz_service
+from database import init_db
+from tests.fakes import StubGeminiModel, make_article_html
+from fetcher import wikipedia_fetcher
+from llm_quiz_generator_simple import LLMQuizGenerator
+from logging_config import configure_logging
+
+LOG_VARIANTS = [
+    # label, level, format, sample rate
+    ("WARNING", "WARNING", "text", 1.0),
+    ("INFO", "INFO", "text", 1.0),
+    ("INFO json", "INFO", "json", 1.0),
+    ("DEBUG", "DEBUG", "text", 1.0),
+    ("DEBUG sampled 10%", "DEBUG", "text", 0.1),
+]
+
+
+@contextlib.contextmanager
+def quiet_logging(level: str, fmt: str = "text", sample_rate: float = 1.0):
+    # The handler binds sys.stderr when it is created, so point that at /dev/null first
+    with open(os.devnull, "w") as devnull:
+        stderr, sys.stderr = sys.stderr, devnull
+        try:
+            configure_logging(level, fmt, sample_rate)
+        finally:
+            sys.stderr = stderr
+        try:
+            yield
+        finally:
+            configure_logging("WARNING")
+
+
+def ns_per_op(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e9
+
+
+def micro(args):
+    histogram = metrics.Histogram("bench_seconds", "benchmark only", ("stage",))
+    counter = metrics.Counter("bench_total", "benchmark only", ("key", "result"))
+    logger = logging.getLogger("bench")
+    message = "Quiz for %s: %d questions in %.2fs"
+
+    def timer():
+        with metrics.stage_timer("bench"):
+            pass
+
+    rows = []
+    cases = [
+        ("stage_timer", timer),
+        ("Histogram.observe", lambda: histogram.observe(0.0123, stage="llm")),
+        ("Counter.inc", lambda: counter.inc(key="url", result="miss")),
+    ]
+    for name, stmt in cases:
+        timings = []
+        for enabled in (True, False):
+            metrics.METRICS_ENABLED = enabled
+            timings.append(ns_per_op(stmt, args.number))
+        metrics.METRICS_ENABLED = True
+        rows.append([name, f"{timings[0]:.0f}", f"{timings[1]:.0f}"])
+
+    sink = io.StringIO()
+    rows.append(["print (replaced)", f"{ns_per_op(lambda: print(message % ('Cat', 10, 1.5), file=sink), args.number):.0f}", "-"])
+    sink.truncate(0)
+    with quiet_logging("INFO"):
+        rows.append(["logger.debug at INFO", f"{ns_per_op(lambda: logger.debug(message, 'Cat', 10, 1.5), args.number):.0f}", "-"])
+        rows.append(["logger.info", f"{ns_per_op(lambda: logger.info(message, 'Cat', 10, 1.5), args.number):.0f}", "-"])
+    with quiet_logging("INFO", "json"):
+        rows.append(["logger.info json", f"{ns_per_op(lambda: logger.info(message, 'Cat', 10, 1.5), args.number):.0f}", "-"])
+    with quiet_logging("INFO", sample_rate=0.1):
+        rows.append(["logger.info sampled 10%", f"{ns_per_op(lambda: logger.info(message, 'Cat', 10, 1.5), args.number):.0f}", "-"])
+
+    print_table(["operation", "ns/op (metrics on)", "ns/op (metrics off)"], rows)
+    stage_timer_ns = float(rows[0][1])
+
+    # Scrape cost at a realistic series count
+    for stage in ("fetch", "parse", "cleanup", "prompt_build", "llm", "json_parse", "validate", "db_read", "db_write"):
+        histogram.observe(0.01, stage=stage)
+    started = time.perf_counter()
+    body = metrics.render_prometheus()
+    print(f"\nrender_prometheus: {(time.perf_counter() - started) * 1000:.2f} ms, "
+          f"{len(body.splitlines())} lines, {len(body) / 1024:.1f} KiB")
+    return stage_timer_ns
+
+
+def instrument_calls() -> float:
+    calls = 0
+    for metric in metrics._registry:
+        if isinstance(metric, metrics.Histogram):
+            calls += sum(series["count"] for series in metric.snapshot().values())
+        elif isinstance(metric, metrics.Counter):
+            calls += sum(metric.snapshot().values())
+    return calls
+
+
+async def end_to_end(args, stage_timer_ns: float):
+    await init_db()
+    pages = [make_article_html(f"Article {i}", 10, 5, seed=i) for i in range(20)]
+
+    async def fetch(url: str):
+        # A sentence naming the URL keeps the content hash unique per request
+        page = pages[hash(url) % len(pages)]
+        return page.replace("<p>", f"<p>This copy was fetched from {url}. ", 1)
+
+    wikipedia_fetcher.fetch = fetch
+    quiz_service.quiz_generator = LLMQuizGenerator(model=StubGeminiModel(time_scale=0.0))
+    counter = 0
+
+    async def run(client) -> tuple:
+        nonlocal counter
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def one():
+            nonlocal counter
+            counter += 1
+            # A fresh URL, and so fresh article text, every time: nothing is served from cache
+            url = f"https://en.wikipedia.org/wiki/Bench_{counter}"
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/generate_quiz", json={"url": url})
+                latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        return args.requests / (time.perf_counter() - started), latencies
+
+    variants = [("metrics off", False, LOG_VARIANTS[0])] + [
+        (f"metrics on, {variant[0]}", True, variant) for variant in LOG_VARIANTS
+    ]
+    results = {name: ([], []) for name, _, _ in variants}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        with quiet_logging("WARNING"):
+            await run(client)  # warm-up
+        metrics.reset()
+        # Interleave the variants across rounds so drift hits all of them alike
+        for _ in range(args.rounds):
+            for name, enabled, (_, level, fmt, sample_rate) in variants:
+                metrics.METRICS_ENABLED = enabled
+                with quiet_logging(level, fmt, sample_rate):
+                    throughput, latencies = await run(client)
+                results[name][0].append(throughput)
+                results[name][1].extend(latencies)
+    metrics.METRICS_ENABLED = True
+
+    baseline = max(results["metrics off"][0])
+    rows = []
+    for name, (throughputs, latencies) in results.items():
+        best = max(throughputs)
+        rows.append([
+            name, f"{best:.1f}", f"{100 * (baseline - best) / baseline:+.1f}%",
+            f"{percentile(latencies, 50):.1f}", f"{percentile(latencies, 95):.1f}",
+        ])
+    print()
+    print_table(["configuration", "req/s (best round)", "overhead", "p50 ms", "p95 ms"], rows)
+
+    # Differences under a few percent drown in run-to-run noise, so also bound
+    # the cost from the instrument calls each request actually made
+    per_request = instrument_calls() / (args.rounds * args.requests * len(LOG_VARIANTS))
+    cost_ms = per_request * stage_timer_ns / 1e6
+    print(f"\n{per_request:.1f} instrument calls/request ~ {cost_ms:.3f} ms at the stage_timer cost, "
+          f"{100 * cost_ms * baseline / 1000:.2f}% of the {1000 / baseline:.1f} ms of work per request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=100_000, help="calls per microbenchmark repeat")
+    parser.add_argument("--requests", type=int, default=200, help="requests per configuration and round")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(end_to_end(args, micro(args)))
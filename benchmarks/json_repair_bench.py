@@ -0,0 +1,137 @@
+"""
+Malformed LLM responses: strict parsing with full retries against local
+repair plus targeted follow-up calls.
+
+Part 1 runs the malformed-response corpus (tests.fakes.MALFORMED_DEFECTS) through
+the old strict parse and through repair_json + salvage_quiz. Part 2 drives
+the real LLMQuizGenerator against StubGeminiModel with a share of
+responses corrupted. It reports LLM calls, output tokens and latency per
+quiz against the old behaviour of retrying the whole request until a
+response parses.
+
+    python -m benchmarks.json_repair_bench --quizzes 200 --defect-rates 0.1 0.3
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+from tests.fakes import StubGeminiModel, malformed_corpus
+from llm_quiz_generator_simple import LLMQuizGenerator
+from models import QuizOutput
+from quiz_repair import repair_json, salvage_quiz
+
+CONTENT = " ".join(
+    f"The river system of the northern province was surveyed in {1800 + i} by the royal survey office."
+    for i in range(40)
+)
+
+
+def strict_parse(text: str) -> QuizOutput:
+    """What generate_quiz used to do with a response"""
+    data = json.loads(text.replace("```json", "").replace("```", "").strip())
+    for field in ("title", "summary", "key_entities", "related_topics", "questions"):
+        if field not in data:
+            raise ValueError(f"Missing required field: {field}")
+    return QuizOutput(**data)
+
+
+def corpus_table(num_quizzes: int):
+    stats = defaultdict(lambda: defaultdict(float))
+    for defect, quiz, text in malformed_corpus(num_quizzes):
+        row = stats[defect]
+        row["n"] += 1
+        try:
+            strict_parse(text)
+            row["strict"] += 1
+        except Exception:
+            pass
+        started = time.perf_counter()
+        try:
+            salvaged = salvage_quiz(repair_json(text)[0], quiz["title"])
+        except ValueError:
+            continue
+        row["us"] += (time.perf_counter() - started) * 1e6
+        row["parsed"] += 1
+        row["complete"] += not salvaged.missing
+        row["questions"] += len(salvaged.data["questions"]) / len(quiz["questions"])
+
+    rows = []
+    for defect, row in sorted(stats.items()):
+        n = row["n"]
+        rows.append([
+            defect,
+            f"{100 * row['strict'] / n:.0f}%",
+            f"{100 * row['parsed'] / n:.0f}%",
+            f"{100 * row['complete'] / n:.0f}%",
+            f"{100 * (row['parsed'] - row['complete']) / n:.0f}%",
+            f"{100 * row['questions'] / n:.0f}%",
+            f"{row['us'] / max(row['parsed'], 1):.0f}",
+        ])
+    print_table(["defect", "strict parse", "repaired", "complete locally", "needs follow-up", "questions kept", "repair us"], rows)
+
+
+async def strict_generate(model: StubGeminiModel, generator: LLMQuizGenerator, max_attempts: int) -> bool:
+    prompt = generator.build_prompt("River survey", CONTENT)
+    for _ in range(max_attempts):
+        response = await model.generate_content_async(prompt)
+        try:
+            strict_parse(response.text)
+            return True
+        except Exception:
+            continue
+    return False
+
+
+async def end_to_end(args):
+    rows = []
+    for rate in args.defect_rates:
+        for path in ("strict + retry", "repair + follow-up"):
+            model = StubGeminiModel(time_scale=args.time_scale, defect_rate=rate, seed=1)
+            generator = LLMQuizGenerator(model=model)
+            timings = []
+            succeeded = 0
+            for _ in range(args.quizzes):
+                started = time.perf_counter()
+                if path == "strict + retry":
+                    succeeded += await strict_generate(model, generator, args.max_attempts)
+                else:
+                    try:
+                        await generator.generate_quiz("River survey", CONTENT)
+                        succeeded += 1
+                    except Exception:
+                        pass
+                timings.append((time.perf_counter() - started) / args.time_scale)
+            stats = generator.repair_stats
+            rows.append([
+                f"{rate:.0%}", path,
+                f"{100 * succeeded / args.quizzes:.1f}%",
+                f"{model.calls / args.quizzes:.2f}",
+                model.output_tokens // args.quizzes,
+                f"{percentile(timings, 50):.2f}", f"{percentile(timings, 95):.2f}",
+                stats["repaired"] if path != "strict + retry" else "-",
+                stats["followups"] if path != "strict + retry" else "-",
+                stats["full_retries"] if path != "strict + retry" else "-",
+            ])
+    print_table(
+        ["defect rate", "path", "success", "LLM calls/quiz", "output tokens/quiz", "p50 s", "p95 s", "repaired", "follow-ups", "full retries"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus-quizzes", type=int, default=50)
+    parser.add_argument("--quizzes", type=int, default=200)
+    parser.add_argument("--defect-rates", type=float, nargs="+", default=[0.1, 0.3])
+    parser.add_argument("--max-attempts", type=int, default=3, help="strict path: whole-request attempts")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="shrink the stub's latency by this factor")
+    args = parser.parse_args()
+    corpus_table(args.corpus_quizzes)
+    print()
+    asyncio.run(end_to_end(args))
@@ -0,0 +1,374 @@
+"""
+End-to-end load test of the API server: latency percentiles, throughput and RSS per endpoint.
+
+Runs uvicorn on main:app in a child process with the fake LLM backend
+(--llm-latency, --questions) and fetches articles from a StubWikipediaServer
+in another process. The database is a seeded SQLite file, or --database-url
+(e.g. PostgreSQL). Each scenario runs at each --levels concurrency against a
+fresh server, --repeats times: that many clients send requests back to back
+for --duration seconds after --warmup, each picking an endpoint by the
+scenario's weights:
+
+    generate_hit   POST /generate_quiz for a stored article (cache path)
+    generate_miss  POST /generate_quiz for a new article (fetch, parse, LLM, save)
+    history        GET /history, first page
+    quiz           GET /quiz/{id} of a stored quiz
+
+Server RSS is sampled from /proc while it runs, so this needs Linux. Each
+figure is the median over the repeats, saved with its spread (max - min
+over median). The load generator, server and fixture share the machine, so
+compare runs from the same box only. --output saves the results as JSON.
+--compare reports every latency, throughput or RSS figure that is worse
+than a saved run by more than --threshold, or by more than that figure's
+spread in the saved run if larger. It exits with status 1 if there is one.
+
+    python -m benchmarks.load_bench --output baseline.json
+    python -m benchmarks.load_bench --output new.json --compare baseline.json
+    python -m benchmarks.load_bench --current new.json --compare baseline.json  # compare saved runs only
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.common import setup_offline_env, free_port, percentile, print_table
+
+db_path = setup_offline_env()
+
+from fake_llm import make_fake_quiz
+from tests.fakes import StubWikipediaServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "mixed": {"generate_hit": 4, "generate_miss": 1, "history": 3, "quiz": 4},
+    "generate_hit": {"generate_hit": 1},
+    "generate_miss": {"generate_miss": 1},
+    "history": {"history": 1},
+    "quiz": {"quiz": 1},
+}
+# Figures checked by --compare, and whether a higher value is worse
+COMPARED = {"p50_ms": True, "p95_ms": True, "p99_ms": True, "throughput_rps": False, "rss_peak_mb": True}
+# A tail percentile is only compared when each repeat had this many samples
+# beyond it; with fewer, p99 is little more than the slowest request
+TAIL_SAMPLES = 10
+# Stored quizzes that generate_hit and quiz requests pick from
+TARGETS = 1000
+SEED_BATCH = 1000
+RSS_INTERVAL = 0.1
+
+
+class Targets:
+    def __init__(self, urls: list, ids: list, token: str):
+        self.urls = urls
+        self.ids = ids
+        self.token = token                 # keeps generate_miss articles new across runs
+        self.misses = itertools.count()
+
+
+async def prepare(count: int, questions: int) -> Targets:
+    """Seed count quizzes and sample the stored ones requests will ask for"""
+    # DATABASE_URL is read at import time, after main() has settled it
+    from sqlalchemy import func, select
+
+    from database import AsyncSessionLocal, Quiz, async_engine, init_db
+    from quiz_cache import content_hash, normalize_url
+    from storage import QuizRecord, save_quizzes
+
+    token = f"{time.time_ns():x}"
+    await init_db()
+    for start in range(0, count, SEED_BATCH):
+        records = []
+        for i in range(start, min(count, start + SEED_BATCH)):
+            url = f"https://en.wikipedia.org/wiki/Seeded_{token}_{i}"
+            title = f"Seeded {token} {i}"
+            content = f"{title} article body. " * 50
+            records.append(QuizRecord(
+                url, normalize_url(url), content_hash(content), title, content, make_fake_quiz(title, questions),
+            ))
+        async with AsyncSessionLocal() as db:
+            await save_quizzes(db, records)
+            await db.commit()
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(Quiz.id, Quiz.url).order_by(func.random()).limit(TARGETS))).all()
+    await async_engine.dispose()
+    if not rows:
+        raise ValueError("The database holds no quizzes; seed some with --seed")
+    return Targets([row.url for row in rows], [row.id for row in rows], token)
+
+
+def serve_fixture(port: int, latency: float, stop):
+    with StubWikipediaServer(latency=latency, port=port):
+        stop.wait()
+
+
+def start_server(args, database_url: str, fixture_port: int):
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        QUIZ_LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY=str(args.llm_latency),
+        FAKE_LLM_QUESTIONS=str(args.questions),
+        WIKIPEDIA_ORIGIN=f"http://127.0.0.1:{fixture_port}",
+        FETCH_CACHE_DIR="",
+        MODEL_CACHE_PATH="",
+        LOG_LEVEL="WARNING",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    started = time.perf_counter()
+    while time.perf_counter() - started < 60:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return server, f"http://127.0.0.1:{port}"
+        except httpx.TransportError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with status {server.returncode}")
+        time.sleep(0.05)
+    server.terminate()
+    raise RuntimeError("server did not answer in time")
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, rng: random.Random, targets: Targets) -> httpx.Response:
+    if endpoint == "generate_hit":
+        return await client.post("/generate_quiz", json={"url": rng.choice(targets.urls)})
+    if endpoint == "generate_miss":
+        url = f"https://en.wikipedia.org/wiki/Load_{targets.token}_{next(targets.misses)}"
+        return await client.post("/generate_quiz", json={"url": url})
+    if endpoint == "history":
+        return await client.get("/history", params={"limit": 20})
+    return await client.get(f"/quiz/{rng.choice(targets.ids)}")
+
+
+async def drive(base_url: str, pid: int, weights: dict, concurrency: int, targets: Targets, args) -> list:
+    """Closed-loop clients for warmup + duration; statistics cover requests started after warmup"""
+    names, shares = list(weights), list(weights.values())
+    latencies, errors = defaultdict(list), defaultdict(int)
+    rss_samples = []
+    measure_from = time.perf_counter() + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def client_loop(client: httpx.AsyncClient, number: int):
+        rng = random.Random(number)
+        while time.perf_counter() < stop_at:
+            endpoint = rng.choices(names, shares)[0]
+            started = time.perf_counter()
+            try:
+                ok = (await send(client, endpoint, rng, targets)).status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if started >= measure_from:
+                if ok:
+                    latencies[endpoint].append((time.perf_counter() - started) * 1000)
+                else:
+                    errors[endpoint] += 1
+
+    async def sample_rss():
+        while time.perf_counter() < stop_at:
+            if time.perf_counter() >= measure_from:
+                rss_samples.append(rss_mb(pid))
+            await asyncio.sleep(RSS_INTERVAL)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        await asyncio.gather(sample_rss(), *(client_loop(client, n) for n in range(concurrency)))
+
+    rss_peak = round(max(rss_samples, default=0.0), 1)
+    everything = [latency for endpoint in names for latency in latencies[endpoint]]
+    rows = []
+    for endpoint, values in [(name, latencies[name]) for name in names] + ([("all", everything)] if len(names) > 1 else []):
+        failed = sum(errors.values()) if endpoint == "all" else errors[endpoint]
+        rows.append({
+            "endpoint": endpoint,
+            "requests": len(values),
+            "errors": failed,
+            "throughput_rps": round(len(values) / args.duration, 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "rss_peak_mb": rss_peak,
+        })
+    return rows
+
+
+def combine(scenario: str, concurrency: int, repeats: list) -> list:
+    """One row per endpoint: request counts summed over repeats, figures their median"""
+    rows = []
+    for measured in zip(*repeats):
+        row = {
+            "scenario": scenario,
+            "concurrency": concurrency,
+            "endpoint": measured[0]["endpoint"],
+            "requests": sum(r["requests"] for r in measured),
+            "errors": sum(r["errors"] for r in measured),
+            "spread": {},
+        }
+        for metric in COMPARED:
+            values = [r[metric] for r in measured]
+            row[metric] = round(statistics.median(values), 2)
+            row["spread"][metric] = round((max(values) - min(values)) / row[metric], 3) if row[metric] else 0.0
+        rows.append(row)
+    return rows
+
+
+def run(args, database_url: str) -> dict:
+    targets = asyncio.run(prepare(args.seed, args.questions))
+    fixture_port = free_port()
+    stop = multiprocessing.Event()
+    fixture = multiprocessing.Process(target=serve_fixture, args=(fixture_port, args.page_latency, stop), daemon=True)
+    fixture.start()
+    results = []
+    try:
+        for scenario in args.scenarios:
+            for concurrency in args.levels:
+                repeats = []
+                for _ in range(args.repeats):
+                    server, base_url = start_server(args, database_url, fixture_port)
+                    try:
+                        repeats.append(asyncio.run(drive(base_url, server.pid, SCENARIOS[scenario], concurrency, targets, args)))
+                    finally:
+                        server.terminate()
+                        server.wait()
+                rows = combine(scenario, concurrency, repeats)
+                results += rows
+                print(f"🔄 {scenario} at {concurrency} clients: "
+                      f"{sum(row['throughput_rps'] for row in rows if row['endpoint'] != 'all'):.0f} req/s")
+    finally:
+        stop.set()
+        fixture.join()
+    return {"meta": run_meta(args), "results": results}
+
+
+def run_meta(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    settings = {name: value for name, value in vars(args).items() if name not in ("output", "compare", "current", "database_url")}
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "settings": settings,
+    }
+
+
+def print_results(results: list):
+    print_table(
+        ["scenario", "clients", "endpoint", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms", "p95 spread", "RSS peak MB"],
+        [
+            [r["scenario"], r["concurrency"], r["endpoint"], r["requests"], r["errors"], f"{r['throughput_rps']:.1f}",
+             f"{r['p50_ms']:.1f}", f"{r['p95_ms']:.1f}", f"{r['p99_ms']:.1f}", f"{r['spread']['p95_ms']:.0%}",
+             f"{r['rss_peak_mb']:.0f}"]
+            for r in results
+        ],
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float) -> list:
+    """
+    Figures worse than the baseline by more than threshold, or by more than
+    the baseline's own spread for that figure if larger, for every scenario,
+    concurrency and endpoint both runs measured. Latency changes smaller
+    than min_delta_ms are treated as noise.
+    """
+    repeats = baseline["meta"]["settings"]["repeats"]
+    def key(row):
+        return row["scenario"], row["concurrency"], row["endpoint"]
+
+    before = {key(row): row for row in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        old = before.get(key(row))
+        if old is None:
+            continue
+        for metric, higher_is_worse in COMPARED.items():
+            if not old[metric]:
+                continue
+            change = (row[metric] - old[metric]) / old[metric]
+            if metric.endswith("_ms") and abs(row[metric] - old[metric]) < min_delta_ms:
+                continue
+            if metric in ("p95_ms", "p99_ms"):
+                beyond = 1 - int(metric[1:3]) / 100
+                if old["requests"] / repeats * beyond < TAIL_SAMPLES:
+                    continue
+            allowed = max(threshold, old.get("spread", {}).get(metric, 0.0))
+            if (change if higher_is_worse else -change) > allowed:
+                regressions.append([*key(row), metric, old[metric], row[metric], f"{change:+.0%}", f"{allowed:.0%}"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32], help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="measured seconds per repeat")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before each measurement")
+    parser.add_argument("--repeats", type=int, default=3, help="fresh-server runs per scenario and level")
+    parser.add_argument("--seed", type=int, default=10_000, help="quizzes stored before the run")
+    parser.add_argument("--database-url", help="database to seed and serve from (default: a new SQLite file)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM delay per quiz (seconds)")
+    parser.add_argument("--questions", type=int, default=5, help="questions per generated and seeded quiz")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="stub Wikipedia delay per page (seconds)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (seconds)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--current", help="results JSON to compare instead of running")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative change counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="smallest latency change counted")
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        database_url = args.database_url or f"sqlite:///{db_path}"
+        os.environ["DATABASE_URL"] = database_url
+        current = run(args, database_url)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(current, f, indent=2)
+    print_results(current["results"])
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_delta_ms)
+        if regressions:
+            print()
+            print_table(["scenario", "clients", "endpoint", "metric", "baseline", "current", "change", "allowed"], regressions)
+            print(f"⚠️ {len(regressions)} figures regressed by more than {args.threshold:.0%} "
+                  f"against {args.compare} ({baseline['meta'].get('commit') or 'unknown commit'})")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
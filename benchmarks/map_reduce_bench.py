@@ -0,0 +1,79 @@
+"""
+Single-prompt vs. section-parallel map-reduce generation on long articles.
+
+Drives the real LLMQuizGenerator against StubGeminiModel, whose latency
+follows a simple serving model (fixed overhead + prompt tokens at prefill
+speed + output tokens at decode speed). Articles are fixture pages parsed
+by the real scraper. Reports wall-clock time, how many of the article's
+sections the final questions come from, and the tokens spent.
+
+    python -m benchmarks.map_reduce_bench --sections 8 24 48 --time-scale 0.2
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+from tests.fakes import StubGeminiModel, make_article_html
+from llm_quiz_generator_simple import LLMQuizGenerator
+from quiz_service import prompt_content
+from scraper import parse_wikipedia_html
+
+
+def section_coverage(quiz, sections) -> float:
+    # The stub tags every question with the heading of the sentence it quotes
+    total = {(s["heading"] or "Introduction").split(" / ")[0] for s in sections}
+    asked = {q.question[1:].split("]", 1)[0].split(" / ")[0] for q in quiz.questions}
+    return len(asked & total) / len(total)
+
+
+async def run_mode(mode: str, articles, args):
+    timings, questions, coverage = [], [], []
+    model = StubGeminiModel(time_scale=args.time_scale, failure_rate=args.failure_rate)
+    generator = LLMQuizGenerator(model=model)
+    for data in articles:
+        started = time.perf_counter()
+        if mode == "single":
+            quiz = await generator.generate_quiz(data["title"], await prompt_content(data))
+        else:
+            quiz = await generator.generate_quiz_map_reduce(data["title"], data["sections"])
+        timings.append((time.perf_counter() - started) / args.time_scale)
+        questions.append(len(quiz.questions))
+        coverage.append(section_coverage(quiz, data["sections"]))
+    return [
+        f"{percentile(timings, 50):.2f}",
+        f"{max(timings):.2f}",
+        f"{sum(questions) / len(questions):.1f}",
+        f"{100 * sum(coverage) / len(coverage):.0f}%",
+        f"{model.calls / len(articles):.1f}",
+        model.prompt_tokens // len(articles),
+        model.output_tokens // len(articles),
+    ]
+
+
+async def run(args):
+    rows = []
+    for sections in args.sections:
+        articles = [
+            parse_wikipedia_html(make_article_html(f"Article {sections}-{i}", sections=sections, paragraphs_per_section=5))
+            for i in range(args.articles)
+        ]
+        for mode in ("single", "map_reduce"):
+            rows.append([sections, mode] + await run_mode(mode, articles, args))
+    print_table(
+        ["sections", "mode", "p50 s", "max s", "questions", "sections covered", "LLM calls", "prompt tokens", "output tokens"],
+        rows,
+    )
+    print(f"\nTimes are scaled back to real seconds (stub ran at time_scale={args.time_scale}).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--articles", type=int, default=5, help="articles per size")
+    parser.add_argument("--sections", type=int, nargs="+", default=[8, 24, 48])
+    parser.add_argument("--time-scale", type=float, default=0.2, help="shrink the stub's latency by this factor")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of stub calls that fail")
+    asyncio.run(run(parser.parse_args()))
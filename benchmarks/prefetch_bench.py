@@ -0,0 +1,150 @@
+"""
+Follow-on request latency with the background prefetcher off and on.
+
+Simulated readers open an article, read its quiz for a while, then click
+one of the quiz's related topics or one of the article's links, several
+times per session. Requests go to the app in-process; scraping is stubbed
+with a synthetic link graph and the LLM is LLMQuizGenerator on a
+StubGeminiModel behind an LLM governor. Time is compressed by --time-scale;
+latencies are reported in simulated seconds. A third run gives the
+prefetcher a small daily budget to show that it stops there.
+
+    python -m benchmarks.prefetch_bench --sessions 24 --clicks 4
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+import httpx
+
+import main
+import quiz_service
+from database import init_db
+from tests.fakes import StubGeminiModel, make_article_html
+from llm_governor import LLMGovernor
+from llm_quiz_generator_simple import LLMQuizGenerator
+from prefetch import Prefetcher, PREFETCH_CLIENT
+from scraper import parse_wikipedia_html
+from usage import usage_recorder
+
+LINKS_PER_ARTICLE = 25
+
+
+def make_scraper(run: str, articles: list, args):
+    """Stub scrape_wikipedia over a link graph: each article links to LINKS_PER_ARTICLE others"""
+    rng = random.Random(3)
+    graph = {
+        i: rng.sample(range(args.articles), LINKS_PER_ARTICLE) for i in range(args.articles)
+    }
+
+    async def scrape(url: str):
+        title = url.rsplit("/", 1)[1].replace("_", " ")
+        number = int(title.rsplit(" ", 1)[1]) if title.rsplit(" ", 1)[1].isdigit() else hash(title)
+        article = articles[number % len(articles)]
+        return dict(
+            article,
+            title=title,
+            # A sentence naming the title keeps every article unique, so nothing is shared by content
+            content=f"This copy is the article {title}. " + article["content"],
+            links=[f"{run} {k}" for k in graph[number % args.articles]],
+        )
+
+    return scrape
+
+
+async def run(run_id: str, name: str, prefetch: bool, budget: int, args, client, articles: list):
+    governor = LLMGovernor(concurrency=args.llm_concurrency, tokens_per_minute=0)
+    provider = StubGeminiModel(time_scale=args.time_scale, jitter=0.2, seed=1)
+    quiz_service.quiz_generator = LLMQuizGenerator(model=provider, governor=governor)
+    quiz_service.scrape_wikipedia = make_scraper(run_id, articles, args)
+
+    spent_before = sum(row["llm_tokens"] for row in await usage_recorder.for_client(PREFETCH_CLIENT, days=1))
+    prefetcher = Prefetcher(
+        enabled=prefetch,
+        # Earlier runs charged today's usage too; give this run its own budget on top
+        daily_tokens=spent_before + budget if budget else 0,
+        workers=args.workers,
+        poll_interval=0.05 * args.time_scale,
+        governor=governor,
+    )
+    await prefetcher.start()
+
+    first, follow_on = [], []
+
+    async def session(number: int):
+        rng = random.Random(number)
+        title = f"{run_id} {rng.randrange(args.articles)}"
+        await asyncio.sleep(rng.uniform(0, args.think) * args.time_scale)
+        for click in range(args.clicks + 1):
+            url = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+            started = time.perf_counter()
+            response = await client.post("/generate_quiz", json={"url": url})
+            (follow_on if click else first).append((time.perf_counter() - started) / args.time_scale)
+            response.raise_for_status()
+            quiz = response.json()
+            # Readers mostly follow what the quiz suggests, otherwise any link in the article
+            scraped = await quiz_service.scrape_wikipedia(url)
+            choices = quiz["related_topics"][:3] + scraped["links"][:3]
+            if rng.random() < args.predictable:
+                title = rng.choice(choices)
+            else:
+                title = rng.choice(scraped["links"])
+            await asyncio.sleep(rng.expovariate(1 / args.think) * args.time_scale)
+
+    await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    await prefetcher.stop()
+
+    spent = sum(row["llm_tokens"] for row in await usage_recorder.for_client(PREFETCH_CLIENT, days=1)) - spent_before
+    generated = prefetcher.stats.get("generated", 0)
+    hits = sum(latency < 1.0 for latency in follow_on)
+    return [
+        name, len(follow_on), f"{100 * hits / len(follow_on):.0f}%", f"{sum(follow_on) / len(follow_on):.2f}",
+        f"{percentile(follow_on, 50):.2f}", f"{percentile(follow_on, 95):.2f}", f"{percentile(first, 50):.2f}",
+        generated, prefetcher.stats.get("over_budget", 0), spent,
+        provider.prompt_tokens + provider.output_tokens,
+    ]
+
+
+async def main_async(args):
+    await init_db()
+    # Parse once up front; time compression would otherwise inflate parsing 1/time_scale times
+    articles = [parse_wikipedia_html(make_article_html(f"Article {i}", 10, 5, seed=i)) for i in range(20)]
+
+    rows = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for number, (name, prefetch, budget) in enumerate((
+            ("off", False, 0),
+            ("on", True, 0),
+            (f"on, budget {args.budget}", True, args.budget),
+        )):
+            # Each run browses its own articles, so nothing stored by an earlier run is reused
+            rows.append(await run(f"Run{number}", name, prefetch, budget, args, client, articles))
+
+    print(f"{args.sessions} sessions x {args.clicks} clicks, {args.think:.0f}s reading time, "
+          f"{int(100 * args.predictable)}% of clicks on the first related topics or links")
+    print_table(
+        ["prefetch", "follow-ons", "from store", "mean s", "p50 s", "p95 s", "first p50 s",
+         "prefetched", "over budget", "prefetch tokens", "LLM tokens"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=24)
+    parser.add_argument("--clicks", type=int, default=4, help="follow-on requests per session")
+    parser.add_argument("--think", type=float, default=60, help="mean simulated seconds spent on each quiz")
+    parser.add_argument("--predictable", type=float, default=0.7,
+                        help="share of clicks on the first three related topics or links")
+    parser.add_argument("--articles", type=int, default=2000, help="articles in the link graph")
+    parser.add_argument("--workers", type=int, default=16, help="prefetch workers")
+    parser.add_argument("--llm-concurrency", type=int, default=32)
+    parser.add_argument("--budget", type=int, default=50_000, help="daily tokens for the budgeted run")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="real seconds per simulated second")
+    asyncio.run(main_async(parser.parse_args()))
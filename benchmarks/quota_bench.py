@@ -0,0 +1,150 @@
+"""
+Per-client rate limiting and the LLM governor against a provider token quota.
+
+Clients with their own API keys send /generate_quiz requests (Poisson
+arrivals, unique articles, scraping stubbed out) to the app in-process. The StubGeminiModel
+provider rejects calls past its tokens-per-minute quota with a 429, as
+Gemini does. Two scenarios: well-behaved clients plus one abusive client,
+and a surge of well-behaved clients whose total exceeds the quota. Time is
+compressed so that one simulated minute takes one real second; latencies are
+reported in simulated seconds.
+
+    python -m benchmarks.quota_bench --minutes 10 --quota 100000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+# Quota errors are expected here by the hundred
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import httpx
+
+import main
+import quiz_service
+from database import init_db
+from tests.fakes import StubGeminiModel, make_article_html
+from llm_governor import LLMGovernor, LLMCall
+from llm_quiz_generator_simple import LLMQuizGenerator
+from rate_limit import RateLimiter, MemoryBucketStore
+from scraper import parse_wikipedia_html
+
+TIME_SCALE = 1 / 60  # one simulated minute per real second
+
+SCENARIOS = {
+    # name: [(client, requests per simulated minute), ...]
+    "abusive client": [(f"good-{i}", 4) for i in range(5)] + [("abuser", 60)],
+    "aggregate surge": [(f"good-{i}", 4) for i in range(12)],
+}
+
+
+class Ungoverned:
+    """No governor: every call goes straight to the provider, as before"""
+
+    @asynccontextmanager
+    async def slot(self, prompt: str):
+        yield LLMCall(prompt)
+
+
+def make_limiter(strategy: str, clients: list, per_client: int) -> RateLimiter:
+    # A simulated minute is a real second, so N per simulated minute is N/second
+    limit = "off" if strategy == "none" else f"{per_client}/second"
+    return RateLimiter({"generate": limit}, store=MemoryBucketStore(), api_keys=[name for name, _ in clients])
+
+
+def make_governor(strategy: str, quota: int):
+    if strategy != "rate limit + governor":
+        return Ungoverned()
+    # Budget 90% of the provider quota; the window, waits and backoff in simulated time
+    return LLMGovernor(
+        concurrency=8,
+        tokens_per_minute=int(0.9 * quota),
+        max_wait=10 * TIME_SCALE,
+        quota_backoff=10 * TIME_SCALE,
+        window=60 * TIME_SCALE,
+    )
+
+
+async def run(scenario: str, strategy: str, args, client: httpx.AsyncClient, counter: list):
+    clients = SCENARIOS[scenario]
+    provider = StubGeminiModel(time_scale=TIME_SCALE, jitter=0.2, tokens_per_minute=args.quota, seed=1)
+    quiz_service.quiz_generator = LLMQuizGenerator(model=provider, governor=make_governor(strategy, args.quota))
+    main.rate_limiter = make_limiter(strategy, clients, args.per_client)
+
+    rng = random.Random(7)
+    arrivals = []
+    for name, per_minute in clients:
+        at = rng.expovariate(per_minute)
+        while at < args.minutes:
+            arrivals.append((at * 60 * TIME_SCALE, name))
+            at += rng.expovariate(per_minute)
+    arrivals.sort()
+
+    results = []
+
+    async def one(name: str):
+        counter[0] += 1
+        url = f"https://en.wikipedia.org/wiki/Quota_{counter[0]}"
+        started = time.perf_counter()
+        response = await client.post("/generate_quiz", json={"url": url}, headers={"X-API-Key": name})
+        results.append((name, response.status_code, (time.perf_counter() - started) / TIME_SCALE))
+
+    started = time.perf_counter()
+    tasks = []
+    for at, name in arrivals:
+        await asyncio.sleep(max(0.0, at - (time.perf_counter() - started)))
+        tasks.append(asyncio.ensure_future(one(name)))
+    await asyncio.gather(*tasks)
+
+    good = [r for r in results if r[0].startswith("good")]
+    abuser = [r for r in results if r[0] == "abuser"]
+    statuses = [status for _, status, _ in results]
+
+    def ok_rate(rows):
+        return f"{100 * sum(status == 200 for _, status, _ in rows) / len(rows):.0f}%" if rows else "-"
+
+    return [
+        scenario, strategy, len(results), ok_rate(good), ok_rate(abuser),
+        statuses.count(429), statuses.count(503), statuses.count(500), provider.quota_rejections,
+        f"{percentile([latency for _, status, latency in good if status == 200], 95):.1f}",
+    ]
+
+
+async def main_async(args):
+    await init_db()
+    # Parsing is real-time CPU work that time compression would inflate 60x; parse once up front
+    articles = [parse_wikipedia_html(make_article_html(f"Article {i}", 10, 5, seed=i)) for i in range(20)]
+
+    async def scrape(url: str):
+        # A sentence naming the URL keeps every article unique, so nothing is cached
+        article = articles[hash(url) % len(articles)]
+        return dict(article, content=f"This copy was fetched from {url}. " + article["content"])
+
+    quiz_service.scrape_wikipedia = scrape
+    counter = [0]
+    rows = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in SCENARIOS:
+            for strategy in ("none", "rate limit", "rate limit + governor"):
+                rows.append(await run(scenario, strategy, args, client, counter))
+
+    print(f"provider quota {args.quota} tokens/min, per-client limit {args.per_client}/min, {args.minutes} simulated minutes")
+    print_table(
+        ["scenario", "strategy", "requests", "good ok", "abuser ok", "429", "503", "500", "provider 429s", "good p95 s"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=10, help="simulated minutes per run")
+    parser.add_argument("--quota", type=int, default=100_000, help="provider tokens per minute")
+    parser.add_argument("--per-client", type=int, default=10, help="per-client limit, requests per minute")
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""
+Pinned model vs. ModelRouter (fallback + circuit breaking, with and without
+hedging) through a healthy -> primary outage -> recovered scenario.
+
+Three StubGeminiModel backends with jittered latency stand in for the
+candidate models. During the outage the primary fails most calls and
+stalls on many of the rest. Latencies are scaled back to real seconds.
+
+    python -m benchmarks.router_bench --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+from tests.fakes import StubGeminiModel
+from llm_governor import llm_governor
+from llm_quiz_generator_simple import LLMQuizGenerator
+from model_router import ModelRouter
+
+CONTENT = " ".join(
+    f"The harbour authority rebuilt the eastern pier in {1850 + i} after a winter storm." for i in range(40)
+)
+NAMES = ["primary", "secondary", "tertiary"]
+PHASES = [
+    ("healthy", {}),
+    ("primary outage", {"failure_rate": 0.7, "stall_rate": 0.3}),
+    ("recovered", {}),
+]
+
+
+def make_models(args):
+    return {
+        name: StubGeminiModel(time_scale=args.time_scale, jitter=0.3, stall_rate=0.02, seed=i)
+        for i, name in enumerate(NAMES)
+    }
+
+
+async def run_phase(generator: LLMQuizGenerator, args):
+    timings = []
+    failed = 0
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        nonlocal failed
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await generator.generate_quiz("Harbour", CONTENT)
+            except Exception:
+                failed += 1
+            timings.append((time.perf_counter() - started) / args.time_scale)
+
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    return timings, failed
+
+
+async def run(args):
+    rows = []
+    for strategy in ("pinned", "router", "router + hedge"):
+        models = make_models(args)
+        if strategy == "pinned":
+            generator = LLMQuizGenerator(model=models["primary"])
+        else:
+            generator = LLMQuizGenerator(model=ModelRouter(
+                [(name, models[name]) for name in NAMES],
+                hedge_after="p95" if strategy == "router + hedge" else "off",
+                cooldown=args.cooldown * args.time_scale,
+                governor=llm_governor,
+            ))
+
+        for phase, degrade in PHASES:
+            primary = models["primary"]
+            primary.failure_rate = degrade.get("failure_rate", 0.0)
+            primary.stall_rate = degrade.get("stall_rate", 0.02)
+            calls_before = sum(m.calls for m in models.values())
+            router_before = dict(generator.model.stats) if strategy != "pinned" else {}
+
+            timings, failed = await run_phase(generator, args)
+
+            calls = sum(m.calls for m in models.values()) - calls_before
+            delta = {k: generator.model.stats[k] - router_before[k] for k in router_before}
+            rows.append([
+                strategy, phase,
+                f"{100 * (args.requests - failed) / args.requests:.1f}%",
+                f"{percentile(timings, 50):.2f}", f"{percentile(timings, 95):.2f}", f"{percentile(timings, 99):.2f}",
+                f"{calls / args.requests:.2f}",
+                delta.get("fallbacks", "-"), delta.get("hedges", "-"), delta.get("hedge_wins", "-"),
+            ])
+        if strategy != "pinned":
+            trips = {name: state["trips"] for name, state in generator.model.snapshot()["models"].items()}
+            print(f"{strategy}: breaker trips {trips}")
+
+    print()
+    print_table(
+        ["strategy", "phase", "success", "p50 s", "p95 s", "p99 s", "LLM calls/req", "fallbacks", "hedges", "hedge wins"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per phase")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cooldown", type=float, default=30, help="breaker cooldown (real seconds)")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="shrink the stub's latency by this factor")
+    asyncio.run(run(parser.parse_args()))
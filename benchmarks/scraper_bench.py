@@ -0,0 +1,110 @@
+"""
+HTML extraction cost per scraper engine: ms/page and peak memory.
+
+Runs every engine over a corpus of saved Wikipedia pages (--corpus DIR of
+*.html files) or, by default, over generated pages that reproduce
+Wikipedia's article markup. Each engine runs in a forked child so its
+peak RSS is measured in isolation, and every output is checked against
+the bs4 reference engine.
+
+    python -m benchmarks.scraper_bench --corpus ~/wiki-pages --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import resource
+import time
+
+from benchmarks.common import percentile, print_table
+from tests.fakes import make_article_html
+import scraper
+
+
+def load_corpus(path: str = None) -> list:
+    if path:
+        pages = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(path, name), "rb") as f:
+                    pages.append(f.read())
+        return pages
+    # Small, typical and long articles
+    shapes = [(4, 3), (10, 5), (25, 6), (40, 8)]
+    return [
+        make_article_html(f"Article {i}", sections, paragraphs).encode("utf-8")
+        for i, (sections, paragraphs) in enumerate(shapes * 3)
+    ]
+
+
+def parse_quietly(html: bytes, engine: str):
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            return scraper.parse_wikipedia_html(html, engine)
+        except ValueError as e:
+            return {"error": str(e)}
+
+
+def measure(engine: str, pages: list, repeat: int, results):
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    outputs = []
+    for _ in range(repeat):
+        for html in pages:
+            started = time.perf_counter()
+            outputs.append(parse_quietly(html, engine))
+            timings.append((time.perf_counter() - started) * 1000)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        "engine": engine,
+        "mean_ms": sum(timings) / len(timings),
+        "p95_ms": percentile(timings, 95),
+        "peak_mb": (peak_kb - baseline_kb) / 1024,
+        "outputs": outputs[:len(pages)],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Directory of saved Wikipedia .html pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engines", nargs="+", default=list(scraper.EXTRACTORS))
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    total_kb = sum(len(p) for p in pages) / 1024
+    print(f"Corpus: {len(pages)} pages, {total_kb:.0f} KB")
+
+    # Every engine, including the bs4 reference, parses in a fresh child so
+    # the parent's heap never holds parsed trees that a child could reuse.
+    context = multiprocessing.get_context("fork")
+    results = []
+    for engine in args.engines:
+        try:
+            scraper.resolve_engine(engine)
+        except ValueError as e:
+            print(f"Skipping {engine}: {e}")
+            continue
+        queue = context.Queue()
+        child = context.Process(target=measure, args=(engine, pages, args.repeat, queue))
+        child.start()
+        results.append(queue.get())
+        child.join()
+
+    reference = next((r["outputs"] for r in results if r["engine"] == "bs4"), None)
+    rows = []
+    for result in results:
+        matches = "-" if reference is None else sum(1 for out, ref in zip(result["outputs"], reference) if out == ref)
+        rows.append([
+            result["engine"],
+            f"{result['mean_ms']:.1f}",
+            f"{result['p95_ms']:.1f}",
+            f"{result['peak_mb']:.1f}",
+            f"{matches}/{len(pages)}",
+        ])
+    print_table(["engine", "ms/page", "p95 ms", "peak MB", "same as bs4"], rows)
+
+
+if __name__ == "__main__":
+    main()
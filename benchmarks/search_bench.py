@@ -0,0 +1,160 @@
+"""
+/search latency: the full-text index against a naive LIKE scan.
+
+Seeds a SQLite database with --rows quizzes through storage.save_quizzes,
+which maintains the search index as it inserts, in the text storage format
+so a LIKE scan can read the same words. Text is drawn from a Zipf-distributed
+vocabulary, so queries range from words in most quizzes to words in a
+handful. Each query is timed as a first page through search_quizzes and as
+a LIKE over title, article and quiz JSON (every word, newest first).
+
+    python -m benchmarks.search_bench --rows 100000
+"""
+import argparse
+import asyncio
+import os
+import time
+from itertools import product
+
+import numpy as np
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+db_path = setup_offline_env()
+
+from sqlalchemy import and_, or_, select
+
+from database import AsyncSessionLocal, Quiz, init_db
+from models import Question, QuizOutput
+from search import search_quizzes
+from storage import QuizRecord, save_quizzes
+
+SYLLABLES = ["".join(pair) for pair in product("bdfgklmnprstvz", "aeiou")]
+BATCH = 1000
+
+
+def vocabulary(size: int) -> list:
+    words = ["".join(parts) for parts in product(SYLLABLES, repeat=3)]
+    rng = np.random.default_rng(7)
+    return list(rng.permutation(words)[:size])
+
+
+def seed(rows: int, words: list, content_words: int) -> float:
+    rng = np.random.default_rng(0)
+    cumulative = np.cumsum(1 / np.arange(1, len(words) + 1))
+    cumulative /= cumulative[-1]
+
+    def text(count):
+        return " ".join(words[i] for i in np.searchsorted(cumulative, rng.random(count)))
+
+    async def run():
+        await init_db()
+        for start in range(0, rows, BATCH):
+            records = []
+            for i in range(start, min(rows, start + BATCH)):
+                title = text(3).title()
+                quiz = QuizOutput(
+                    title=title,
+                    summary=text(40),
+                    key_entities=[],
+                    related_topics=[],
+                    questions=[
+                        Question(question=text(12) + "?", options=["a", "b", "c", "d"], correct_answer="a", explanation=text(15))
+                        for _ in range(6)
+                    ],
+                )
+                records.append(QuizRecord(
+                    f"https://en.wikipedia.org/wiki/Article_{i}", f"article_{i}", f"digest{i}", title, text(content_words), quiz,
+                ))
+            async with AsyncSessionLocal() as db:
+                await save_quizzes(db, records, fmt="text")
+                await db.commit()
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    return time.perf_counter() - started
+
+
+async def like_scan(q: str, limit: int):
+    async with AsyncSessionLocal() as db:
+        conditions = [
+            or_(Quiz.title.contains(word), Quiz.scraped_content.contains(word), Quiz.full_quiz_data.contains(word))
+            for word in q.split()
+        ]
+        query = (
+            select(Quiz.id, Quiz.url, Quiz.title, Quiz.date_generated)
+            .where(and_(*conditions))
+            .order_by(Quiz.date_generated.desc(), Quiz.id.desc())
+            .limit(limit)
+        )
+        return (await db.execute(query)).all()
+
+
+async def indexed(q: str, limit: int, offset: int = 0):
+    async with AsyncSessionLocal() as db:
+        items, _ = await search_quizzes(db, q, limit, offset)
+        return items
+
+
+async def count_matches(q: str) -> int:
+    async with AsyncSessionLocal() as db:
+        items, _ = await search_quizzes(db, q, 1_000_000)
+        return len(items)
+
+
+async def time_query(search, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await search()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def measure(queries: dict, args) -> list:
+    rows = []
+    for name, q in queries.items():
+        matches = await count_matches(q)
+        first_page = await time_query(lambda: indexed(q, args.limit), args.repeat)
+        deep_page = await time_query(lambda: indexed(q, args.limit, offset=min(1000, matches)), args.repeat)
+        like = await time_query(lambda: like_scan(q, args.limit), args.like_repeat)
+        rows.append([
+            name, q, matches,
+            f"{percentile(first_page, 50):.1f}", f"{percentile(first_page, 95):.1f}",
+            f"{percentile(deep_page, 50):.1f}", f"{percentile(like, 50):.0f}",
+        ])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--content-words", type=int, default=300, help="article length in words")
+    parser.add_argument("--limit", type=int, default=20, help="results per page")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--like-repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    words = vocabulary(args.vocabulary)
+    seconds = seed(args.rows, words, args.content_words)
+    print(f"Seeded {args.rows} quizzes with index maintenance in {seconds:.1f}s "
+          f"({args.rows / seconds:.0f} quizzes/s), database {os.path.getsize(db_path) / 2**20:.0f} MB")
+
+    # By frequency rank: in most quizzes, in some, in a handful
+    queries = {
+        "common word": words[2],
+        "mid word": words[300],
+        "rare word": words[20_000 % len(words)],
+        "two words": f"{words[40]} {words[150]}",
+        "no match": "qqqq",
+    }
+    rows = asyncio.run(measure(queries, args))
+    print_table(
+        ["query", "words", "matches", "index p50 ms", "index p95 ms", "index deep page ms", "LIKE p50 ms"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
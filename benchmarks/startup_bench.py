@@ -0,0 +1,102 @@
+"""
+Cold-start time of the API: import, lifespan startup and time until the
+first HTTP response, each measured in a fresh interpreter.
+
+Runs with the real Gemini backend configured but no network calls made at
+startup, and with the fake backend for comparison.
+
+    python -m benchmarks.startup_bench --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import free_port, percentile, print_table
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child: times `import main` and the lifespan startup phase
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+ready = asyncio.run(startup())
+print(json.dumps({"import": imported - started, "lifespan": ready - imported}))
+"""
+
+
+def child_env(backend: str) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='quizbench-'), 'startup.db')}"
+    env["QUIZ_LLM_BACKEND"] = backend
+    env["GEMINI_API_KEY"] = env.get("GEMINI_API_KEY", "unused-at-startup")
+    env["MODEL_CACHE_PATH"] = ""
+    env["FETCH_CACHE_DIR"] = ""
+    return env
+
+
+def time_in_process(backend: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=REPO_ROOT, env=child_env(backend),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_first_response(backend: str, timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=child_env(backend), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with status {server.returncode}")
+            time.sleep(0.01)
+        raise RuntimeError("server did not answer in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run(args):
+    rows = []
+    for backend in args.backends:
+        samples = [time_in_process(backend) for _ in range(args.runs)]
+        first_response = [time_first_response(backend) for _ in range(args.runs)]
+
+        def ms(values, pct):
+            return f"{percentile(values, pct) * 1000:.0f}"
+
+        imports = [s["import"] for s in samples]
+        lifespans = [s["lifespan"] for s in samples]
+        rows.append([
+            backend, args.runs,
+            ms(imports, 50), ms(lifespans, 50),
+            ms(first_response, 50), ms(first_response, 100),
+        ])
+    print_table(["backend", "runs", "import p50 ms", "lifespan p50 ms", "first response p50 ms", "first response max ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["gemini", "fake"], choices=["gemini", "fake"])
+    run(parser.parse_args())
@@ -0,0 +1,143 @@
+"""
+Database size and /quiz/{id} read latency per storage format.
+
+Writes --quizzes quizzes (a --duplicate-ratio share of them for articles
+already stored) into a fresh SQLite file per format, then times the
+validating read path (parse, validate, re-serialize) against serving the
+stored JSON bytes directly.
+
+Synthetic text is drawn from a Zipf-distributed pseudo-word vocabulary so
+it compresses roughly like prose rather than like a repeated template.
+
+    python -m benchmarks.storage_bench --quizzes 2000
+"""
+import argparse
+import hashlib
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from database import Base, Quiz, Article
+from models import QuizOutput, KeyEntity, Question
+import storage
+
+
+class TextSource:
+    def __init__(self, seed: int = 7, vocabulary: int = 5000):
+        self.rng = random.Random(seed)
+        syllables = ["ka", "ro", "mi", "te", "su", "la", "ven", "dor", "is", "an", "pre", "tor", "ul", "ex", "qua", "ni"]
+        self.words = ["".join(self.rng.choice(syllables) for _ in range(self.rng.randint(1, 4))) for _ in range(vocabulary)]
+        self.cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+
+    def sentence(self, low: int = 8, high: int = 24) -> str:
+        words = self.rng.choices(self.words, cum_weights=self.cum_weights, k=self.rng.randint(low, high))
+        return " ".join(words).capitalize() + "."
+
+    def text(self, chars: int) -> str:
+        parts, size = [], 0
+        while size < chars:
+            parts.append(self.sentence())
+            size += len(parts[-1]) + 1
+        return " ".join(parts)[:chars]
+
+    def quiz(self, title: str) -> QuizOutput:
+        return QuizOutput(
+            title=title,
+            summary=" ".join(self.sentence() for _ in range(8)),
+            key_entities=[KeyEntity(name=self.sentence(1, 3), description=self.sentence(), relevance=self.sentence()) for _ in range(4)],
+            related_topics=[self.sentence(1, 3) for _ in range(4)],
+            questions=[
+                Question(
+                    question=self.sentence(),
+                    options=[self.sentence(2, 6) for _ in range(4)],
+                    correct_answer=self.sentence(2, 6),
+                    explanation=self.sentence(15, 30),
+                )
+                for _ in range(7)
+            ],
+        )
+
+
+def seed(path: str, fmt: str, quizzes: int, duplicate_ratio: float, content_chars: int):
+    source = TextSource()
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    articles = []
+    with Session(engine) as db:
+        for i in range(quizzes):
+            if articles and source.rng.random() < duplicate_ratio:
+                title, content = source.rng.choice(articles)
+            else:
+                title, content = f"Article {i}", source.text(content_chars)
+                articles.append((title, content))
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            article = storage.article_values(digest, content, fmt)
+            if article is not None and db.get(Article, digest) is None:
+                db.add(Article(**article))
+            db.add(storage.new_quiz_row(f"https://en.wikipedia.org/wiki/{i}", None, digest, title, content, source.quiz(title), fmt))
+            if i % 500 == 0:
+                db.commit()
+        db.commit()
+    return engine
+
+
+def time_reads(engine, ids, fast: bool) -> list:
+    timings = []
+    with Session(engine) as db:
+        for quiz_id in ids:
+            started = time.perf_counter()
+            row = db.execute(
+                select(Quiz.full_quiz_data, Quiz.quiz_blob, Quiz.storage_format).where(Quiz.id == quiz_id)
+            ).first()
+            if fast:
+                body = storage.quiz_json_bytes(row)
+            else:
+                body = storage.load_quiz(row).model_dump_json().encode("utf-8")
+            timings.append((time.perf_counter() - started) * 1000)
+            assert body
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quizzes", type=int, default=2000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--content-chars", type=int, default=12000)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    formats = ["text", "zlib"] + (["zstd"] if storage.zstandard is not None else [])
+    workdir = tempfile.mkdtemp(prefix="storagebench-")
+    rng = random.Random(1)
+    rows = []
+    for fmt in formats:
+        path = os.path.join(workdir, f"{fmt}.db")
+        engine = seed(path, fmt, args.quizzes, args.duplicate_ratio, args.content_chars)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        ids = [rng.randint(1, args.quizzes) for _ in range(args.reads)]
+        validated = time_reads(engine, ids, fast=False)
+        fast = time_reads(engine, ids, fast=True)
+        rows.append([
+            fmt,
+            f"{size_mb:.1f}",
+            f"{percentile(validated, 50):.3f}",
+            f"{percentile(validated, 95):.3f}",
+            f"{percentile(fast, 50):.3f}",
+            f"{percentile(fast, 95):.3f}",
+        ])
+        engine.dispose()
+    print(f"{args.quizzes} quizzes, {args.duplicate_ratio:.0%} for already-stored articles")
+    print_table(["format", "db MB", "validated p50 ms", "validated p95 ms", "fast path p50 ms", "fast path p95 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
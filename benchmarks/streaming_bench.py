@@ -0,0 +1,105 @@
+"""
+Time-to-first-question of /generate_quiz/stream against /generate_quiz.
+
+The app is served by uvicorn on a local port (so response bodies are really
+streamed) against a fake scraper and a fake LLM that emits its JSON in
+chunks spread over the configured generation latency.
+
+    python -m benchmarks.streaming_bench --requests 20 --llm-latency 3
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+from benchmarks.common import setup_offline_env, percentile, print_table
+
+setup_offline_env()
+
+import httpx
+import uvicorn
+
+import main
+import quiz_service
+from fake_llm import FakeQuizGenerator
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def fake_scrape(url: str):
+    await asyncio.sleep(0.05)
+    title = url.rsplit("/", 1)[-1]
+    return {"title": title, "content": f"{title} article body. " * 50}
+
+
+async def time_blocking(client: httpx.AsyncClient, url: str) -> dict:
+    started = time.perf_counter()
+    response = await client.post("/generate_quiz", json={"url": url, "force_refresh": True})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    # Nothing is visible until the whole quiz arrives
+    return {"summary": elapsed, "first_question": elapsed, "total": elapsed}
+
+
+async def time_stream(client: httpx.AsyncClient, url: str) -> dict:
+    timings = {}
+    started = time.perf_counter()
+    async with client.stream("POST", "/generate_quiz/stream", json={"url": url, "force_refresh": True}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)["event"]
+            if event == "error":
+                raise RuntimeError(line)
+            if event == "question":
+                event = "first_question"
+            timings.setdefault(event, time.perf_counter() - started)
+    timings["total"] = time.perf_counter() - started
+    return timings
+
+
+async def run(args):
+    quiz_service.scrape_wikipedia = fake_scrape
+    quiz_service.quiz_generator = FakeQuizGenerator(latency=args.llm_latency, chunk_size=args.chunk_size)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    rows = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            for mode, measure in (("blocking", time_blocking), ("stream", time_stream)):
+                samples = []
+                for i in range(args.requests):
+                    samples.append(await measure(client, f"https://en.wikipedia.org/wiki/{mode}_{i}"))
+
+                def column(key, pct):
+                    return f"{percentile([s[key] for s in samples], pct) * 1000:.0f}"
+
+                rows.append([
+                    mode, args.requests,
+                    column("summary", 50), column("first_question", 50), column("first_question", 95),
+                    column("total", 50),
+                ])
+    finally:
+        server.should_exit = True
+        await serving
+
+    print_table(["endpoint", "requests", "summary p50 ms", "first question p50 ms", "first question p95 ms", "complete p50 ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=3.0, help="seconds for the full fake LLM response")
+    parser.add_argument("--chunk-size", type=int, default=64, help="characters per streamed chunk")
+    asyncio.run(run(parser.parse_args()))
@@ -1,9 +1,16 @@
+import logging
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, inspect, text, BigInteger, Column, Integer, String, DateTime, Date, Float, Text, Boolean, Index, LargeBinary
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
 from datetime import datetime
 
+from search import create_search_index
+
+logger = logging.getLogger(__name__)
+
 # Database configuration for Render PostgreSQL
 def get_database_url():
     # Use Render's DATABASE_URL environment variable
@@ -18,9 +25,20 @@ def get_database_url():
         # Fallback to SQLite for local development
         return "sqlite:///./quiz_history.db"
 
+def get_async_database_url(database_url):
+    # Same database, reached through an asyncio driver
+    if database_url.startswith("postgresql://"):
+        database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        # asyncpg spells libpq's sslmode parameter as ssl
+        return database_url.replace("sslmode=", "ssl=")
+    if database_url.startswith("sqlite://"):
+        return database_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return database_url
+
 DATABASE_URL = get_database_url()
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
 
-print(f"Database URL: {DATABASE_URL.split('@')[0]}@***")  # Log without password
+logger.info("Database URL: %s@***", DATABASE_URL.split('@')[0])  # Log without password
 
 # Create engine with PostgreSQL optimizations
 if DATABASE_URL.startswith("postgresql://"):
@@ -32,12 +50,24 @@ if DATABASE_URL.startswith("postgresql://"):
         pool_recycle=300,      # Recycle connections after 5 minutes
         echo=False            # Set to True for debugging SQL queries
     )
-    print("✅ Using PostgreSQL database")
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        echo=False
+    )
+    logger.info("Using PostgreSQL database")
 else:
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-    print("✅ Using SQLite database (development)")
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    logger.info("Using SQLite database (development)")
 
+# Synchronous sessions are kept for scripts and schema management;
+# request handlers use the async sessions below.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 class Quiz(Base):
@@ -45,21 +75,104 @@ class Quiz(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String, index=True)
+    canonical_url = Column(String, index=True)   # Normalized URL used as cache key
+    content_hash = Column(String, index=True)    # SHA-256 of the scraped content
     title = Column(String)
     date_generated = Column(DateTime, default=datetime.utcnow)
     scraped_content = Column(Text)
     full_quiz_data = Column(Text)
+    storage_format = Column(String, nullable=True)  # NULL/"text": the Text columns above; else codec of quiz_blob
+    quiz_blob = Column(LargeBinary, nullable=True)  # Compressed compact quiz JSON
+    simhash = Column(BigInteger, nullable=True)     # SimHash of the scraped content (near_duplicates.py)
+    
+    __table_args__ = (
+        # Keyset pagination of /history: ORDER BY date_generated DESC, id DESC
+        Index("ix_quizzes_date_generated_id", "date_generated", "id"),
+        # Title prefix filter; text_pattern_ops lets PostgreSQL serve LIKE 'x%'
+        Index("ix_quizzes_title_date_generated", "title", "date_generated",
+              postgresql_ops={"title": "text_pattern_ops"}),
+    )
 
-# Create tables
-try:
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully")
-except Exception as e:
-    print(f"❌ Error creating database tables: {e}")
+class Article(Base):
+    __tablename__ = "articles"
+    
+    # Scraped article text stored once, however many quizzes point at it
+    content_hash = Column(String, primary_key=True)
+    storage_format = Column(String)
+    content = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
-def get_db():
-    db = SessionLocal()
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True)
+    url = Column(String)
+    force_refresh = Column(Boolean, default=False)
+    status = Column(String, index=True, default="queued")  # queued | running | done | failed
+    stage = Column(String, nullable=True)                  # scraping | generating | saving
+    error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)                   # QuizOutput JSON once done
+    owner = Column(String, nullable=True)                  # Worker pool (node) holding the job
+    lease_expires_at = Column(DateTime, nullable=True)     # Renewed by the owner; another node may take it after this
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    
+    # Token bucket per endpoint and client, shared by every node (RATE_LIMIT_STORE=sql)
+    key = Column(String, primary_key=True)   # endpoint:client
+    tokens = Column(Float)
+    updated_at = Column(Float)               # Unix time of the last refill
+
+class Usage(Base):
+    __tablename__ = "usage"
+    
+    # Daily request and LLM usage per client and endpoint
+    client = Column(String, primary_key=True)    # ip:<address> or key:<hash of the API key>
+    day = Column(Date, primary_key=True)         # UTC
+    endpoint = Column(String, primary_key=True)
+    requests = Column(Integer, default=0)
+    rejected = Column(Integer, default=0)        # Turned away by the rate limiter or the LLM governor
+    llm_calls = Column(Integer, default=0)
+    llm_tokens = Column(Integer, default=0)
+
+def ensure_schema(conn) -> list:
+    """
+    Create missing tables, then add the columns and indexes introduced since
+    existing ones were created (create_all only creates whole tables). Safe
+    to run on every start; returns the added columns as "table.column".
+    """
+    Base.metadata.create_all(conn)
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            # Another node starting at the same time may add it first
+            guard = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {guard}{ddl}"))
+            added.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    # Virtual (FTS5) or tsvector table, outside the ORM metadata
+    create_search_index(conn)
+    return added
+
+async def init_db():
+    """Bring the schema up to date; run from the app's lifespan hook rather than at import"""
     try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+        async with async_engine.begin() as conn:
+            added = await conn.run_sync(ensure_schema)
+        for column in added:
+            logger.info("Added column %s", column)
+        logger.info("Database tables created successfully")
+    except Exception as e:
+        logger.error("Error creating database tables: %s", e)
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
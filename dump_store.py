@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Dump store configuration (override through environment variables)
+DUMP_STORE_PATH = os.getenv("DUMP_STORE_PATH", "wiki_dump")  # directory written by ingest_dump.py
+DUMP_MAX_REDIRECTS = 3
+ZLIB_LEVEL = 6
+
+DATA_FILE = "articles.dat"
+INDEX_FILE = "articles.idx"
+META_FILE = "store.json"  # which wiki the articles are from
+# One entry per title, sorted by key: a 64-bit hash of the title and the
+# byte range of its record in the data file
+INDEX_DTYPE = np.dtype([("key", "<u8"), ("offset", "<u8"), ("length", "<u4")])
+INDEX_ENTRY = struct.Struct("<QQI")  # the same packed layout, for appending one entry
+
+# <lang>.wikipedia.org, also reached as www.<lang>. and the mobile <lang>.m.
+WIKIPEDIA_HOST_RE = re.compile(r'^(?:www\.)?([a-z0-9-]+)(?:\.m)?\.wikipedia\.org$')
+
+
+def title_key(title: str) -> str:
+    """Titles as MediaWiki compares them: underscores are spaces and the first letter is case-insensitive"""
+    # A fragment names a section of the article, never part of its title
+    title = " ".join(unquote(title).split("#", 1)[0].replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+def title_from_url(url: str) -> str:
+    """The article title of a /wiki/<Title> or index.php?title=<Title> URL"""
+    parts = urlsplit(url.strip())
+    if parts.path.startswith("/wiki/"):
+        return title_key(parts.path[len("/wiki/"):])
+    titles = parse_qs(parts.query).get("title")
+    if titles:
+        return title_key(titles[0])
+    raise ValueError(f"No article title in {url}")
+
+
+def wikipedia_host(host: str) -> Optional[str]:
+    """<lang>.wikipedia.org for any spelling of a Wikipedia host; None for other sites"""
+    match = WIKIPEDIA_HOST_RE.match((host or "").lower())
+    return f"{match.group(1)}.wikipedia.org" if match else None
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class DumpWriter:
+    """
+    Writes a new article store. Records are appended to the data file as
+    they come, so memory does not grow with the dump except for the index
+    entries (20 bytes per title), which close() sorts. The finished files
+    replace the previous store atomically. host is the Wikipedia the dump
+    is from: titles only name an article within one language.
+    """
+
+    def __init__(self, path: str = DUMP_STORE_PATH, host: str = None):
+        self.host = wikipedia_host(host)
+        if self.host is None:
+            raise ValueError(f"Not a Wikipedia host: {host}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._data = open(os.path.join(path, DATA_FILE + ".tmp"), "wb")
+        self._entries = open(os.path.join(path, INDEX_FILE + ".unsorted"), "wb")
+        self._offset = 0
+        self.counts = {"articles": 0, "redirects": 0, "bytes": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, article: dict):
+        """A scraped article: title, content, sections and links"""
+        self._write(article["title"], article)
+        self.counts["articles"] += 1
+
+    def add_redirect(self, title: str, target: str):
+        self._write(title, {"title": title, "redirect": target})
+        self.counts["redirects"] += 1
+
+    def _write(self, title: str, record: dict):
+        blob = zlib.compress(json.dumps(record, ensure_ascii=False).encode("utf-8"), ZLIB_LEVEL)
+        self._data.write(blob)
+        self._entries.write(INDEX_ENTRY.pack(_hash(title_key(title)), self._offset, len(blob)))
+        self._offset += len(blob)
+        self.counts["bytes"] = self._offset
+
+    def close(self):
+        self._data.close()
+        self._entries.close()
+        unsorted_path = self._entries.name
+        entries = np.fromfile(unsorted_path, dtype=INDEX_DTYPE)
+        # Stable, so a title that appears twice resolves to its last record
+        entries = entries[np.argsort(entries["key"], kind="stable")]
+        index_tmp = os.path.join(self.path, INDEX_FILE + ".tmp")
+        entries.tofile(index_tmp)
+        meta_tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(meta_tmp, "w") as f:
+            json.dump({"host": self.host}, f)
+        os.replace(meta_tmp, os.path.join(self.path, META_FILE))
+        os.replace(self._data.name, os.path.join(self.path, DATA_FILE))
+        os.replace(index_tmp, os.path.join(self.path, INDEX_FILE))
+        os.remove(unsorted_path)
+
+    def abort(self):
+        for f in (self._data, self._entries):
+            f.close()
+            if os.path.exists(f.name):
+                os.remove(f.name)
+
+
+class DumpStore:
+    """
+    Read side of the article store: both files are memory-mapped, so a
+    lookup is a binary search over the index and one record decompressed,
+    and only the pages it touches are read from disk. Opened on first use;
+    call close() to pick up a store that ingest_dump.py has replaced.
+    """
+
+    def __init__(self, path: str = DUMP_STORE_PATH, max_redirects: int = DUMP_MAX_REDIRECTS):
+        self.path = path
+        self.max_redirects = max_redirects
+        self._data = None
+        self._index = None
+        self.host = None
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "redirects": 0}
+
+    def _open(self):
+        with self._lock:
+            if self._index is not None:
+                return
+            data_path = os.path.join(self.path, DATA_FILE)
+            index_path = os.path.join(self.path, INDEX_FILE)
+            if not os.path.exists(index_path):
+                raise ValueError(f"No Wikipedia dump store at {self.path}; build one with ingest_dump.py")
+            with open(data_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(data_path) else b""
+            self._index = (
+                np.memmap(index_path, dtype=INDEX_DTYPE, mode="r") if os.path.getsize(index_path)
+                else np.zeros(0, dtype=INDEX_DTYPE)
+            )
+            meta_path = os.path.join(self.path, META_FILE)
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    self.host = json.load(f)["host"]
+            else:
+                logger.warning("The dump store at %s does not record its wiki; rebuild it with ingest_dump.py", self.path)
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, INDEX_FILE))
+
+    def close(self):
+        with self._lock:
+            if isinstance(self._data, mmap.mmap):
+                self._data.close()
+            self._data = self._index = self.host = None
+
+    def __len__(self) -> int:
+        self._open()
+        return len(self._index)
+
+    def _find(self, title: str) -> Optional[dict]:
+        key = title_key(title)
+        digest = _hash(key)
+        keys = self._index["key"]
+        position = int(np.searchsorted(keys, digest))
+        found = None
+        # Titles whose hashes collide sit next to each other; the last match wins
+        while position < len(keys) and keys[position] == digest:
+            entry = self._index[position]
+            offset = int(entry["offset"])
+            record = json.loads(zlib.decompress(self._data[offset:offset + int(entry["length"])]))
+            if title_key(record["title"]) == key:
+                found = record
+            position += 1
+        return found
+
+    def get(self, title: str) -> Optional[dict]:
+        """The stored article for title, following redirects; None when the dump lacks it"""
+        self._open()
+        self.stats["lookups"] += 1
+        record = self._find(title)
+        for _ in range(self.max_redirects):
+            if record is None or "redirect" not in record:
+                break
+            self.stats["redirects"] += 1
+            record = self._find(record["redirect"])
+        if record is None or "redirect" in record:
+            return None
+        self.stats["hits"] += 1
+        return record
+
+    def get_url(self, url: str) -> Optional[dict]:
+        """
+        The stored article a URL names; None also for URLs without a title
+        (?curid=, ...) and for URLs on another wiki than the dump's
+        """
+        self._open()
+        if self.host is None or wikipedia_host(urlsplit(url.strip()).hostname) != self.host:
+            return None
+        try:
+            title = title_from_url(url)
+        except ValueError:
+            return None
+        return self.get(title)
+
+
+dump_store = DumpStore()
@@ -0,0 +1,88 @@
+"""
+Offline quiz generator, selected with QUIZ_LLM_BACKEND=fake for local runs,
+benchmarks and tests. It never calls an LLM: every quiz is built from the
+article title after a configurable delay (FAKE_LLM_LATENCY).
+"""
+import asyncio
+import json
+import os
+import time
+
+from json_stream import stream_quiz_events
+from models import QuizOutput, KeyEntity, Question
+
+
+def make_fake_quiz(title: str, num_questions: int = 5) -> QuizOutput:
+    """
+    Build a deterministic, schema-valid quiz for an article title
+    """
+    return QuizOutput(
+        title=title,
+        summary=f"{title} is the subject of this offline quiz.",
+        key_entities=[
+            KeyEntity(
+                name=f"{title} entity {i + 1}",
+                description=f"Entity {i + 1} mentioned in {title}",
+                relevance="Generated offline",
+            )
+            for i in range(3)
+        ],
+        related_topics=[f"{title} history", f"{title} culture", f"{title} science"],
+        questions=[
+            Question(
+                question=f"Question {i + 1} about {title}?",
+                options=["Option A", "Option B", "Option C", "Option D"],
+                correct_answer="Option A",
+                explanation=f"Option A is correct for question {i + 1}.",
+            )
+            for i in range(num_questions)
+        ],
+    )
+
+
+class FakeQuizGenerator:
+    """
+    Offline stand-in for LLMQuizGenerator with a configurable response delay.
+
+    blocking=True sleeps on the calling thread, reproducing a synchronous
+    LLM client that stalls the event loop. generate_quiz_stream returns the
+    same quiz as fenced JSON text in chunk_size pieces over the same latency.
+    """
+
+    def __init__(self, latency: float = None, num_questions: int = None, blocking: bool = False, chunk_size: int = 64):
+        self.latency = float(os.getenv("FAKE_LLM_LATENCY", "0.5")) if latency is None else latency
+        self.num_questions = int(os.getenv("FAKE_LLM_QUESTIONS", "5")) if num_questions is None else num_questions
+        self.blocking = blocking
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    async def generate_quiz(self, title: str, content: str) -> QuizOutput:
+        self.calls += 1
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return make_fake_quiz(title, self.num_questions)
+
+    async def _stream_text(self, text: str):
+        # Spread the full latency evenly over the chunks, like tokens arriving
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        delay = self.latency / len(chunks)
+        for chunk in chunks:
+            if self.blocking:
+                time.sleep(delay)
+            else:
+                await asyncio.sleep(delay)
+            yield chunk
+
+    async def generate_quiz_stream(self, title: str, content: str):
+        self.calls += 1
+        quiz = make_fake_quiz(title, self.num_questions).model_dump()
+        # Same field order as the LLM prompt asks for
+        ordered = {key: quiz[key] for key in ("title", "summary", "questions", "key_entities", "related_topics")}
+        text = "```json\n" + json.dumps(ordered, indent=2) + "\n```"
+        async for event, value in stream_quiz_events(self._stream_text(text)):
+            yield event, value
+
+    async def generate_quiz_map_reduce(self, title: str, sections: list) -> QuizOutput:
+        return await self.generate_quiz(title, "")
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Fetch configuration (override through environment variables)
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "20"))
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "10"))
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "3"))
+FETCH_BACKOFF_SECONDS = float(os.getenv("FETCH_BACKOFF_SECONDS", "0.5"))
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", ".wiki_cache")  # empty disables the store
+FETCH_CACHE_MAX_MB = float(os.getenv("FETCH_CACHE_MAX_MB", "256"))  # 0 = no size limit
+FETCH_CACHE_TTL_SECONDS = float(os.getenv("FETCH_CACHE_TTL_SECONDS", "604800"))  # drop pages unused this long; 0 = never
+# Serve every article from another origin, e.g. a local mirror or stub server
+WIKIPEDIA_ORIGIN = os.getenv("WIKIPEDIA_ORIGIN", "")
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+MAX_RETRY_AFTER_SECONDS = 30.0
+# The store is pruned on the first save and then every this many saves
+PRUNE_EVERY_SAVES = 100
+
+
+class StoredResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+
+
+class ResponseStore:
+    """
+    On-disk page bodies keyed by URL, saved with their ETag/Last-Modified
+    validators so a refetch can be a conditional request.
+
+    The directory is created by the first save. A body's modification time
+    records its last use: entries unused for ttl_seconds are dropped, and
+    then the least recently used ones until the store fits in max_bytes.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = int(FETCH_CACHE_MAX_MB * 1024 * 1024),
+        ttl_seconds: float = FETCH_CACHE_TTL_SECONDS,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"evicted": 0}
+        self._saves = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    def load(self, url: str) -> Optional[StoredResponse]:
+        meta_path, body_path = self._paths(url)
+        try:
+            if self.ttl_seconds and time.time() - os.stat(body_path).st_mtime > self.ttl_seconds:
+                return None
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            os.utime(body_path)
+        except (OSError, ValueError):
+            return None
+        return StoredResponse(meta.get("etag"), meta.get("last_modified"), body)
+
+    def save(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes):
+        with self._lock:
+            prune = self._saves % PRUNE_EVERY_SAVES == 0
+            self._saves += 1
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        # Write the body first and swap files in atomically, so a reader
+        # never pairs new validators with an old body
+        tmp_body = body_path + ".tmp"
+        with open(tmp_body, "wb") as f:
+            f.write(body)
+        os.replace(tmp_body, body_path)
+        tmp_meta = meta_path + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": etag, "last_modified": last_modified}, f)
+        os.replace(tmp_meta, meta_path)
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop expired entries, then the least recently used past max_bytes; returns how many"""
+        entries = []
+        try:
+            with os.scandir(self.directory) as found:
+                for entry in found:
+                    if entry.name.endswith(".body"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path[:-len(".body")]))
+        except OSError:
+            return 0
+        now = time.time()
+        kept = removed = 0
+        # Most recently used first
+        for used, size, base in sorted(entries, reverse=True):
+            expired = self.ttl_seconds and now - used > self.ttl_seconds
+            if not expired and (not self.max_bytes or kept + size <= self.max_bytes):
+                kept += size
+                continue
+            for path in (base + ".json", base + ".body"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            removed += 1
+        self.stats["evicted"] += removed
+        return removed
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class WikipediaFetcher:
+    """
+    Shared, connection-pooled HTTP client for article pages.
+
+    Keeps connections alive across requests, asks for compressed bodies,
+    revalidates stored pages with conditional GETs and retries 429/5xx
+    responses and transport errors with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = FETCH_POOL_SIZE,
+        max_retries: int = FETCH_MAX_RETRIES,
+        backoff_seconds: float = FETCH_BACKOFF_SECONDS,
+        cache_dir: str = FETCH_CACHE_DIR,
+        origin: str = WIKIPEDIA_ORIGIN,
+        timeout: float = FETCH_TIMEOUT_SECONDS,
+    ):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.origin = origin
+        self.timeout = timeout
+        self.store = ResponseStore(cache_dir) if cache_dir else None
+        self.stats = {"requests": 0, "not_modified": 0, "retries": 0}
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            self._client = httpx.AsyncClient(
+                headers=HEADERS, timeout=self.timeout, limits=limits, follow_redirects=True
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _target(self, url: str) -> str:
+        if not self.origin:
+            return url
+        origin = urlsplit(self.origin)
+        parts = urlsplit(url)
+        return urlunsplit((origin.scheme, origin.netloc, parts.path, parts.query, ""))
+
+    async def fetch(self, url: str) -> bytes:
+        stored = await asyncio.to_thread(self.store.load, url) if self.store else None
+        headers = {}
+        if stored is not None:
+            if stored.etag:
+                headers["If-None-Match"] = stored.etag
+            if stored.last_modified:
+                headers["If-Modified-Since"] = stored.last_modified
+
+        response = await self._get_with_retries(self._target(url), headers)
+
+        if response.status_code == 304 and stored is not None:
+            self.stats["not_modified"] += 1
+            return stored.body
+
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if self.store and (etag or last_modified):
+            await asyncio.to_thread(self.store.save, url, etag, last_modified, response.content)
+        return response.content
+
+    async def _get_with_retries(self, url: str, headers: dict) -> httpx.Response:
+        attempt = 0
+        while True:
+            self.stats["requests"] += 1
+            try:
+                response = await self.client.get(url, headers=headers)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                delay = None
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = _retry_after_seconds(response.headers.get("Retry-After"))
+
+            if delay is None:
+                delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random() / 2)
+            attempt += 1
+            self.stats["retries"] += 1
+            logger.warning("Retrying %s in %.2fs (attempt %d/%d)", url, delay, attempt, self.max_retries)
+            await asyncio.sleep(min(delay, MAX_RETRY_AFTER_SECONDS))
+
+
+wikipedia_fetcher = WikipediaFetcher()
@@ -0,0 +1,74 @@
+import base64
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Quiz
+from models import QuizHistoryItem
+
+HISTORY_DEFAULT_LIMIT = int(os.getenv("HISTORY_DEFAULT_LIMIT", "50"))
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", "200"))
+
+
+def encode_cursor(date_generated: datetime, quiz_id: int) -> str:
+    raw = f"{date_generated.isoformat()}|{quiz_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        date_part, id_part = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid history cursor")
+
+
+async def fetch_history_page(
+    db: AsyncSession,
+    limit: int = HISTORY_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> Tuple[List[QuizHistoryItem], Optional[str]]:
+    """
+    One page of quiz history, newest first, plus the cursor for the next page.
+
+    Only the QuizHistoryItem columns are selected, and paging is keyset based
+    on (date_generated, id), so deep pages cost the same as the first one.
+    """
+    query = select(Quiz.id, Quiz.url, Quiz.title, Quiz.date_generated)
+
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Quiz.date_generated < cursor_date,
+            and_(Quiz.date_generated == cursor_date, Quiz.id < cursor_id),
+        ))
+    if title_prefix:
+        query = query.where(Quiz.title.startswith(title_prefix, autoescape=True))
+        if db.bind.dialect.name == "sqlite":
+            # SQLite's LIKE is case-insensitive and never uses the title index;
+            # a binary range on the same prefix does
+            upper = title_prefix[:-1] + chr(ord(title_prefix[-1]) + 1)
+            query = query.where(Quiz.title >= title_prefix, Quiz.title < upper)
+    if date_from:
+        query = query.where(Quiz.date_generated >= date_from)
+    if date_to:
+        query = query.where(Quiz.date_generated < date_to)
+
+    # Fetch one extra row to learn whether another page exists
+    query = query.order_by(Quiz.date_generated.desc(), Quiz.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.date_generated, last.id)
+
+    return [QuizHistoryItem.model_validate(row) for row in rows], next_cursor
@@ -0,0 +1,267 @@
+"""
+Build the local article store that CONTENT_SOURCE=dump reads from, by
+stream-parsing a Wikipedia dump. Pages are parsed one at a time and
+written as they are converted, so memory stays flat however large the dump.
+
+    python ingest_dump.py enwiki-latest-pages-articles.xml.bz2            # MediaWiki XML (wikitext)
+    python ingest_dump.py enwiki-NS0-ENTERPRISE-HTML.json.tar.gz --workers 4  # Enterprise HTML dump
+    python ingest_dump.py wikipedia_en_all_nopic.zim                       # Kiwix ZIM (needs libzim)
+"""
+import argparse
+import bz2
+import gzip
+import json
+import logging
+import multiprocessing
+import tarfile
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from itertools import islice
+from typing import Iterator, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from dump_store import DumpWriter, DUMP_STORE_PATH, wikipedia_host
+from scraper import EXTRACTORS, SCRAPER_ENGINE, build_article, resolve_engine
+from wikitext import extract_wikitext
+
+try:
+    from libzim.reader import Archive
+except ImportError:  # libzim is optional, only ZIM dumps need it
+    Archive = None
+
+# Pages handed to a worker process at a time
+BATCH_SIZE = 64
+
+
+class DumpPage(NamedTuple):
+    title: str
+    markup: str                # wikitext or HTML, per `kind`
+    kind: str                  # "wikitext" | "html"
+    redirect: Optional[str]    # target title when the page is a redirect
+
+
+def _open(path: str):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_xml_pages(path: str) -> Iterator[DumpPage]:
+    """Main-namespace pages of a MediaWiki XML export (pages-articles), compressed or not"""
+    with _open(path) as f:
+        events = ET.iterparse(f, events=("start", "end"))
+        _, root = next(events)
+        for event, element in events:
+            if event != "end" or not element.tag.endswith("}page") and element.tag != "page":
+                continue
+            fields = {child.tag.rsplit("}", 1)[-1]: child for child in element}
+            if fields.get("ns") is not None and fields["ns"].text == "0":
+                redirect = fields.get("redirect")
+                text = next((node.text for node in element.iter() if node.tag.rsplit("}", 1)[-1] == "text"), None) or ""
+                yield DumpPage(
+                    fields["title"].text,
+                    text,
+                    "wikitext",
+                    redirect.get("title") if redirect is not None else None,
+                )
+            # Drop the page and everything parsed before it, so memory stays flat
+            element.clear()
+            root.clear()
+
+
+def _iter_ndjson(lines) -> Iterator[dict]:
+    # Lines stay bytes: json.loads decodes UTF-8 itself
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if (record.get("namespace") or {}).get("identifier", 0) == 0:
+            yield record
+
+
+def _iter_html_records(path: str) -> Iterator[dict]:
+    """Main-namespace records of a Wikimedia Enterprise HTML dump: NDJSON, or a .tar.gz of NDJSON files"""
+    if path.endswith((".tar.gz", ".tgz")):
+        # Stream mode reads members in order without seeking back
+        with tarfile.open(path, "r|gz") as archive:
+            for member in archive:
+                if member.isfile():
+                    yield from _iter_ndjson(archive.extractfile(member))
+        return
+    with _open(path) as f:
+        yield from _iter_ndjson(f)
+
+
+def iter_html_pages(path: str) -> Iterator[DumpPage]:
+    """Pages of a Wikimedia Enterprise HTML dump"""
+    for record in _iter_html_records(path):
+        body = (record.get("article_body") or {}).get("html")
+        if body:
+            yield DumpPage(record["name"], body, "html", None)
+            for redirect in record.get("redirects") or ():
+                yield DumpPage(redirect["name"], "", "html", record["name"])
+
+
+def iter_zim_pages(path: str) -> Iterator[DumpPage]:
+    """Article entries of a Kiwix ZIM file"""
+    if Archive is None:
+        raise ValueError("ZIM dumps require the libzim package")
+    archive = Archive(path)
+    for entry_id in range(archive.entry_count):
+        entry = archive._get_entry_by_id(entry_id)
+        if entry.is_redirect:
+            yield DumpPage(entry.title, "", "html", entry.get_redirect_entry().title)
+            continue
+        item = entry.get_item()
+        if item.mimetype.startswith("text/html"):
+            yield DumpPage(entry.title, bytes(item.content).decode("utf-8", errors="replace"), "html", None)
+
+
+READERS = {"xml": iter_xml_pages, "html": iter_html_pages, "zim": iter_zim_pages}
+
+
+def _dbname_host(dbname: str) -> Optional[str]:
+    # enwiki, zh_yuewiki; other projects (enwiktionary, ...) are not Wikipedias
+    if dbname.endswith("wiki"):
+        return f"{dbname[:-len('wiki')].replace('_', '-')}.wikipedia.org"
+    return None
+
+
+def xml_host(path: str) -> Optional[str]:
+    """The wiki of a MediaWiki XML export, from its <siteinfo> <base> URL or <dbname>"""
+    found = {}
+    with _open(path) as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag in ("base", "dbname") and element.text:
+                found[tag] = element.text.strip()
+            elif tag in ("siteinfo", "page"):
+                break
+    if "base" in found:
+        return urlsplit(found["base"]).hostname
+    return _dbname_host(found["dbname"]) if "dbname" in found else None
+
+
+def html_host(path: str) -> Optional[str]:
+    """The wiki of an Enterprise HTML dump, from its first record"""
+    for record in _iter_html_records(path):
+        if record.get("url"):
+            return urlsplit(record["url"]).hostname
+        return _dbname_host((record.get("is_part_of") or {}).get("identifier", ""))
+    return None
+
+
+def zim_host(path: str) -> Optional[str]:
+    """The wiki a Kiwix ZIM file was made from, when its metadata names it"""
+    if Archive is None:
+        raise ValueError("ZIM dumps require the libzim package")
+    archive = Archive(path)
+    if "Source" not in archive.metadata_keys:
+        return None
+    return bytes(archive.get_metadata("Source")).decode("utf-8")
+
+
+HOST_READERS = {"xml": xml_host, "html": html_host, "zim": zim_host}
+
+
+def detect_format(path: str) -> str:
+    name = path.lower()
+    if name.endswith(".zim"):
+        return "zim"
+    if ".xml" in name:
+        return "xml"
+    if name.endswith((".ndjson", ".json", ".jsonl", ".tar.gz", ".tgz")) or ".json" in name:
+        return "html"
+    raise ValueError(f"Cannot tell the dump format of {path}; pass --format")
+
+
+def convert(page: DumpPage):
+    """('article', article), ('redirect', (title, target)) or ('skipped', title)"""
+    if page.redirect is not None:
+        return "redirect", (page.title, page.redirect)
+    try:
+        if page.kind == "wikitext":
+            extracted = extract_wikitext(page.title, page.markup)
+        else:
+            # Dumped HTML is the article body alone, without the page heading
+            extracted = EXTRACTORS[resolve_engine(SCRAPER_ENGINE)](page.markup)._replace(title=page.title)
+        return "article", build_article(extracted)
+    except ValueError:
+        # Stubs and disambiguation pages have too little prose for a quiz
+        return "skipped", page.title
+
+
+def convert_batch(pages: list) -> list:
+    return [convert(page) for page in pages]
+
+
+def _batches(pages: Iterator[DumpPage], size: int):
+    while True:
+        batch = list(islice(pages, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _converted(pages: Iterator[DumpPage], workers: int):
+    if workers <= 1:
+        yield from map(convert, pages)
+        return
+    # At most two batches per worker in flight, so a fast reader cannot
+    # queue up the whole dump in memory ahead of slower conversion
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for batch in _batches(pages, BATCH_SIZE):
+            pending.append(pool.apply_async(convert_batch, (batch,)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def ingest(path: str, store_path: str, fmt: str = None, workers: int = 1, limit: int = None, progress_every: int = 10_000,
+           host: str = None) -> dict:
+    fmt = fmt or detect_format(path)
+    host = host or HOST_READERS[fmt](path)
+    if wikipedia_host(host) is None:
+        raise ValueError(f"Cannot tell which Wikipedia {path} is from; pass --host")
+    pages = READERS[fmt](path)
+    if limit:
+        pages = islice(pages, limit)
+    started = time.perf_counter()
+    skipped = 0
+    with DumpWriter(store_path, host) as writer:
+        for done, (kind, value) in enumerate(_converted(pages, workers), 1):
+            if kind == "article":
+                writer.add(value)
+            elif kind == "redirect":
+                writer.add_redirect(*value)
+            else:
+                skipped += 1
+            if progress_every and done % progress_every == 0:
+                print(f"🔄 {done} pages, {done / (time.perf_counter() - started):.0f} pages/s")
+    return dict(writer.counts, host=writer.host, skipped=skipped, seconds=time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local article store from a Wikipedia dump")
+    parser.add_argument("dump", help="MediaWiki XML (.xml, .xml.bz2), Enterprise HTML (.ndjson, .tar.gz) or .zim")
+    parser.add_argument("--store", default=DUMP_STORE_PATH, help="Store directory (DUMP_STORE_PATH)")
+    parser.add_argument("--format", choices=sorted(READERS), help="Dump format, when the file name does not tell")
+    parser.add_argument("--workers", type=int, default=1, help="Processes converting pages")
+    parser.add_argument("--limit", type=int, help="Stop after this many pages")
+    parser.add_argument("--host", help="The dump's wiki (en.wikipedia.org), when the dump does not tell")
+    args = parser.parse_args()
+
+    # build_article logs every article it keeps or rejects
+    logging.getLogger("scraper").setLevel(logging.ERROR)
+    counts = ingest(args.dump, args.store, args.format, args.workers, args.limit, host=args.host)
+    print(f"✅ Stored {counts['articles']} articles and {counts['redirects']} redirects from {counts['host']} in {args.store} "
+          f"({counts['bytes'] / 2**20:.0f} MB) in {counts['seconds']:.0f}s; skipped {counts['skipped']} short pages")
+
+
+if __name__ == "__main__":
+    main()
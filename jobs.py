@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+
+import quiz_service
+from database import AsyncSessionLocal, Job
+from models import JobStatus, QuizOutput
+
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration (override through environment variables)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+PENDING_STATUSES = ("queued", "running")
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def to_job_status(job: Job) -> JobStatus:
+    quiz = QuizOutput(**json.loads(job.result)) if job.result else None
+    return JobStatus(
+        id=job.id,
+        url=job.url,
+        status=job.status,
+        stage=job.stage,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        quiz=quiz,
+    )
+
+
+class JobQueue:
+    """
+    Bounded worker pool that runs quiz generation jobs in the background.
+
+    Jobs are persisted in the jobs table and leased to the pool that holds
+    them, which renews the lease while it is alive. A job whose lease ran
+    out (its node stopped or died) is taken over by whichever pool notices
+    first, at start() or on a later heartbeat; jobs other nodes are still
+    working on are left alone.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_SIZE, session_factory=AsyncSessionLocal,
+                 lease_seconds: float = JOB_LEASE_SECONDS):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._session_factory = session_factory
+        self._queue = asyncio.Queue()
+        self._tasks = []
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def _lease(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    async def _recover(self) -> int:
+        """Take over the unfinished jobs whose lease expired, and queue them"""
+        now = datetime.utcnow()
+        # Jobs from before leases existed have none
+        expired = or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)
+        recovered = []
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(Job.id).where(Job.status.in_(PENDING_STATUSES), expired).order_by(Job.created_at)
+            )
+            for job_id in result.scalars().all():
+                # Conditional, so of two nodes recovering at once only one takes the job
+                taken = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status.in_(PENDING_STATUSES), expired)
+                    .values(status="queued", stage=None, owner=self.owner, lease_expires_at=self._lease())
+                )
+                if taken.rowcount:
+                    recovered.append(job_id)
+            await db.commit()
+
+        # Recovered jobs are always re-queued, even past max_queued
+        for job_id in recovered:
+            self._queue.put_nowait(job_id)
+        if recovered:
+            logger.info("Recovered %d unfinished quiz jobs", len(recovered))
+        return len(recovered)
+
+    async def _renew(self):
+        async with self._session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.owner == self.owner, Job.status.in_(PENDING_STATUSES))
+                .values(lease_expires_at=self._lease())
+            )
+            await db.commit()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._renew()
+                await self._recover()
+            except Exception as e:
+                logger.error("Job heartbeat failed: %s", e)
+
+    async def start(self):
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Give up the leases, so another node need not wait them out
+        async with self._session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.owner == self.owner, Job.status.in_(PENDING_STATUSES))
+                .values(lease_expires_at=None)
+            )
+            await db.commit()
+
+    async def submit(self, url: str, force_refresh: bool = False) -> Job:
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} pending jobs)")
+
+        job = Job(
+            id=uuid.uuid4().hex, url=url, force_refresh=force_refresh, status="queued",
+            owner=self.owner, lease_expires_at=self._lease(),
+        )
+        async with self._session_factory() as db:
+            db.add(job)
+            await db.commit()
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        async with self._session_factory() as db:
+            return await db.get(Job, job_id)
+
+    async def _update(self, job_id: str, **fields):
+        async with self._session_factory() as db:
+            job = await db.get(Job, job_id)
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = datetime.utcnow()
+            await db.commit()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job %s crashed: %s", job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.get(job_id)
+        # Another node took the job over while it waited here past its lease
+        if job is None or job.status in TERMINAL_STATUSES or job.owner != self.owner:
+            return
+
+        await self._update(job_id, status="running")
+
+        async def progress(stage: str):
+            await self._update(job_id, stage=stage)
+
+        try:
+            async with self._session_factory() as db:
+                quiz = await quiz_service.build_quiz(db, job.url, job.force_refresh, progress=progress)
+        except Exception as e:
+            await self._update(job_id, status="failed", stage=None, error=str(e))
+            return
+
+        await self._update(job_id, status="done", stage=None, result=json.dumps(quiz.model_dump()))
+
+
+job_queue = JobQueue()
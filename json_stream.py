@@ -0,0 +1,174 @@
+import json
+import logging
+from typing import AsyncIterator, List, Tuple
+
+from pydantic import ValidationError
+
+from models import QuizOutput, KeyEntity, Question
+from quiz_repair import answerable
+
+logger = logging.getLogger(__name__)
+
+# Top-level arrays whose elements are emitted one by one, and their event names
+STREAMED_ARRAYS = {"key_entities": "key_entity", "questions": "question"}
+ELEMENT_MODELS = {"key_entity": KeyEntity, "question": Question}
+# Checks beyond the model an element must pass, the same salvage_quiz applies
+ELEMENT_CHECKS = {"question": answerable}
+
+WHITESPACE = " \t\r\n"
+
+
+class QuizStreamParser:
+    """
+    Incremental parser for the quiz JSON object as it arrives from the LLM.
+
+    feed() takes raw text chunks and returns the events that became complete:
+    (key, value) for each top-level field, and ("key_entity", dict) /
+    ("question", dict) for every element of those arrays as soon as its
+    closing brace arrives. Anything before the first "{" (markdown fences,
+    prose) is skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.result = {}
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._key_start = None
+        self._expect_key = True
+        self._awaiting_value = False
+        self._value_start = None
+        self._array_event = None
+        self._awaiting_element = False
+        self._element_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        self.text += chunk
+        events = []
+        text = self.text
+        i = self._pos
+        while i < len(text) and not self.done:
+            ch = text[i]
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:i + 1])
+                        self._key_start = None
+                i += 1
+                continue
+
+            if ch in WHITESPACE:
+                i += 1
+                continue
+
+            # Mark where top-level values and array elements begin
+            if self._depth == 1 and self._awaiting_value:
+                self._awaiting_value = False
+                self._value_start = i
+            elif self._depth == 2 and self._awaiting_element and ch != "]":
+                self._awaiting_element = False
+                self._element_start = i
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_start = i
+            elif ch == ":" and self._depth == 1:
+                self._expect_key = False
+                self._awaiting_value = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 2 and ch == "[" and self._key in STREAMED_ARRAYS:
+                    self._array_event = STREAMED_ARRAYS[self._key]
+                    self.result[self._key] = []
+                    self._awaiting_element = True
+            elif ch == "," and self._depth == 2 and self._array_event:
+                events.append(self._close_element(i))
+                self._awaiting_element = True
+            elif ch in "}]":
+                if self._depth == 2 and ch == "]" and self._array_event:
+                    if self._element_start is not None:
+                        events.append(self._close_element(i))
+                    self._array_event = None
+                    self._awaiting_element = False
+                self._depth -= 1
+                if self._depth == 0:
+                    events.extend(self._close_value(i))
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                events.extend(self._close_value(i))
+            i += 1
+
+        self._pos = i
+        return events
+
+    def _close_element(self, end: int):
+        element = json.loads(self.text[self._element_start:end])
+        self._element_start = None
+        self.result[self._key].append(element)
+        return self._array_event, element
+
+    def _close_value(self, end: int):
+        events = []
+        if self._value_start is not None and self._key not in STREAMED_ARRAYS:
+            value = json.loads(self.text[self._value_start:end])
+            self.result[self._key] = value
+            events.append((self._key, value))
+        self._key = None
+        self._value_start = None
+        self._expect_key = True
+        return events
+
+
+async def stream_quiz_events(chunks: AsyncIterator[str]):
+    """
+    Turn streamed LLM text into validated quiz events.
+
+    Yields ("title" | "summary" | "related_topics", value),
+    ("key_entity", KeyEntity), ("question", Question) and finally
+    ("quiz", QuizOutput) assembled from everything that was emitted.
+    """
+    parser = QuizStreamParser()
+    validated = {event: [] for event in STREAMED_ARRAYS.values()}
+    async for chunk in chunks:
+        for event, value in parser.feed(chunk):
+            model = ELEMENT_MODELS.get(event)
+            if model is not None:
+                try:
+                    value = model(**value)
+                except (TypeError, ValidationError) as e:
+                    logger.warning("Skipping invalid %s: %s", event, e)
+                    continue
+                check = ELEMENT_CHECKS.get(event)
+                if check is not None and not check(value):
+                    logger.warning("Skipping invalid %s: failed %s", event, check.__name__)
+                    continue
+                validated[event].append(value)
+            yield event, value
+
+    if not parser.done:
+        raise ValueError("AI response ended before the quiz JSON was complete")
+    # Only elements that passed validation make it into the final quiz
+    result = dict(parser.result)
+    for key, event in STREAMED_ARRAYS.items():
+        if key in result:
+            result[key] = validated[event]
+    yield "quiz", QuizOutput(**result)
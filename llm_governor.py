@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from metrics import stage_timer
+from usage import usage_recorder
+
+logger = logging.getLogger(__name__)
+
+# LLM governor configuration (override through environment variables)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # calls in flight across all requests
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))  # 0 disables
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # 0 disables
+# A call that would wait longer than this for capacity is shed instead of queued
+LLM_MAX_WAIT_SECONDS = float(os.getenv("LLM_MAX_WAIT_SECONDS", "10"))
+LLM_MAX_QUEUED = int(os.getenv("LLM_MAX_QUEUED", "64"))
+# After the provider rejects a call for quota, hold every call back this long
+LLM_QUOTA_BACKOFF_SECONDS = float(os.getenv("LLM_QUOTA_BACKOFF_SECONDS", "10"))
+# Output tokens reserved per call until the response shows the real count
+LLM_OUTPUT_TOKENS_ESTIMATE = 1500
+
+
+class LLMOverloaded(Exception):
+    """The LLM has no capacity for this call within LLM_MAX_WAIT_SECONDS"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"LLM capacity exhausted ({reason}), retry in {math.ceil(retry_after)}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_quota_error(error: Exception) -> bool:
+    # google.api_core's ResourceExhausted carries code 429; other clients only the message
+    return getattr(error, "code", None) == 429 or str(error).startswith("429")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+class _Window:
+    """
+    Sliding-window budget counted the way the provider counts quota: the
+    amounts of the calls started in any `window` seconds add up to at most
+    `limit`. Reservations start in the order they were made.
+    """
+
+    def __init__(self, limit: int, window: float, clock):
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._entries = deque()   # [start time, amount], oldest first
+
+    def used(self) -> float:
+        cutoff = self._clock() - self.window
+        while self._entries and self._entries[0][0] <= cutoff:
+            self._entries.popleft()
+        return sum(amount for _, amount in self._entries)
+
+    def start_time(self, amount: float) -> float:
+        """When a call needing `amount` can start without exceeding the limit (inf: never)"""
+        if amount > self.limit:
+            return math.inf
+        now = self._clock()
+        total = self.used() + amount
+        start = max(now, self._entries[-1][0]) if self._entries else now
+        if total <= self.limit:
+            return start
+        # Slide the window past the oldest entries until the amount fits
+        for started, spent in self._entries:
+            total -= spent
+            if total <= self.limit:
+                return max(start, started + self.window)
+        return max(start, self._entries[-1][0] + self.window)
+
+    def reserve(self, at: float, amount: float) -> list:
+        entry = [at, amount]
+        self._entries.append(entry)
+        return entry
+
+    def cancel(self, entry: list):
+        if entry in self._entries:
+            self._entries.remove(entry)
+
+
+class LLMCall:
+    """Token accounting for one governed call"""
+
+    def __init__(self, prompt: str):
+        self.prompt_tokens = estimate_tokens(prompt)
+        self.reserved = self.prompt_tokens + LLM_OUTPUT_TOKENS_ESTIMATE
+        # A failed call is assumed to have spent its prompt tokens
+        self.used = self.prompt_tokens
+        self.token_entry = None
+        self.request_entry = None
+
+    def record(self, response_text: str):
+        self.used = self.prompt_tokens + estimate_tokens(response_text)
+
+
+class LLMGovernor:
+    """
+    Keeps LLM traffic inside the provider's limits: at most `concurrency`
+    calls in flight, and the tokens and requests started in any `window`
+    seconds under the configured quota. Calls queue for capacity; one that
+    would wait longer than max_wait, or arrives when max_queued calls are
+    already waiting, is shed with LLMOverloaded so the client gets a 503
+    with Retry-After rather than the provider's quota error. A quota error
+    that gets through anyway pauses every call for quota_backoff seconds.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = LLM_MAX_CONCURRENCY,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+        max_wait: float = LLM_MAX_WAIT_SECONDS,
+        max_queued: int = LLM_MAX_QUEUED,
+        quota_backoff: float = LLM_QUOTA_BACKOFF_SECONDS,
+        window: float = 60.0,  # the quota "minute"; benchmarks shorten it to compress time
+        clock=time.monotonic,
+    ):
+        if 0 < tokens_per_minute < LLM_OUTPUT_TOKENS_ESTIMATE:
+            # Every call reserves the output estimate, so none could ever start
+            raise ValueError(
+                f"LLM_TOKENS_PER_MINUTE must be 0 or at least {LLM_OUTPUT_TOKENS_ESTIMATE}, the output tokens reserved per call"
+            )
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.max_queued = max_queued
+        self.quota_backoff = quota_backoff
+        self._clock = clock
+        self._slots = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+        self._tokens = _Window(tokens_per_minute, window, clock) if tokens_per_minute > 0 else None
+        self._requests = _Window(requests_per_minute, window, clock) if requests_per_minute > 0 else None
+        self._paused_until = 0.0
+        self.waiting = 0
+        self.active = 0
+        self.stats = {"calls": 0, "queued": 0, "shed": {}, "provider_quota_errors": 0, "tokens": 0}
+
+    @asynccontextmanager
+    async def slot(self, prompt: str):
+        """
+        Hold one unit of LLM capacity around a call. Record the response on
+        the yielded LLMCall so the token budget is charged for what was used.
+        """
+        call = LLMCall(prompt)
+        with stage_timer("llm_queue"):
+            await self._acquire(call)
+        self.active += 1
+        try:
+            yield call
+        except Exception as e:
+            if not is_quota_error(e):
+                raise
+            self.stats["provider_quota_errors"] += 1
+            self._paused_until = max(self._paused_until, self._clock() + self.quota_backoff)
+            logger.warning("Provider quota exceeded, holding LLM calls for %.0fs: %s", self.quota_backoff, e)
+            raise LLMOverloaded("provider_quota", self.quota_backoff) from e
+        finally:
+            self.active -= 1
+            self._release(call)
+
+    def _shed(self, reason: str, retry_after: float):
+        self.stats["shed"][reason] = self.stats["shed"].get(reason, 0) + 1
+        raise LLMOverloaded(reason, retry_after)
+
+    async def _acquire(self, call: LLMCall):
+        started = self._clock()
+        deadline = started + self.max_wait
+        paused = self._paused_until - started
+        if paused > self.max_wait:
+            self._shed("provider_quota", paused)
+        if self.waiting >= self.max_queued:
+            self._shed("queue_full", self.max_wait)
+
+        self.waiting += 1
+        holds_slot = False
+        try:
+            if paused > 0:
+                await asyncio.sleep(paused)
+            if self._slots is not None:
+                if self._slots.locked():
+                    self.stats["queued"] += 1
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - self._clock()))
+                except asyncio.TimeoutError:
+                    self._shed("concurrency", self.max_wait)
+                holds_slot = True
+
+            # Book the call into both windows at the first moment both allow it
+            now = self._clock()
+            start = now
+            reason = None
+            for name, window, amount in (
+                ("tokens_per_minute", self._tokens, call.reserved),
+                ("requests_per_minute", self._requests, 1),
+            ):
+                if window is not None:
+                    at = window.start_time(amount)
+                    if at == math.inf:
+                        # Larger than the whole window: waiting would never help
+                        self._shed("too_large", window.window)
+                    if at > start:
+                        start, reason = at, name
+            if reason is not None and start > deadline:
+                self._shed(reason, start - now)
+            if self._tokens is not None:
+                call.token_entry = self._tokens.reserve(start, call.reserved)
+            if self._requests is not None:
+                call.request_entry = self._requests.reserve(start, 1)
+            if start > now:
+                await asyncio.sleep(start - now)
+        except BaseException:
+            if holds_slot:
+                self._slots.release()
+            self._cancel(call)
+            raise
+        finally:
+            self.waiting -= 1
+
+    def _cancel(self, call: LLMCall):
+        if call.token_entry is not None:
+            self._tokens.cancel(call.token_entry)
+        if call.request_entry is not None:
+            self._requests.cancel(call.request_entry)
+
+    def _release(self, call: LLMCall):
+        if self._slots is not None:
+            self._slots.release()
+        # Settle the reservation against what the call actually used
+        if call.token_entry is not None:
+            call.token_entry[1] = call.used
+        self.stats["calls"] += 1
+        self.stats["tokens"] += call.used
+        usage_recorder.record_current(llm_calls=1, llm_tokens=call.used)
+
+    def has_spare_capacity(self, share: float) -> bool:
+        """
+        True when no call is waiting or held back and less than `share` of
+        the concurrency and token budget is in use. Background work checks
+        this so that it only runs on capacity requests are leaving idle.
+        """
+        if self.waiting or self._paused_until > self._clock():
+            return False
+        if self._slots is not None and self.active >= self.concurrency * share:
+            return False
+        return self._tokens is None or self._tokens.used() < self._tokens.limit * share
+
+    def snapshot(self) -> dict:
+        return dict(
+            self.stats,
+            active=self.active,
+            waiting=self.waiting,
+            paused_for_seconds=round(max(0.0, self._paused_until - self._clock()), 1),
+            tokens_available=round(self._tokens.limit - self._tokens.used()) if self._tokens is not None else None,
+        )
+
+llm_governor = LLMGovernor()
@@ -1,7 +1,9 @@
+import asyncio
 import os
 import google.generativeai as genai
 import json
 from dotenv import load_dotenv
+from condense import condense
 from models import QuizOutput
 
 load_dotenv()
@@ -15,14 +17,16 @@ class LLMQuizGenerator:
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-pro')
     
-    def generate_quiz(self, title: str, content: str) -> QuizOutput:
+    async def generate_quiz(self, title: str, content: str) -> QuizOutput:
         try:
+            # Callers may pass the whole article; keep the prompt within PROMPT_TOKEN_BUDGET
+            content = (await asyncio.to_thread(condense, None, content)).text
             prompt = f"""
             Create an educational quiz based on this Wikipedia article in strict JSON format:
             
             Title: {title}
             
-            Content: {content[:8000]}
+            Content: {content}
             
             Generate the following structure:
             {{
@@ -54,7 +58,7 @@ class LLMQuizGenerator:
             - Return ONLY valid JSON, no other text
             """
             
-            response = self.model.generate_content(prompt)
+            response = await self.model.generate_content_async(prompt)
             response_text = response.text.strip()
             
             # Clean the response (remove markdown code blocks if present)
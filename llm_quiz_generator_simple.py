@@ -1,119 +1,494 @@
+import asyncio
+import inspect
+import logging
 import os
-import google.generativeai as genai
 import json
+import time
 from dotenv import load_dotenv
 from models import QuizOutput
+from json_stream import stream_quiz_events
+from map_reduce import group_sections, questions_per_group, parse_section_quiz, merge_section_quizzes
+from quiz_repair import MIN_QUESTIONS, repair_json, salvage_quiz
+from model_router import ModelRouter
+from metrics import LLM_PROMPT_CHARS, LLM_RESPONSE_CHARS, stage_timer
+from llm_governor import llm_governor, LLMOverloaded
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Use the available Gemini 2.0 models from your list, in order of preference
+MODEL_CANDIDATES = [
+    'models/gemini-2.0-flash',           # Fast and capable
+    'models/gemini-2.0-flash-001',       # Specific version
+    'models/gemini-2.0-flash-lite',      # Lite version
+    'models/gemini-2.0-flash-lite-001',  # Lite specific version
+    'models/gemini-2.0-pro-exp',         # Pro experimental
+    'models/gemini-flash-latest',        # Latest flash
+    'models/gemini-pro-latest',          # Latest pro
+]
+
+# Model resolution (override through environment variables)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "")  # skip probing and use this model
+MODEL_PROBE_TIMEOUT_SECONDS = float(os.getenv("MODEL_PROBE_TIMEOUT_SECONDS", "10"))
+MODEL_CACHE_PATH = os.getenv("MODEL_CACHE_PATH", ".gemini_model.json")  # empty disables it
+MODEL_CACHE_TTL_SECONDS = float(os.getenv("MODEL_CACHE_TTL_SECONDS", "86400"))
+# Route requests across every candidate, starting from the resolved model (see model_router)
+MODEL_ROUTER = os.getenv("MODEL_ROUTER", "1") == "1"
+
+# Response decoding (override through environment variables)
+GEMINI_JSON_MODE = os.getenv("GEMINI_JSON_MODE", "schema").lower()  # schema, json or off
+LLM_FULL_RETRIES = int(os.getenv("LLM_FULL_RETRIES", "1"))  # whole-quiz retries once repair fails
+
+# Map-reduce generation for long articles (override through environment variables)
+MAP_REDUCE_MAX_SECTIONS = int(os.getenv("MAP_REDUCE_MAX_SECTIONS", "8"))  # parallel section prompts
+MAP_REDUCE_SECTION_TOKENS = int(os.getenv("MAP_REDUCE_SECTION_TOKENS", "800"))  # article text per prompt
+MAP_REDUCE_QUESTIONS = int(os.getenv("MAP_REDUCE_QUESTIONS", "10"))
+
 class LLMQuizGenerator:
-    def __init__(self):
+    """
+    Gemini-backed quiz generator.
+
+    Nothing touches the network until the first quiz is requested: the
+    working model is resolved then by probing every candidate concurrently,
+    and its name is cached on disk so later processes skip the probes.
+    With MODEL_ROUTER on, the resolved model is only the first choice of a
+    ModelRouter over all candidates. Passing a model (anything with
+    generate_content_async, such as a ModelRouter) skips resolution.
+    Every call takes capacity from the LLM governor (the shared
+    llm_governor unless one is passed).
+    """
+
+    def __init__(
+        self,
+        model=None,
+        model_names: list = None,
+        cache_path: str = MODEL_CACHE_PATH,
+        probe_timeout: float = MODEL_PROBE_TIMEOUT_SECONDS,
+        cache_ttl: float = MODEL_CACHE_TTL_SECONDS,
+        governor=None,
+    ):
+        self.model_names = model_names or MODEL_CANDIDATES
+        self.cache_path = cache_path
+        self.probe_timeout = probe_timeout
+        self.cache_ttl = cache_ttl
+        self.model = model
+        self.governor = governor or llm_governor
+        self._resolve_lock = asyncio.Lock()
+        # JSON response mode for the full quiz prompt and for the others;
+        # set when the SDK supports it
+        self.quiz_config = None
+        self.json_config = None
+        self.repair_stats = {
+            "responses": 0,
+            "clean": 0,
+            "repaired": 0,
+            "followups": 0,
+            "followup_failures": 0,
+            "full_retries": 0,
+            "failed": 0,
+            "repairs": {},
+        }
+
+    async def get_model(self):
+        if self.model is None:
+            async with self._resolve_lock:
+                if self.model is None:
+                    self.model = await self._resolve_model()
+        return self.model
+
+    async def _resolve_model(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
+            raise RuntimeError("GEMINI_API_KEY not found in environment variables")
+
+        # Deferred: the SDK takes about a second to import
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
-        
-        # Use the available Gemini 2.0 models from your list
-        model_names = [
-            'models/gemini-2.0-flash',           # Fast and capable
-            'models/gemini-2.0-flash-001',       # Specific version
-            'models/gemini-2.0-flash-lite',      # Lite version
-            'models/gemini-2.0-flash-lite-001',  # Lite specific version
-            'models/gemini-2.0-pro-exp',         # Pro experimental
-            'models/gemini-flash-latest',        # Latest flash
-            'models/gemini-pro-latest',          # Latest pro
+
+        self.quiz_config, self.json_config = _json_generation_configs(genai)
+        name = await self._resolve_name(genai)
+        if not MODEL_ROUTER:
+            return genai.GenerativeModel(name)
+        names = [name] + [n for n in self.model_names if n != name]
+        logger.info("Routing across %d models, preferring %s", len(names), name)
+        return ModelRouter([(n, genai.GenerativeModel(n)) for n in names], governor=self.governor)
+
+    async def _resolve_name(self, genai) -> str:
+        if GEMINI_MODEL:
+            return GEMINI_MODEL
+        cached_name = self._load_cached_name()
+        if cached_name:
+            logger.info("Using cached model choice: %s", cached_name)
+            return cached_name
+
+        logger.info("Probing %d models concurrently", len(self.model_names))
+        probes = [
+            asyncio.ensure_future(self._probe(genai.GenerativeModel(name), name))
+            for name in self.model_names
         ]
+        try:
+            # Probes run together but are taken in preference order, so we
+            # only wait as long as the best working model takes to answer
+            for name, probe in zip(self.model_names, probes):
+                if await probe:
+                    logger.info("Successfully initialized working model: %s", name)
+                    self._save_cached_name(name)
+                    return name
+        finally:
+            for probe in probes:
+                probe.cancel()
+
+        raise RuntimeError("No working Gemini model found from available options.")
+
+    async def _probe(self, model, name: str) -> bool:
+        try:
+            response = await asyncio.wait_for(
+                model.generate_content_async("Say 'Hello' in one word."), self.probe_timeout
+            )
+            return bool(response.text)
+        except asyncio.TimeoutError:
+            logger.warning("Failed to initialize %s: no answer within %ss", name, self.probe_timeout)
+        except Exception as e:
+            logger.warning("Failed to initialize %s: %s", name, e)
+        return False
+
+    def _load_cached_name(self):
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("model") not in self.model_names:
+            return None
+        if time.time() - cached.get("resolved_at", 0) > self.cache_ttl:
+            return None
+        return cached["model"]
+
+    def _save_cached_name(self, name: str):
+        if not self.cache_path:
+            return
+        try:
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"model": name, "resolved_at": time.time()}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("Could not cache model choice: %s", e)
+
+    def build_prompt(self, title: str, content: str) -> str:
+        # Optimized prompt for Gemini 2.0. Questions come right after the
+        # summary so a streamed response reaches them as early as possible.
+        return f"""
+        Create an educational quiz based on this Wikipedia article. Return ONLY valid JSON.
+
+        ARTICLE TITLE: {title}
         
-        self.model = None
-        working_model = None
+        ARTICLE CONTENT: {content}
         
-        for model_name in model_names:
+        Generate a quiz with this exact JSON structure:
+        {{
+            "title": "string (the article title)",
+            "summary": "string (2-3 paragraph concise summary of the article)",
+            "questions": [
+                {{
+                    "question": "string (multiple choice question)",
+                    "options": ["option A", "option B", "option C", "option D"],
+                    "correct_answer": "string (the correct option)",
+                    "explanation": "string (educational explanation)"
+                }}
+            ],
+            "key_entities": [
+                {{
+                    "name": "string (important person, concept, or thing)",
+                    "description": "string (brief description)",
+                    "relevance": "string (why this is important to the topic)"
+                }}
+            ],
+            "related_topics": ["string", "string", "string"]
+        }}
+        
+        Requirements:
+        - Create 5-7 multiple choice questions
+        - Include 3-4 key entities  
+        - Include 3-4 related topics
+        - Questions should test understanding, not just recall
+        - Make explanations educational and clear
+        - Return ONLY the JSON object, no other text or markdown
+        """
+
+    def build_followup_prompt(self, title: str, content: str, salvaged) -> str:
+        # Only ask for what the first response did not deliver
+        fields = {
+            "summary": '"summary": "string (2-3 paragraph concise summary of the article)"',
+            "questions": '"questions": [{"question": "string", "options": ["A", "B", "C", "D"], "correct_answer": "string (one of the options)", "explanation": "string"}]',
+            "key_entities": '"key_entities": [{"name": "string", "description": "string", "relevance": "string"}]',
+            "related_topics": '"related_topics": ["string", "string", "string"]',
+        }
+        have = [q.question for q in salvaged.data["questions"]]
+        needed = max(1, MIN_QUESTIONS - len(have))
+        existing = "\n".join(f"        - {q}" for q in have) or "        (none)"
+        return f"""
+        Complete a partially generated quiz about this Wikipedia article. Return ONLY valid JSON.
+
+        ARTICLE TITLE: {title}
+
+        ARTICLE CONTENT: {content}
+
+        MISSING FIELDS: {", ".join(salvaged.missing)}
+
+        QUESTIONS NEEDED: {needed if "questions" in salvaged.missing else 0}
+
+        Questions the quiz already has (do not repeat them):
+{existing}
+
+        Return a JSON object with only these fields:
+        {{
+            {", ".join(fields[f] for f in salvaged.missing)}
+        }}
+        """
+
+    async def generate_quiz(self, title: str, content: str) -> QuizOutput:
+        prompt = self.build_prompt(title, content)
+        for attempt in range(LLM_FULL_RETRIES + 1):
             try:
-                print(f"🔄 Trying to initialize model: {model_name}")
-                self.model = genai.GenerativeModel(model_name)
-                # Test with a simple prompt
-                test_response = self.model.generate_content("Say 'Hello' in one word.")
-                if test_response.text:
-                    working_model = model_name
-                    print(f"✅ Successfully initialized working model: {model_name}")
-                    break
+                logger.debug("Sending request to Gemini API")
+                text = await self._call_model("quiz", prompt, generation_config=self.quiz_config)
+                logger.debug("Received response from Gemini API")
+                quiz = await self._recover(title, content, text)
+                logger.info("Generated quiz with %d questions", len(quiz.questions))
+                return quiz
+            except LLMOverloaded:
+                # Retrying now would only queue behind the same shortage
+                raise
             except Exception as e:
-                print(f"❌ Failed to initialize {model_name}: {e}")
-                continue
-        
-        if not working_model:
-            raise ValueError("No working Gemini model found from available options.")
-    
-    def generate_quiz(self, title: str, content: str) -> QuizOutput:
+                logger.warning("Quiz generation error: %s", e)
+                if attempt < LLM_FULL_RETRIES:
+                    self.repair_stats["full_retries"] += 1
+                    continue
+                self.repair_stats["failed"] += 1
+                raise Exception(f"Failed to generate quiz: {str(e)}")
+
+    async def _call_model(self, kind: str, prompt: str, **kwargs) -> str:
+        model = await self.get_model()
+        LLM_PROMPT_CHARS.observe(len(prompt), kind=kind)
+        async with self.governor.slot(prompt) as call:
+            with stage_timer("llm"):
+                response = await model.generate_content_async(prompt, **kwargs)
+                text = response.text
+            call.record(text)
+        LLM_RESPONSE_CHARS.observe(len(text), kind=kind)
+        return text
+
+    async def _recover(self, title: str, content: str, text: str) -> QuizOutput:
+        """
+        Turn a response into a quiz, repairing what can be repaired locally
+        and asking the model only for the fields that are still missing.
+        Raises ValueError when not even one usable question is left.
+        """
+        self.repair_stats["responses"] += 1
+        with stage_timer("json_parse"):
+            data, repairs = repair_json(text)
+        with stage_timer("validate"):
+            salvaged = salvage_quiz(data, title)
+        for repair in repairs + (["dropped_elements"] if salvaged.dropped else []):
+            self.repair_stats["repairs"][repair] = self.repair_stats["repairs"].get(repair, 0) + 1
+        if not repairs and not salvaged.dropped and not salvaged.missing:
+            self.repair_stats["clean"] += 1
+        else:
+            self.repair_stats["repaired"] += 1
+            logger.info("Repaired AI response (%s), missing: %s", ", ".join(repairs) or "schema", salvaged.missing or "nothing")
+
+        quiz = salvaged.data
+        if salvaged.missing:
+            self.repair_stats["followups"] += 1
+            try:
+                text = await self._call_model(
+                    "followup", self.build_followup_prompt(title, content, salvaged), generation_config=self.json_config
+                )
+                with stage_timer("json_parse"):
+                    data = repair_json(text)[0]
+                extra = salvage_quiz(data, title).data
+                for field in salvaged.missing:
+                    quiz[field] = quiz[field] + extra[field] if field != "summary" else extra[field]
+            except Exception as e:
+                self.repair_stats["followup_failures"] += 1
+                logger.warning("Follow-up request failed: %s", e)
+
+        if not quiz["questions"]:
+            raise ValueError("AI response contained no usable questions")
+        with stage_timer("validate"):
+            return QuizOutput(**quiz)
+
+    async def _stream_text(self, prompt: str, received: list):
+        model = await self.get_model()
+        LLM_PROMPT_CHARS.observe(len(prompt), kind="stream")
+        # Holds its capacity and times the whole response, not just the first chunk
+        async with self.governor.slot(prompt) as call:
+            with stage_timer("llm"):
+                response = await model.generate_content_async(prompt, stream=True, generation_config=self.quiz_config)
+                async for chunk in response:
+                    if chunk.text:
+                        received.append(chunk.text)
+                        yield chunk.text
+            call.record("".join(received))
+        LLM_RESPONSE_CHARS.observe(sum(map(len, received)), kind="stream")
+
+    async def generate_quiz_stream(self, title: str, content: str):
+        """
+        Stream the quiz as it is generated: yields (event, value) pairs for
+        the summary, each KeyEntity and each Question as soon as it is
+        complete, then ("quiz", QuizOutput) once the response has ended.
+
+        Questions are checked like generate_quiz checks them before they are
+        sent. Once the response has ended it goes through the same recovery
+        as generate_quiz (repair, then a follow-up call for missing fields),
+        and whatever was not already emitted follows before the quiz.
+        """
+        logger.debug("Streaming request to Gemini API")
+        received = []
+        emitted = set()
+        text = self._stream_text(self.build_prompt(title, content), received)
         try:
-            # Optimized prompt for Gemini 2.0
-            prompt = f"""
-            Create an educational quiz based on this Wikipedia article. Return ONLY valid JSON.
-
-            ARTICLE TITLE: {title}
-            
-            ARTICLE CONTENT: {content[:5000]}
-            
-            Generate a quiz with this exact JSON structure:
-            {{
-                "title": "string (the article title)",
-                "summary": "string (2-3 paragraph concise summary of the article)",
-                "key_entities": [
-                    {{
-                        "name": "string (important person, concept, or thing)",
-                        "description": "string (brief description)",
-                        "relevance": "string (why this is important to the topic)"
-                    }}
-                ],
-                "related_topics": ["string", "string", "string"],
-                "questions": [
-                    {{
-                        "question": "string (multiple choice question)",
-                        "options": ["option A", "option B", "option C", "option D"],
-                        "correct_answer": "string (the correct option)",
-                        "explanation": "string (educational explanation)"
-                    }}
-                ]
-            }}
-            
-            Requirements:
-            - Create 5-7 multiple choice questions
-            - Include 3-4 key entities  
-            - Include 3-4 related topics
-            - Questions should test understanding, not just recall
-            - Make explanations educational and clear
-            - Return ONLY the JSON object, no other text or markdown
-            """
-            
-            print("🔄 Sending request to Gemini API...")
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            print("✅ Received response from Gemini API")
-            
-            # Clean the response
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            
-            print(f"Response preview: {response_text[:200]}...")
-            
-            # Parse JSON response
-            quiz_dict = json.loads(response_text)
-            
-            # Validate required structure
-            required_fields = ['title', 'summary', 'key_entities', 'related_topics', 'questions']
-            for field in required_fields:
-                if field not in quiz_dict:
-                    raise ValueError(f"Missing required field: {field}")
-            
-            print(f"✅ Successfully generated quiz with {len(quiz_dict['questions'])} questions")
-            return QuizOutput(**quiz_dict)
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON decode error: {e}")
-            print(f"Raw response: {response_text}")
-            raise Exception(f"Failed to parse AI response as JSON: {str(e)}")
+            async for event, value in stream_quiz_events(text):
+                if event == "quiz":
+                    continue
+                emitted.add(value.question if event == "question" else event)
+                yield event, value
+        except ValueError as e:
+            logger.warning("Streamed response needs repair: %s", e)
+            # The parser may have given up mid-stream; take in the rest first
+            async for _ in text:
+                pass
+        try:
+            quiz = await self._recover(title, content, "".join(received))
         except Exception as e:
-            print(f"❌ Quiz generation error: {e}")
+            self.repair_stats["failed"] += 1
             raise Exception(f"Failed to generate quiz: {str(e)}")
+        for event, value in _replay_missing(quiz, emitted):
+            yield event, value
+        logger.debug("Finished streaming response from Gemini API")
+
+    def build_section_prompt(self, title: str, heading: str, content: str, num_questions: int) -> str:
+        return f"""
+        Create quiz material from ONE section of a Wikipedia article. Return ONLY valid JSON.
+
+        ARTICLE TITLE: {title}
+
+        SECTION: {heading}
+
+        SECTION CONTENT: {content}
+
+        Generate this exact JSON structure:
+        {{
+            "summary": "string (2-3 sentence summary of this section)",
+            "questions": [
+                {{
+                    "question": "string (multiple choice question)",
+                    "options": ["option A", "option B", "option C", "option D"],
+                    "correct_answer": "string (the correct option)",
+                    "explanation": "string (educational explanation)"
+                }}
+            ],
+            "key_entities": [
+                {{
+                    "name": "string (important person, concept, or thing)",
+                    "description": "string (brief description)",
+                    "relevance": "string (why this is important to the topic)"
+                }}
+            ],
+            "related_topics": ["string", "string"]
+        }}
+
+        Requirements:
+        - Create {num_questions} multiple choice questions answerable from this section alone
+        - Include 1-2 key entities and 1-2 related topics
+        - correct_answer must be exactly one of the options
+        - Return ONLY the JSON object, no other text or markdown
+        """
+
+    async def _generate_section(self, title: str, heading: str, content: str, num_questions: int):
+        text = await self._call_model(
+            "section", self.build_section_prompt(title, heading, content, num_questions), generation_config=self.json_config
+        )
+        with stage_timer("json_parse"):
+            return parse_section_quiz(heading, text.strip())
+
+    async def generate_quiz_map_reduce(self, title: str, sections: list) -> QuizOutput:
+        """
+        Generate from long articles section by section: the article is split
+        into at most MAP_REDUCE_MAX_SECTIONS groups of sections, each group
+        gets its own smaller prompt, all prompts run in parallel, and the
+        partial results are merged and deduplicated locally.
+
+        Sections that fail are left out; it only fails if every section does.
+        """
+        groups = await asyncio.to_thread(
+            group_sections, sections, MAP_REDUCE_MAX_SECTIONS, MAP_REDUCE_SECTION_TOKENS
+        )
+        num_questions = questions_per_group(MAP_REDUCE_QUESTIONS, len(groups))
+
+        logger.debug("Sending %d section requests to Gemini API", len(groups))
+        results = await asyncio.gather(
+            *(self._generate_section(title, g.heading, g.content, num_questions) for g in groups),
+            return_exceptions=True,
+        )
+        parts = []
+        for group, result in zip(groups, results):
+            if isinstance(result, Exception):
+                logger.warning("Section '%s' failed: %s", group.heading, result)
+            else:
+                parts.append(result)
+        if not parts:
+            overloaded = [result for result in results if isinstance(result, LLMOverloaded)]
+            if overloaded:
+                raise overloaded[0]
+            raise Exception(f"Failed to generate quiz: all {len(groups)} section requests failed")
+
+        quiz = merge_section_quizzes(title, parts, MAP_REDUCE_QUESTIONS)
+        logger.info("Merged %d/%d sections into %d questions", len(parts), len(groups), len(quiz.questions))
+        return quiz
+
+def _json_generation_configs(genai):
+    """
+    (config for the full quiz prompt, config for other JSON prompts).
+
+    Asks for JSON output where the installed SDK supports it
+    (response_mime_type), with the quiz constrained to the QuizOutput
+    schema where it also supports response_schema. Older SDKs get None
+    and rely on the prompt and on repair.
+    """
+    config_class = getattr(genai, "GenerationConfig", None)
+    supported = inspect.signature(config_class).parameters if config_class else {}
+    if GEMINI_JSON_MODE == "off" or "response_mime_type" not in supported:
+        return None, None
+    json_config = {"response_mime_type": "application/json"}
+    if GEMINI_JSON_MODE == "schema" and "response_schema" in supported:
+        return dict(json_config, response_schema=QuizOutput), json_config
+    return json_config, json_config
+
+
+def _replay_missing(quiz: QuizOutput, emitted: set):
+    """Events for the parts of a recovered quiz the stream did not already emit"""
+    for key in ("title", "summary"):
+        if key not in emitted:
+            yield key, getattr(quiz, key)
+    for question in quiz.questions:
+        if question.question not in emitted:
+            yield "question", question
+    if "key_entity" not in emitted:
+        for entity in quiz.key_entities:
+            yield "key_entity", entity
+    if "related_topics" not in emitted:
+        yield "related_topics", quiz.related_topics
+    yield "quiz", quiz
+
 
-quiz_generator = LLMQuizGenerator()
\ No newline at end of file
+# QUIZ_LLM_BACKEND=fake swaps in an offline generator for local runs and benchmarks
+if os.getenv("QUIZ_LLM_BACKEND", "gemini").lower() == "fake":
+    from fake_llm import FakeQuizGenerator
+    quiz_generator = FakeQuizGenerator()
+else:
+    quiz_generator = LLMQuizGenerator()
\ No newline at end of file
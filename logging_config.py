@@ -0,0 +1,59 @@
+import json
+import logging
+import os
+import random
+import sys
+
+# Logging configuration (override through environment variables)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # text or json
+# Share of DEBUG/INFO records kept; warnings and errors are never sampled
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+# Libraries that log every query or request at DEBUG/INFO; kept at WARNING
+QUIET_LOGGERS = ("aiosqlite", "httpx", "httpcore", "sqlalchemy.engine", "asyncio")
+
+
+class SamplingFilter(logging.Filter):
+    """Drops a random share of records below WARNING"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, sample_rate: float = LOG_SAMPLE_RATE):
+    """Install one stderr handler on the root logger; repeat calls replace it"""
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    if sample_rate < 1.0:
+        handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if getattr(existing, "_quiz_handler", False):
+            root.removeHandler(existing)
+    handler._quiz_handler = True
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
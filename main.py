@@ -1,15 +1,56 @@
-from fastapi import FastAPI, Depends, HTTPException
+from logging_config import configure_logging
+
+# Before the project imports below, some of which log at import time
+configure_logging()
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
+from datetime import datetime
+import asyncio
 import json
-from typing import List
+import math
+import os
+import zlib
+from typing import List, Optional
+
+from database import get_db, init_db, AsyncSessionLocal, Quiz
+from models import URLRequest, QuizHistoryItem, QuizOutput, JobStatus, SearchResult
+from quiz_service import build_quiz, stream_quiz, coalescing_stats, repair_stats, router_stats
+from quiz_cache import quiz_cache, normalize_url
+from near_duplicates import near_duplicate_index
+from jobs import job_queue, JobQueueFull, to_job_status, TERMINAL_STATUSES
+from fetcher import wikipedia_fetcher
+from batch import QuizBatch, BATCH_MAX_URLS
+from history import fetch_history_page, HISTORY_DEFAULT_LIMIT, HISTORY_MAX_LIMIT
+from search import search_quizzes, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
+from storage import quiz_json_bytes
+from rate_limit import rate_limiter, client_address
+from llm_governor import llm_governor, LLMOverloaded
+from usage import usage_recorder, current_client
+from prefetch import prefetcher
+import metrics
 
-from database import get_db, Quiz
-from models import URLRequest, QuizHistoryItem, QuizOutput
-from scraper import scrape_wikipedia
-from llm_quiz_generator_simple import quiz_generator
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
 
-app = FastAPI(title="AI Wiki Quiz Generator", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    await job_queue.start()
+    await usage_recorder.start()
+    await prefetcher.start()
+    yield
+    await prefetcher.stop()
+    await job_queue.stop()
+    await usage_recorder.stop()
+    await wikipedia_fetcher.aclose()
+
+app = FastAPI(title="AI Wiki Quiz Generator", version="1.0.0", lifespan=lifespan)
+
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 # CORS configuration for production with your exact Vercel URL
 app.add_middleware(
@@ -24,57 +65,273 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Accept"],  # Specific headers
+    allow_headers=["Content-Type", "Authorization", "Accept", "X-API-Key"],  # Specific headers
+    expose_headers=["X-Next-Cursor", "X-Next-Offset", "Retry-After", "X-RateLimit-Limit", "X-RateLimit-Remaining"],
 )
 
+def _client(http_request: Request) -> str:
+    peer = http_request.client.host if http_request.client else None
+    host = client_address(http_request.headers.getlist("x-forwarded-for"), peer)
+    return rate_limiter.client_id(http_request.headers.get("x-api-key"), host)
+
+async def _admit(http_request: Request, endpoint: str, cost: int = 1):
+    """
+    Charge the request to its client's rate limit, raising 429 when the
+    bucket is empty. Also tags the request so its LLM usage is recorded.
+    """
+    client = _client(http_request)
+    current_client.set((client, endpoint))
+    try:
+        decision = await rate_limiter.check(endpoint, client, cost)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if decision is not None and not decision.allowed:
+        usage_recorder.record(client, endpoint, rejected=1)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit of {decision.rate} exceeded, retry in {decision.headers()['Retry-After']}s",
+            headers=decision.headers(),
+        )
+    usage_recorder.record(client, endpoint, requests=cost)
+
+async def _cached_or_admit(http_request: Request, db: AsyncSession, request: URLRequest) -> Optional[QuizOutput]:
+    """
+    The quiz already cached for the URL, if any, which is served without
+    drawing on the generate limit; otherwise the request is admitted (see
+    _admit) because it goes on to scrape and generate.
+    """
+    if not request.force_refresh:
+        cached_quiz = await quiz_cache.get_by_url(db, normalize_url(request.url))
+        if cached_quiz is not None:
+            usage_recorder.record(_client(http_request), "generate", requests=1)
+            return cached_quiz
+    await _admit(http_request, "generate")
+    return None
+
+def _batch_max_urls() -> int:
+    # Batches are charged per URL, so one larger than the batch bucket could never be admitted
+    rate = rate_limiter.limits.get("batch")
+    return min(BATCH_MAX_URLS, rate.count) if rate is not None else BATCH_MAX_URLS
+
+def _overloaded(e: LLMOverloaded) -> HTTPException:
+    usage_recorder.record_current(rejected=1)
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
 # Your existing routes continue below...
 @app.get("/")
 async def root():
     return {"message": "AI Wiki Quiz Generator API is running!"}
 
 @app.post("/generate_quiz", response_model=QuizOutput)
-async def generate_quiz(request: URLRequest, db: Session = Depends(get_db)):
+async def generate_quiz(request: URLRequest, http_request: Request, db: AsyncSession = Depends(get_db)):
+    cached_quiz = await _cached_or_admit(http_request, db, request)
+    if cached_quiz is not None:
+        return cached_quiz
     try:
-        scraped_data = scrape_wikipedia(request.url)
-        quiz_data = quiz_generator.generate_quiz(
-            scraped_data["title"], 
-            scraped_data["content"]
-        )
-        
-        db_quiz = Quiz(
-            url=request.url,
-            title=scraped_data["title"],
-            scraped_content=scraped_data["content"],
-            full_quiz_data=json.dumps(quiz_data.dict())
-        )
-        db.add(db_quiz)
-        db.commit()
-        db.refresh(db_quiz)
-        
-        return quiz_data
+        return await build_quiz(db, request.url, request.force_refresh, mode=request.mode)
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except LLMOverloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/generate_quiz/stream")
+async def generate_quiz_stream(
+    request: URLRequest, http_request: Request, format: str = Query("ndjson", pattern="^(ndjson|sse)$")
+):
+    # A cached quiz is found again (in memory) by stream_quiz and replayed
+    async with AsyncSessionLocal() as db:
+        await _cached_or_admit(http_request, db, request)
+    
+    async def events():
+        # Own session: the stream outlives the request handler
+        async with AsyncSessionLocal() as db:
+            try:
+                async for event, value in stream_quiz(db, request.url, request.force_refresh, request.mode):
+                    yield _stream_line(format, event, value.model_dump() if hasattr(value, "model_dump") else value)
+            except ValueError as e:
+                yield _stream_line(format, "error", {"status": 400, "detail": str(e)})
+            except LLMOverloaded as e:
+                error = _overloaded(e)
+                yield _stream_line(format, "error", {
+                    "status": 503, "detail": error.detail, "retry_after": int(error.headers["Retry-After"])
+                })
+            except Exception as e:
+                yield _stream_line(format, "error", {"status": 500, "detail": f"Internal server error: {str(e)}"})
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@app.post("/generate_quiz/batch")
+async def generate_quiz_batch(requests: List[URLRequest], http_request: Request):
+    if not requests:
+        raise HTTPException(status_code=400, detail="Provide at least one URL")
+    max_urls = _batch_max_urls()
+    if len(requests) > max_urls:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {max_urls} URLs")
+    await _admit(http_request, "batch", cost=len(requests))
+    
+    async def events():
+        try:
+            async for event, data in QuizBatch(requests).events():
+                yield _stream_line("ndjson", event, data)
+        except Exception as e:
+            yield _stream_line("ndjson", "error", {"status": 500, "detail": f"Failed to save batch: {str(e)}"})
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+def _stream_line(format: str, event: str, data) -> str:
+    if format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
 @app.get("/history", response_model=List[QuizHistoryItem])
-async def get_quiz_history(db: Session = Depends(get_db)):
-    quizzes = db.query(Quiz).order_by(Quiz.date_generated.desc()).all()
-    return quizzes
+async def get_quiz_history(
+    response: Response,
+    limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=HISTORY_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    title_prefix: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        items, next_cursor = await fetch_history_page(db, limit, cursor, title_prefix, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+@app.get("/search", response_model=List[SearchResult])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in titles, summaries, questions and articles"),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0, description="X-Next-Offset value from the previous page"),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        items, next_offset = await search_quizzes(db, q, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_offset is not None:
+        response.headers["X-Next-Offset"] = str(next_offset)
+    return items
 
 @app.get("/quiz/{quiz_id}", response_model=QuizOutput)
-async def get_quiz_by_id(quiz_id: int, db: Session = Depends(get_db)):
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
-    if not quiz:
+async def get_quiz_by_id(quiz_id: int, db: AsyncSession = Depends(get_db)):
+    row = (await db.execute(
+        select(Quiz.full_quiz_data, Quiz.quiz_blob, Quiz.storage_format).where(Quiz.id == quiz_id)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
+    # Stored JSON was validated when it was written; serve the bytes as-is
     try:
-        quiz_data = json.loads(quiz.full_quiz_data)
-        return QuizOutput(**quiz_data)
-    except json.JSONDecodeError:
+        return Response(content=quiz_json_bytes(row), media_type="application/json")
+    except (ValueError, zlib.error):
         raise HTTPException(status_code=500, detail="Invalid quiz data format")
 
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def create_quiz_job(request: URLRequest, http_request: Request):
+    if request.mode != "single":
+        raise HTTPException(status_code=400, detail="Jobs only support mode 'single'")
+    await _admit(http_request, "jobs")
+    try:
+        job = await job_queue.submit(request.url, request.force_refresh)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return to_job_status(job)
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_quiz_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return to_job_status(job)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_quiz_job(job_id: str):
+    if not await job_queue.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last_state = None
+        while True:
+            job = await job_queue.get(job_id)
+            state = (job.status, job.stage)
+            if state != last_state:
+                last_state = state
+                payload = to_job_status(job).model_dump_json()
+                yield f"event: {job.status}\ndata: {payload}\n\n"
+            if job.status in TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/usage")
+async def get_usage(http_request: Request, days: int = Query(7, ge=1, le=90)):
+    """The calling client's limits and daily usage"""
+    client = _client(http_request)
+    return {
+        "client": client,
+        "limits": {endpoint: str(rate) if rate else None for endpoint, rate in rate_limiter.limits.items()},
+        "usage": await usage_recorder.for_client(client, days),
+    }
+
+def _model_gauge(field: str):
+    def read():
+        models = router_stats().get("models", {})
+        if field == "open":
+            return {(name,): float(state["state"] == "open") for name, state in models.items()}
+        return {(name,): float(state[field]) for name, state in models.items()}
+    return read
+
+
+metrics.GaugeFunction("llm_model_error_rate", "Error rate over each model's rolling window", ("model",),
+                      _model_gauge("error_rate"))
+metrics.GaugeFunction("llm_model_p95_ms", "p95 latency over each model's rolling window", ("model",),
+                      _model_gauge("p95_ms"))
+metrics.GaugeFunction("llm_model_circuit_open", "1 while a model's circuit breaker is open", ("model",),
+                      _model_gauge("open"))
+metrics.GaugeFunction("quiz_jobs_queued", "Jobs waiting for a worker", (), lambda: {(): float(job_queue.queued)})
+metrics.GaugeFunction("quiz_prefetch_queued", "Articles waiting to be prefetched", (),
+                      lambda: {(): float(prefetcher.queued)})
+metrics.GaugeFunction("llm_governor_active", "LLM calls holding governor capacity", (),
+                      lambda: {(): float(llm_governor.active)})
+metrics.GaugeFunction("llm_governor_waiting", "LLM calls queued for governor capacity", (),
+                      lambda: {(): float(llm_governor.waiting)})
+metrics.GaugeFunction("quiz_inflight", "Coalesced scrapes and generations in flight", ("flight",),
+                      lambda: {(name,): float(stats["inflight"]) for name, stats in coalescing_stats().items()})
+
+
+@app.get("/metrics")
+async def get_metrics(request: Request, format: Optional[str] = Query(None, pattern="^(json|prometheus)$")):
+    """
+    JSON by default. format=prometheus, or an Accept header asking for
+    text/plain or OpenMetrics (what a Prometheus scraper sends), returns the
+    text exposition format instead.
+    """
+    accept = request.headers.get("accept", "")
+    if format == "prometheus" or (format is None and ("text/plain" in accept or "openmetrics" in accept)):
+        return Response(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+    return {
+        "cache": quiz_cache.stats,
+        "near_duplicates": dict(near_duplicate_index.stats, indexed=len(near_duplicate_index)),
+        "coalescing": coalescing_stats(),
+        "json_repair": repair_stats(),
+        "models": router_stats(),
+        "jobs": {"queued": job_queue.queued},
+        "rate_limit": rate_limiter.stats,
+        "llm_governor": llm_governor.snapshot(),
+        "prefetch": prefetcher.snapshot(),
+        "instrumentation": metrics.snapshot(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
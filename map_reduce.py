@@ -0,0 +1,144 @@
+import math
+import re
+from typing import List, NamedTuple
+
+from pydantic import ValidationError
+
+from condense import condense, estimate_tokens
+from models import QuizOutput, KeyEntity, Question
+from quiz_repair import answerable, repair_json
+
+# Sections smaller than this are merged with their neighbours into one prompt
+MIN_GROUP_TOKENS = 300
+# Questions whose word sets overlap this much are treated as duplicates
+DUPLICATE_JACCARD = 0.6
+MAX_KEY_ENTITIES = 6
+MAX_RELATED_TOPICS = 5
+
+WORD_RE = re.compile(r"\w+")
+
+
+class SectionGroup(NamedTuple):
+    heading: str        # "Introduction" for the lead, else the joined section headings
+    content: str        # Group text condensed into the per-section budget
+
+
+class SectionQuiz(NamedTuple):
+    heading: str
+    summary: str
+    key_entities: List[KeyEntity]
+    related_topics: List[str]
+    questions: List[Question]
+
+
+def group_sections(sections: List[dict], max_groups: int, token_budget: int) -> List[SectionGroup]:
+    """
+    Partition the article, in order, into at most max_groups runs of
+    sections of roughly equal size, each condensed to token_budget.
+    """
+    sizes = [estimate_tokens(" ".join(s["paragraphs"])) for s in sections]
+    target = max(sum(sizes) / max_groups, MIN_GROUP_TOKENS)
+
+    runs = [[]]
+    run_size = 0
+    for section, size in zip(sections, sizes):
+        if runs[-1] and run_size >= target and len(runs) < max_groups:
+            runs.append([])
+            run_size = 0
+        runs[-1].append(section)
+        run_size += size
+
+    groups = []
+    for run in runs:
+        headings = [s["heading"] or "Introduction" for s in run]
+        groups.append(SectionGroup("; ".join(dict.fromkeys(headings)), condense(run, budget=token_budget).text))
+    return groups
+
+
+def questions_per_group(total: int, groups: int) -> int:
+    # Ask for a little more than an even share, so deduplication still leaves enough
+    return min(5, max(2, math.ceil(total / groups) + 1))
+
+
+def parse_section_quiz(heading: str, text: str) -> SectionQuiz:
+    """Parse one section response, dropping any element that does not validate"""
+    data, _ = repair_json(text)
+
+    def valid(model, items):
+        out = []
+        for item in items or []:
+            try:
+                out.append(model(**item))
+            except (TypeError, ValidationError):
+                continue
+        return out
+
+    return SectionQuiz(
+        heading=heading,
+        summary=str(data.get("summary") or ""),
+        key_entities=valid(KeyEntity, data.get("key_entities")),
+        related_topics=[t for t in data.get("related_topics") or [] if isinstance(t, str)],
+        questions=valid(Question, data.get("questions")),
+    )
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(WORD_RE.findall(text.lower()))
+
+
+def _round_robin(lists):
+    for rank in range(max((len(items) for items in lists), default=0)):
+        for items in lists:
+            if rank < len(items):
+                yield items[rank]
+
+
+def merge_section_quizzes(title: str, parts: List[SectionQuiz], num_questions: int) -> QuizOutput:
+    """
+    Reduce per-section results into one quiz: drop unanswerable and
+    near-duplicate questions, then take them round-robin across sections so
+    the final set covers the whole article.
+    """
+    questions = []
+    seen = []
+    for question in _round_robin([p.questions for p in parts]):
+        if len(questions) >= num_questions:
+            break
+        if not answerable(question):
+            continue
+        words = _words(question.question)
+        if any(len(words & other) / (len(words | other) or 1) >= DUPLICATE_JACCARD for other in seen):
+            continue
+        seen.append(words)
+        questions.append(question)
+    if not questions:
+        raise ValueError("No usable questions were generated for any section")
+
+    key_entities = []
+    names = set()
+    for entity in _round_robin([p.key_entities for p in parts]):
+        if entity.name.strip().lower() not in names and len(key_entities) < MAX_KEY_ENTITIES:
+            names.add(entity.name.strip().lower())
+            key_entities.append(entity)
+
+    related_topics = []
+    topics = {title.strip().lower()}
+    for topic in _round_robin([p.related_topics for p in parts]):
+        if topic.strip().lower() not in topics and len(related_topics) < MAX_RELATED_TOPICS:
+            topics.add(topic.strip().lower())
+            related_topics.append(topic)
+
+    # The lead's summary, then one line per remaining section
+    summaries = [p.summary.strip() for p in parts if p.summary.strip()]
+    summary = summaries[0] if summaries else ""
+    overview = " ".join(s.split(". ")[0].rstrip(".") + "." for s in summaries[1:])
+    if overview:
+        summary = f"{summary}\n\n{overview}"
+
+    return QuizOutput(
+        title=title,
+        summary=summary,
+        key_entities=key_entities,
+        related_topics=related_topics,
+        questions=questions,
+    )
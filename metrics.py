@@ -0,0 +1,243 @@
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+# METRICS_ENABLED=0 turns every instrument into a no-op
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label set. Safe to use from worker threads."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"/".join(key) or "total": value for key, value in sorted(self._values.items())}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Bucketed distribution per label set, exported as Prometheus cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [bucket counts..., +Inf count], sum
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    out.append((f"{self.name}_bucket", key, cumulative, f'le="{le}"'))
+                out.append((f"{self.name}_sum", key, total))
+                out.append((f"{self.name}_count", key, cumulative))
+        return out
+
+    def _quantile(self, counts, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        target = q * sum(counts)
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        return {
+            "/".join(key) or "total": {
+                "count": sum(counts),
+                "mean": total / sum(counts),
+                "p50": self._quantile(counts, 0.5),
+                "p95": self._quantile(counts, 0.95),
+            }
+            for key, (counts, total) in sorted(series.items())
+        }
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class GaugeFunction:
+    """Gauge whose values are read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], read: Callable[[], Dict[tuple, float]]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.read = read
+        _registry.append(self)
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in sorted(self.read().items())]
+
+    def snapshot(self) -> dict:
+        return {"/".join(key) or "total": value for key, value in sorted(self.read().items())}
+
+    def clear(self):
+        pass
+
+
+# Pipeline instruments
+STAGE_SECONDS = Histogram(
+    "quiz_stage_seconds",
+    "Time spent in each pipeline stage (fetch, parse, cleanup, dump_read, near_duplicate, prompt_build, llm_queue, llm, json_parse, validate, db_read, db_write)",
+    ("stage",),
+)
+ERRORS = Counter("quiz_errors_total", "Exceptions raised inside a pipeline stage, by exception type", ("stage", "type"))
+CACHE_LOOKUPS = Counter("quiz_cache_lookups_total", "Quiz cache lookups by key kind and result", ("key", "result"))
+LLM_PROMPT_CHARS = Histogram("llm_prompt_chars", "Prompt size per LLM call", ("kind",), SIZE_BUCKETS)
+LLM_RESPONSE_CHARS = Histogram("llm_response_chars", "Response size per LLM call", ("kind",), SIZE_BUCKETS)
+RATE_LIMITED = Counter("rate_limit_rejections_total", "Requests turned away by the per-client rate limiter", ("endpoint",))
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "HTTP request latency by route and status", ("method", "route", "status")
+)
+
+
+class stage_timer:
+    """
+    Context manager that records the duration of a pipeline stage in
+    quiz_stage_seconds, and any exception escaping it in quiz_errors_total.
+    Works around awaits; cancellations and generator exits are not errors.
+    """
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if METRICS_ENABLED:
+            STAGE_SECONDS.observe(time.perf_counter() - self.started, stage=self.stage)
+            if exc_type is not None and issubclass(exc_type, Exception):
+                ERRORS.inc(stage=self.stage, type=exc_type.__name__)
+        return False
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording http_request_seconds per route template (not
+    raw path, to bound label cardinality). For streamed responses this is
+    the time until the body finishes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
+
+
+def render_prometheus() -> str:
+    """Every registered instrument in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for sample in metric.samples():
+            name, key, value = sample[:3]
+            extra = sample[3] if len(sample) > 3 else ""
+            lines.append(f"{name}{_label_text(metric.labels, key, extra)} {value:.10g}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> dict:
+    """JSON view of the counters and histograms (gauges are reported elsewhere in /metrics)"""
+    return {metric.name: metric.snapshot() for metric in _registry if not isinstance(metric, GaugeFunction)}
+
+
+def reset():
+    for metric in _registry:
+        metric.clear()
@@ -0,0 +1,211 @@
+"""
+Bring an existing database up to the current schema and re-encode stored
+quizzes in another storage format.
+
+    python migrate_storage.py --format zlib            # compress legacy rows
+    python migrate_storage.py --format text --dry-run  # preview a rollback
+    python migrate_storage.py --schema-only            # only add new columns/indexes
+    python migrate_storage.py --index-search           # add quizzes saved before /search to its index
+    python migrate_storage.py --rekey                  # recompute URL keys and content fingerprints
+"""
+import argparse
+import hashlib
+import json
+
+from sqlalchemy import select, text, update
+
+from database import engine, SessionLocal, Quiz, Article
+from models import QuizOutput
+from near_duplicates import simhash_of
+from quiz_cache import normalize_url, resolved_url_key
+import database
+import search
+import storage
+
+
+def ensure_schema():
+    """Add tables, columns and indexes introduced since the database was created"""
+    with engine.begin() as conn:
+        for column in database.ensure_schema(conn):
+            print(f"✅ Added column {column}")
+
+
+def article_content(db, quiz: Quiz) -> str:
+    """The scraped article of a quiz row, inline (text format) or from the articles table"""
+    content = quiz.scraped_content
+    if content is None and quiz.content_hash:
+        article = db.get(Article, quiz.content_hash)
+        if article is not None:
+            content = storage.decompress(article.content, article.storage_format).decode("utf-8")
+    return content if content is not None else ""
+
+
+def migrate(target: str, batch_size: int, dry_run: bool) -> dict:
+    target = storage.check_format(target)
+    counts = {"quizzes": 0, "articles": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = 0
+    seen_articles = set()
+
+    with SessionLocal() as db:
+        while True:
+            rows = db.execute(
+                select(Quiz)
+                .where(Quiz.id > last_id)
+                .where((Quiz.storage_format.is_(None)) | (Quiz.storage_format != target))
+                .order_by(Quiz.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not rows:
+                break
+
+            for quiz in rows:
+                last_id = quiz.id
+                content = article_content(db, quiz)
+                quiz_json = storage.quiz_json_bytes(quiz)
+                counts["bytes_before"] += len(quiz_json if quiz.storage_format in storage.TEXT_FORMATS else quiz.quiz_blob)
+                counts["bytes_before"] += len((quiz.scraped_content or "").encode("utf-8"))
+
+                digest = quiz.content_hash or hashlib.sha256(content.encode("utf-8")).hexdigest()
+                article = storage.article_values(digest, content, target)
+                if article is not None and digest not in seen_articles and db.get(Article, digest) is None:
+                    seen_articles.add(digest)
+                    if not dry_run:
+                        db.add(Article(**article))
+                        db.flush()
+                    counts["articles"] += 1
+                    counts["bytes_after"] += len(article["content"])
+
+                if target == "text":
+                    values = {
+                        "scraped_content": content,
+                        "full_quiz_data": json.dumps(json.loads(quiz_json)),
+                        "quiz_blob": None,
+                    }
+                    counts["bytes_after"] += len(values["full_quiz_data"]) + len(content.encode("utf-8"))
+                else:
+                    values = {
+                        "scraped_content": None,
+                        "full_quiz_data": None,
+                        # Re-serialize compactly; legacy rows were written with spaces
+                        "quiz_blob": storage.compress(
+                            json.dumps(json.loads(quiz_json), separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
+                            target,
+                        ),
+                    }
+                    counts["bytes_after"] += len(values["quiz_blob"])
+
+                if not dry_run:
+                    db.execute(
+                        update(Quiz).where(Quiz.id == quiz.id)
+                        .values(storage_format=target, content_hash=digest, **values)
+                    )
+                counts["quizzes"] += 1
+
+            if not dry_run:
+                db.commit()
+            print(f"🔄 Migrated {counts['quizzes']} quizzes so far (last id {last_id})")
+
+    return counts
+
+
+def index_search(batch_size: int) -> int:
+    """Add every quiz missing from the search index; rows saved since it was introduced are already there"""
+    indexed = 0
+    last_id = 0
+    statement = search.index_statement(engine.dialect.name)
+    with SessionLocal() as db:
+        while True:
+            rows = db.execute(
+                select(Quiz)
+                .where(Quiz.id > last_id)
+                .where(text(f"quizzes.id NOT IN ({search.indexed_ids_sql(engine.dialect.name)})"))
+                .order_by(Quiz.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not rows:
+                break
+            documents = [
+                search.search_document(
+                    quiz.id, quiz.title, article_content(db, quiz),
+                    QuizOutput.model_validate_json(storage.quiz_json_bytes(quiz)),
+                )
+                for quiz in rows
+            ]
+            db.execute(statement, documents)
+            db.commit()
+            last_id = rows[-1].id
+            indexed += len(rows)
+            print(f"🔄 Indexed {indexed} quizzes so far (last id {last_id})")
+    return indexed
+
+
+def rekey(batch_size: int) -> dict:
+    """
+    Recompute each quiz's canonical URL key with the current normalize_url
+    and SimHash, which also fills in quizzes saved before near-duplicate
+    matching
+    """
+    counts = {"quizzes": 0, "rekeyed": 0, "fingerprinted": 0}
+    last_id = 0
+    with SessionLocal() as db:
+        while True:
+            rows = db.execute(
+                select(Quiz).where(Quiz.id > last_id).order_by(Quiz.id).limit(batch_size)
+            ).scalars().all()
+            if not rows:
+                break
+            for quiz in rows:
+                values = {}
+                url_key = resolved_url_key(normalize_url(quiz.url), quiz.title)
+                if url_key != quiz.canonical_url:
+                    values["canonical_url"] = url_key
+                    counts["rekeyed"] += 1
+                simhash = simhash_of(article_content(db, quiz))
+                if simhash is not None and simhash != quiz.simhash:
+                    values["simhash"] = simhash
+                    counts["fingerprinted"] += 1
+                if values:
+                    db.execute(update(Quiz).where(Quiz.id == quiz.id).values(**values))
+            db.commit()
+            last_id = rows[-1].id
+            counts["quizzes"] += len(rows)
+            print(f"🔄 Checked {counts['quizzes']} quizzes so far (last id {last_id})")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate stored quizzes to another storage format")
+    parser.add_argument("--format", default=storage.QUIZ_STORAGE_FORMAT, help="text, zlib or zstd")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--schema-only", action="store_true", help="Only add missing columns and indexes")
+    parser.add_argument("--index-search", action="store_true", help="Only add unindexed quizzes to the search index")
+    parser.add_argument("--rekey", action="store_true", help="Only recompute URL keys and content fingerprints")
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim freed space afterwards (SQLite/PostgreSQL)")
+    args = parser.parse_args()
+
+    ensure_schema()
+    if args.schema_only:
+        return
+    if args.index_search:
+        print(f"✅ Added {index_search(args.batch_size)} quizzes to the search index")
+        return
+    if args.rekey:
+        counts = rekey(args.batch_size)
+        print(f"✅ Re-keyed {counts['rekeyed']} and fingerprinted {counts['fingerprinted']} "
+              f"of {counts['quizzes']} quizzes")
+        return
+
+    counts = migrate(args.format, args.batch_size, args.dry_run)
+    print(f"✅ {'Would migrate' if args.dry_run else 'Migrated'} {counts['quizzes']} quizzes "
+          f"and {counts['articles']} distinct articles to '{args.format}'")
+    print(f"   Stored payload: {counts['bytes_before'] / 1024:.0f} KB -> {counts['bytes_after'] / 1024:.0f} KB")
+
+    if args.vacuum and not args.dry_run:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+        print("✅ Vacuumed database")
+
+
+if __name__ == "__main__":
+    main()
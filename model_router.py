@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Router configuration (override through environment variables)
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "100"))  # recent calls kept per model
+ROUTER_MAX_ATTEMPTS = int(os.getenv("ROUTER_MAX_ATTEMPTS", "3"))  # models tried per request, hedges included
+ROUTER_TIMEOUT_SECONDS = float(os.getenv("ROUTER_TIMEOUT_SECONDS", "60"))
+# "p95" hedges once the primary runs past its own p95, a number of seconds
+# hedges after that long, "off" disables hedging
+ROUTER_HEDGE_AFTER = os.getenv("ROUTER_HEDGE_AFTER", "p95").lower()
+ROUTER_HEDGE_MIN_SAMPLES = 20  # p95 hedging waits until the primary has this many latencies
+ROUTER_BREAKER_FAILURES = int(os.getenv("ROUTER_BREAKER_FAILURES", "3"))  # consecutive failures that trip it
+ROUTER_BREAKER_ERROR_RATE = float(os.getenv("ROUTER_BREAKER_ERROR_RATE", "0.5"))  # over the window
+ROUTER_BREAKER_MIN_CALLS = 10  # before the error rate can trip the breaker
+ROUTER_BREAKER_COOLDOWN_SECONDS = float(os.getenv("ROUTER_BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+class ModelRoute:
+    """
+    One candidate model with its rolling call history and circuit breaker.
+
+    The breaker opens after ROUTER_BREAKER_FAILURES consecutive failures,
+    or when the error rate over the window reaches ROUTER_BREAKER_ERROR_RATE.
+    After the cooldown it is half-open: requests go through again, the first
+    success closes it and the first failure opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, model, window: int = ROUTER_WINDOW,
+                 cooldown: float = ROUTER_BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.model = model
+        self.cooldown = cooldown
+        self.calls = deque(maxlen=window)   # (latency seconds or None, ok)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def reopens_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def latencies(self) -> list:
+        return sorted(latency for latency, ok in self.calls if ok and latency is not None)
+
+    def error_rate(self) -> float:
+        return sum(not ok for _, ok in self.calls) / len(self.calls) if self.calls else 0.0
+
+    def record_success(self, latency: float = None):
+        if self.opened_at is not None:
+            # Recovered: judge it on calls from now on, not on the outage
+            self.calls.clear()
+            self.opened_at = None
+        self.calls.append((latency, True))
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        was_half_open = self.state == "half_open"
+        self.calls.append((None, False))
+        self.consecutive_failures += 1
+        if self.state != "open" and (
+            was_half_open
+            or self.consecutive_failures >= ROUTER_BREAKER_FAILURES
+            or (len(self.calls) >= ROUTER_BREAKER_MIN_CALLS and self.error_rate() >= ROUTER_BREAKER_ERROR_RATE)
+        ):
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            logger.warning("Circuit opened for %s (%d consecutive failures, %.0f%% errors)",
+                           self.name, self.consecutive_failures, 100 * self.error_rate())
+
+    def snapshot(self) -> dict:
+        latencies = self.latencies()
+        return {
+            "state": self.state,
+            "calls": len(self.calls),
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "reopens_in_seconds": round(self.reopens_in(), 1),
+        }
+
+
+class ModelRouter:
+    """
+    Routes each request across candidate models, in preference order.
+
+    Models with an open circuit are skipped. A failed call falls back to the
+    next model, and a call running past the hedge threshold gets a parallel
+    hedge on the next model; the first successful answer wins and the other
+    call is cancelled. It has the generate_content_async interface of a
+    Gemini model, so LLMQuizGenerator uses it in place of one.
+
+    The caller holds LLM capacity for the request (one call in flight at a
+    time, fallbacks included). A hedge is a second call in flight, so with a
+    governor it takes capacity of its own and is counted in usage like any
+    call; it is skipped when the governor has none to spare.
+    """
+
+    def __init__(self, models: List[Tuple[str, object]], max_attempts: int = ROUTER_MAX_ATTEMPTS,
+                 timeout: float = ROUTER_TIMEOUT_SECONDS, hedge_after: str = ROUTER_HEDGE_AFTER,
+                 cooldown: float = ROUTER_BREAKER_COOLDOWN_SECONDS, governor=None):
+        self.routes = [ModelRoute(name, model, cooldown=cooldown) for name, model in models]
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.hedge_after = str(hedge_after).lower()
+        self.governor = governor
+        self.stats = {"requests": 0, "fallbacks": 0, "hedges": 0, "hedge_wins": 0, "hedges_skipped": 0,
+                      "all_open": 0, "failed": 0}
+
+    def _candidates(self) -> List[ModelRoute]:
+        available = [route for route in self.routes if route.state != "open"]
+        if not available:
+            # Everything is tripped: try the model that reopens first rather than failing outright
+            self.stats["all_open"] += 1
+            available = [min(self.routes, key=lambda route: route.reopens_in())]
+        return available[:self.max_attempts]
+
+    def _hedge_delay(self, route: ModelRoute):
+        if self.hedge_after == "off":
+            return None
+        if self.hedge_after == "p95":
+            latencies = route.latencies()
+            return _percentile(latencies, 95) if len(latencies) >= ROUTER_HEDGE_MIN_SAMPLES else None
+        return float(self.hedge_after)
+
+    async def _call(self, route: ModelRoute, prompt, kwargs: dict):
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(route.model.generate_content_async(prompt, **kwargs), self.timeout)
+            if not kwargs.get("stream"):
+                # Blocked or empty responses raise here, so they count as failures
+                response.text
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            route.record_failure()
+            raise
+        # A streamed call returns at its first chunk, which is not comparable
+        route.record_success(None if kwargs.get("stream") else time.monotonic() - started)
+        return response
+
+    async def _hedge(self, route: ModelRoute, prompt, kwargs: dict):
+        async with self.governor.slot(prompt) as call:
+            response = await self._call(route, prompt, kwargs)
+            call.record(response.text)
+        return response
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.stats["requests"] += 1
+        candidates = self._candidates()
+        pending = {}
+        launched = 0
+        hedged = False
+        error = None
+
+        def launch(hedge: bool = False):
+            nonlocal launched
+            route = candidates[launched]
+            launched += 1
+            call = self._hedge if hedge and self.governor is not None else self._call
+            pending[asyncio.ensure_future(call(route, prompt, kwargs))] = route
+
+        launch()
+        try:
+            while pending:
+                # Streams are not hedged: their chunks are consumed after we return
+                hedge_delay = None
+                if not hedged and launched < len(candidates) and not kwargs.get("stream"):
+                    hedge_delay = self._hedge_delay(candidates[0])
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if self.governor is not None and not self.governor.has_spare_capacity(1.0):
+                        self.stats["hedges_skipped"] += 1
+                        continue
+                    self.stats["hedges"] += 1
+                    launch(hedge=True)
+                    continue
+                for task in done:
+                    route = pending.pop(task)
+                    if task.exception() is None:
+                        if hedged and route is not candidates[0]:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                    logger.warning("%s failed: %s", route.name, error)
+                if not pending and launched < len(candidates):
+                    self.stats["fallbacks"] += 1
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        self.stats["failed"] += 1
+        raise error
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, models={route.name: route.snapshot() for route in self.routes})
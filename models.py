@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class Question(BaseModel):
@@ -22,6 +22,11 @@ class QuizOutput(BaseModel):
 
 class URLRequest(BaseModel):
     url: str
+    force_refresh: bool = Field(default=False, description="Bypass the quiz cache and regenerate")
+    mode: Literal["single", "map_reduce"] = Field(
+        default="single",
+        description="single: one prompt for the whole article; map_reduce: one prompt per section group, merged",
+    )
 
 class QuizHistoryItem(BaseModel):
     id: int
@@ -30,4 +35,17 @@ class QuizHistoryItem(BaseModel):
     date_generated: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SearchResult(QuizHistoryItem):
+    score: float = Field(description="Relevance to the query, higher is better")
+
+class JobStatus(BaseModel):
+    id: str
+    url: str
+    status: str = Field(description="queued, running, done or failed")
+    stage: Optional[str] = Field(default=None, description="Pipeline stage of a running job")
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    quiz: Optional[QuizOutput] = Field(default=None, description="Generated quiz once the job is done")
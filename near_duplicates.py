@@ -0,0 +1,196 @@
+import asyncio
+import os
+import re
+from typing import List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Quiz
+from storage import load_article
+
+# Near-duplicate detection (override through environment variables)
+# SimHash bits two articles may differ by to be compared at all; -1 disables matching
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "12"))
+# Share of word shingles a candidate must have in common (Jaccard) to reuse its quiz
+NEAR_DUPLICATE_MIN_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_MIN_SIMILARITY", "0.9"))
+# Shorter articles are never matched: templated stubs differ in a few words only
+NEAR_DUPLICATE_MIN_WORDS = int(os.getenv("NEAR_DUPLICATE_MIN_WORDS", "100"))
+SHINGLE_WORDS = 3
+# Closest SimHash candidates whose articles are compared, per lookup
+MAX_CANDIDATES = 3
+
+WORD_RE = re.compile(r"\w+")
+FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+# Set bits per byte value, for NumPy releases without bitwise_count
+POPCOUNT_TABLE = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+class Fingerprint(NamedTuple):
+    simhash: int             # unsigned 64-bit SimHash of the word shingles
+    shingles: np.ndarray     # sorted unique 64-bit shingle hashes
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer: spreads every input bit over the whole word
+    x = (x ^ (x >> np.uint64(30))) * MIX_1
+    x = (x ^ (x >> np.uint64(27))) * MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+def fingerprint(text: str) -> Optional[Fingerprint]:
+    """
+    SimHash of the set of an article's word shingles, computed with array
+    operations only. Each distinct shingle counts once, like in the Jaccard
+    similarity it approximates: weighting by occurrences would let one
+    repeated phrase outvote the rest of the article. None for articles
+    shorter than NEAR_DUPLICATE_MIN_WORDS.
+    """
+    words = WORD_RE.findall(text.lower())
+    if len(words) < max(NEAR_DUPLICATE_MIN_WORDS, SHINGLE_WORDS):
+        return None
+    with np.errstate(over="ignore"):
+        # FNV-1a over each word's code points, one column of characters at a
+        # time. The array pads words to the longest one with zero code points;
+        # those are skipped, so a word hashes the same in every article
+        codes = np.array(words).view(np.uint32).reshape(len(words), -1)
+        hashes = np.full(len(words), FNV_OFFSET)
+        for column in codes.T:
+            hashes = np.where(column != 0, (hashes ^ column) * FNV_PRIME, hashes)
+        hashes = _mix(hashes)
+        count = len(words) - SHINGLE_WORDS + 1
+        shingles = hashes[:count]
+        for offset in range(1, SHINGLE_WORDS):
+            shingles = _mix(shingles * MIX_1 ^ hashes[offset:offset + count])
+    shingles = np.unique(shingles)
+    bits = np.unpackbits(shingles.astype(">u8").view(np.uint8)).reshape(-1, 64)
+    # Bit i of the SimHash is set when most shingles have it set
+    ones = bits.sum(axis=0, dtype=np.int64)
+    simhash = int.from_bytes(np.packbits(2 * ones > len(shingles)).tobytes(), "big")
+    return Fingerprint(simhash, shingles)
+
+
+def similarity(a: Fingerprint, b: Fingerprint) -> float:
+    """Jaccard similarity of two articles' shingle sets"""
+    common = len(np.intersect1d(a.shingles, b.shingles, assume_unique=True))
+    return common / (len(a.shingles) + len(b.shingles) - common)
+
+
+def to_signed(simhash: int) -> int:
+    """The SimHash as the signed 64-bit integer a BIGINT column holds"""
+    return simhash - (1 << 64) if simhash >= 1 << 63 else simhash
+
+
+def simhash_of(text: str) -> Optional[int]:
+    """Quiz.simhash value for an article, None when it is too short to match"""
+    found = fingerprint(text)
+    return to_signed(found.simhash) if found is not None else None
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return POPCOUNT_TABLE[values.view(np.uint8)].reshape(len(values), 8).sum(axis=1)
+
+
+def url_host(url_key: str) -> str:
+    return urlsplit(url_key or "").netloc
+
+
+class NearDuplicateIndex:
+    """
+    SimHashes of every stored quiz in one NumPy array, so a lookup is an XOR
+    and a popcount over all of them. Each lookup first reads the quizzes
+    saved since the previous one (an id range scan), which keeps every
+    process in step with the table. Only quizzes from the same host are
+    candidates: the same text on another wiki is another article. Candidates
+    within max_distance bits are then confirmed against their stored
+    article, closest first.
+    """
+
+    def __init__(
+        self,
+        max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE,
+        min_similarity: float = NEAR_DUPLICATE_MIN_SIMILARITY,
+    ):
+        self.max_distance = max_distance
+        self.min_similarity = min_similarity
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._hosts = np.zeros(0, dtype=np.int32)    # codes into _host_codes
+        self._host_codes = {}
+        self._last_id = 0
+        self._lock = asyncio.Lock()
+        self.stats = {"lookups": 0, "candidates": 0, "matches": 0}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def refresh(self, db: AsyncSession):
+        async with self._lock:
+            rows = (await db.execute(
+                select(Quiz.id, Quiz.simhash, Quiz.canonical_url)
+                .where(Quiz.id > self._last_id, Quiz.simhash.isnot(None))
+                .order_by(Quiz.id)
+            )).all()
+            if not rows:
+                return
+            self._ids = np.concatenate([self._ids, np.fromiter((row.id for row in rows), np.int64, len(rows))])
+            hashes = np.fromiter((row.simhash for row in rows), np.int64, len(rows)).view(np.uint64)
+            self._hashes = np.concatenate([self._hashes, hashes])
+            codes = [self._host_codes.setdefault(url_host(row.canonical_url), len(self._host_codes)) for row in rows]
+            self._hosts = np.concatenate([self._hosts, np.array(codes, dtype=np.int32)])
+            self._last_id = rows[-1].id
+
+    def candidates(self, simhash: int, host: str = None) -> List[int]:
+        """
+        Ids of quizzes within max_distance bits, from host when given,
+        closest first and newest first among equals
+        """
+        distances = _popcount(self._hashes ^ np.uint64(simhash))
+        close = distances <= self.max_distance
+        if host is not None:
+            if host not in self._host_codes:
+                return []
+            close &= self._hosts == self._host_codes[host]
+        close = np.flatnonzero(close)
+        order = np.lexsort((-self._ids[close], distances[close]))
+        return [int(quiz_id) for quiz_id in self._ids[close[order]]]
+
+    async def find(self, db: AsyncSession, content: str, url_key: str) -> Optional[int]:
+        """Id of a stored quiz from url_key's host whose article is nearly identical to content, if any"""
+        if self.max_distance < 0:
+            return None
+        await self.refresh(db)
+        host = url_host(url_key)
+        # Nothing stored from this host: skip fingerprinting the article
+        if host not in self._host_codes:
+            return None
+        found = await asyncio.to_thread(fingerprint, content)
+        if found is None:
+            return None
+        self.stats["lookups"] += 1
+        seen = set()
+        for quiz_id in self.candidates(found.simhash, host):
+            digest = (await db.execute(select(Quiz.content_hash).where(Quiz.id == quiz_id))).scalar()
+            # Quizzes of one article share its candidate check
+            if digest is None or digest in seen:
+                continue
+            seen.add(digest)
+            self.stats["candidates"] += 1
+            stored = await load_article(db, digest)
+            other = await asyncio.to_thread(fingerprint, stored) if stored else None
+            if other is not None and similarity(found, other) >= self.min_similarity:
+                self.stats["matches"] += 1
+                return quiz_id
+            if len(seen) >= MAX_CANDIDATES:
+                break
+        return None
+
+
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from itertools import zip_longest
+from urllib.parse import quote, urlsplit
+
+import quiz_service
+from condense import PROMPT_TOKEN_BUDGET
+from database import AsyncSessionLocal
+from llm_governor import llm_governor, LLMOverloaded, LLM_OUTPUT_TOKENS_ESTIMATE
+from models import QuizOutput
+from quiz_cache import quiz_cache, normalize_url
+from usage import usage_recorder, current_client
+
+logger = logging.getLogger(__name__)
+
+# Prefetch configuration (override through environment variables)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_MAX_PER_QUIZ = int(os.getenv("PREFETCH_MAX_PER_QUIZ", "6"))  # related topics and article links, alternating
+# LLM tokens prefetching and warm_cache.py may spend per UTC day, 0 = no limit
+PREFETCH_DAILY_TOKENS = int(os.getenv("PREFETCH_DAILY_TOKENS", "500000"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "200"))  # the oldest offers are dropped past this
+# Generate only while requests use less than this share of the LLM governor's capacity
+PREFETCH_IDLE_SHARE = float(os.getenv("PREFETCH_IDLE_SHARE", "0.5"))
+PREFETCH_POLL_SECONDS = float(os.getenv("PREFETCH_POLL_SECONDS", "1"))
+PREFETCH_SEEN_MAX = 10_000  # recently offered URLs that are not offered again
+# Tokens held against the budget for a generation still under way
+QUIZ_TOKENS_ESTIMATE = PROMPT_TOKEN_BUDGET + LLM_OUTPUT_TOKENS_ESTIMATE
+
+# Usage-table client that prefetch LLM calls are charged to, which is also
+# where the daily budget is read back from
+PREFETCH_CLIENT = "prefetch"
+
+
+def article_url(source_url: str, title: str) -> str:
+    """URL of the article called `title` on the same Wikipedia as source_url"""
+    host = urlsplit(source_url).netloc or "en.wikipedia.org"
+    # Leave the characters MediaWiki itself leaves unescaped, so the URL
+    # matches the one a reader would click and shares its cache key
+    return f"https://{host}/wiki/{quote(title.strip().replace(' ', '_'), safe=';@$!*(),/:~')}"
+
+
+def next_articles(url: str, scraped_data: dict, quiz: QuizOutput, limit: int) -> list:
+    """
+    The articles a reader of this quiz is likely to open next, most likely
+    first: the quiz's related topics alternating with the article's links.
+    Links are exact titles; related topics are the LLM's and may not be.
+    """
+    related, links = list(quiz.related_topics), list(scraped_data.get("links", ()))
+    candidates = [title for pair in zip_longest(related, links) for title in pair if title is not None]
+    urls = OrderedDict()
+    for title in candidates:
+        if len(urls) >= limit:
+            break
+        if title.strip() and title.strip() != scraped_data["title"]:
+            urls.setdefault(normalize_url(article_url(url, title)), None)
+    return list(urls)
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+class Prefetcher:
+    """
+    Generates quizzes for the articles readers are likely to open next, so
+    those requests are served from the store instead of waiting on the LLM.
+
+    Every freshly generated quiz offers its related topics and in-article
+    links. Workers take the newest offers first -- the reader of the quiz
+    generated last is the one about to click -- but only start a generation
+    while the LLM governor has spare capacity, and stop for the day once
+    the prefetch LLM calls recorded in the usage table, plus an estimate
+    for the generations under way, would pass daily_tokens. Prefetched
+    quizzes do not offer their own links.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = PREFETCH_ENABLED,
+        max_per_quiz: int = PREFETCH_MAX_PER_QUIZ,
+        daily_tokens: int = PREFETCH_DAILY_TOKENS,
+        workers: int = PREFETCH_WORKERS,
+        max_queued: int = PREFETCH_QUEUE_SIZE,
+        idle_share: float = PREFETCH_IDLE_SHARE,
+        poll_interval: float = PREFETCH_POLL_SECONDS,
+        governor=None,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.enabled = enabled
+        self.max_per_quiz = max_per_quiz
+        self.daily_tokens = daily_tokens
+        self.workers = workers
+        self.idle_share = idle_share
+        self.poll_interval = poll_interval
+        self.governor = governor or llm_governor
+        self._session_factory = session_factory
+        self._pending = deque(maxlen=max_queued)
+        self._ready = asyncio.Event()
+        self._seen = OrderedDict()
+        self._exhausted_on = None
+        self._in_flight = 0
+        self._tasks = []
+        self.stats = {"offered": 0, "enqueued": 0, "dropped": 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        if self.enabled and not self._tasks:
+            quiz_service.generation_listeners.append(self.offer)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        if self._tasks:
+            quiz_service.generation_listeners.remove(self.offer)
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+
+    def offer(self, url: str, scraped_data: dict, quiz: QuizOutput):
+        """Queue the articles that follow from a quiz that was just generated"""
+        owner = current_client.get()
+        if (owner is not None and owner[0] == PREFETCH_CLIENT) or self._exhausted_on == _today():
+            return
+        # Reversed, so that the most likely of them is taken first
+        for next_url in reversed(next_articles(url, scraped_data, quiz, self.max_per_quiz)):
+            self.stats["offered"] += 1
+            if next_url in self._seen:
+                continue
+            self._seen[next_url] = None
+            while len(self._seen) > PREFETCH_SEEN_MAX:
+                self._seen.popitem(last=False)
+            if len(self._pending) == self._pending.maxlen:
+                self.stats["dropped"] += 1
+            self._pending.append(next_url)
+            self.stats["enqueued"] += 1
+        self._ready.set()
+
+    async def tokens_used_today(self) -> int:
+        rows = await usage_recorder.for_client(PREFETCH_CLIENT, days=1)
+        return sum(row["llm_tokens"] for row in rows)
+
+    async def _within_budget(self) -> bool:
+        # Generations under way have not recorded their tokens yet
+        projected = await self.tokens_used_today() + self._in_flight * QUIZ_TOKENS_ESTIMATE
+        return projected <= self.daily_tokens
+
+    async def prefetch(self, url: str) -> str:
+        """
+        Make sure a quiz for url is stored. Returns the outcome: already_stored,
+        generated, over_budget, shed (no LLM capacity) or failed.
+        """
+        async with self._session_factory() as db:
+            if await quiz_cache.get_by_url(db, normalize_url(url)):
+                return self._count("already_stored")
+            # Counted before the budget check, so concurrent checks see each other
+            self._in_flight += 1
+            try:
+                if self.daily_tokens > 0 and not await self._within_budget():
+                    if self._exhausted_on != _today():
+                        logger.info("Prefetch budget of %d LLM tokens used up for today", self.daily_tokens)
+                    self._exhausted_on = _today()
+                    return self._count("over_budget")
+                await quiz_service.build_quiz(db, url)
+            except LLMOverloaded:
+                return self._count("shed")
+            except ValueError as e:
+                # Related topics are not always exact article titles
+                logger.info("Prefetch of %s failed: %s", url, e)
+                return self._count("failed")
+            finally:
+                self._in_flight -= 1
+        logger.debug("Prefetched %s", url)
+        return self._count("generated")
+
+    async def warm(self, urls: list, concurrency: int = 2) -> dict:
+        """Prefetch every URL now, `concurrency` at a time, without waiting for idle capacity"""
+        semaphore = asyncio.Semaphore(concurrency)
+        outcomes = {}
+
+        async def one(url: str):
+            async with semaphore:
+                try:
+                    outcome = await self.prefetch(url)
+                except Exception as e:
+                    logger.warning("Warming %s failed: %s", url, e)
+                    outcome = self._count("failed")
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+        token = current_client.set((PREFETCH_CLIENT, "warm"))
+        try:
+            await asyncio.gather(*(one(url) for url in urls))
+        finally:
+            current_client.reset(token)
+        return outcomes
+
+    def _count(self, outcome: str) -> str:
+        self.stats[outcome] = self.stats.get(outcome, 0) + 1
+        return outcome
+
+    async def _worker(self):
+        current_client.set((PREFETCH_CLIENT, "prefetch"))
+        while True:
+            while not self._pending:
+                self._ready.clear()
+                await self._ready.wait()
+            # Pick the URL only once there is capacity, so offers made meanwhile go first
+            while not self.governor.has_spare_capacity(self.idle_share):
+                await asyncio.sleep(self.poll_interval)
+            if not self._pending:
+                continue
+            url = self._pending.pop()
+            try:
+                await self.prefetch(url)
+            except Exception as e:
+                logger.warning("Prefetch of %s crashed: %s", url, e)
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, enabled=self.enabled, queued=self.queued, daily_tokens=self.daily_tokens)
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import threading
+import zlib
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qs, quote, urlsplit, urlunsplit
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Quiz
+from dump_store import WIKIPEDIA_HOST_RE, title_key
+from metrics import CACHE_LOOKUPS, stage_timer
+from models import QuizOutput
+from storage import load_quiz
+
+# Cache configuration (override through environment variables)
+CACHE_MAX_ENTRIES = int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("QUIZ_CACHE_TTL_SECONDS", "3600"))
+
+# Characters MediaWiki leaves unencoded in article paths
+TITLE_SAFE_CHARS = ";@$!*(),/~:"
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize an article URL so equivalent spellings share one cache key.
+
+    Wikipedia article URLs become https://<lang>.wikipedia.org/wiki/<Title>:
+    the mobile host, index.php?title=, revision and tracking parameters and
+    fragments are dropped, and the title is encoded the way MediaWiki links
+    it (underscores, first letter upper case, one percent-encoding).
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    match = WIKIPEDIA_HOST_RE.match(host)
+    if match:
+        title = None
+        if parts.path.startswith("/wiki/"):
+            title = parts.path[len("/wiki/"):]
+        elif parts.path in ("/w/index.php", "/index.php"):
+            title = (parse_qs(parts.query).get("title") or [None])[0]
+        if title:
+            # ?oldid= and ?diff= name a revision of the same article
+            return _article_url(f"{match.group(1)}.wikipedia.org", title)
+    scheme = "https" if parts.scheme in ("", "http", "https") else parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    path = parts.path.rstrip("/") or "/"
+    # Fragments never change the article that gets scraped
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def _article_url(host: str, title: str) -> str:
+    return f"https://{host}/wiki/{quote(title_key(title).replace(' ', '_'), safe=TITLE_SAFE_CHARS)}"
+
+
+def resolved_url_key(url_key: str, title: str) -> str:
+    """
+    The key of the article a request actually reached: a redirect such as
+    /wiki/Felis_catus scrapes the article titled "Cat", whose key this is
+    """
+    parts = urlsplit(url_key)
+    if not title or not parts.path.startswith("/wiki/") or not WIKIPEDIA_HOST_RE.match(parts.netloc):
+        return url_key
+    return _article_url(parts.netloc, title)
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU mapping whose entries expire after a fixed TTL
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class QuizCache:
+    """
+    Two-tier quiz cache: an in-process LRU in front of the quizzes table.
+
+    Entries are reachable by normalized URL and by the hash of the scraped
+    article content, so a different URL for the same article still hits.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS):
+        self._memory = LRUCache(max_entries, ttl_seconds)
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    async def get_by_url(self, db: AsyncSession, url_key: str) -> Optional[QuizOutput]:
+        return await self._lookup(db, ("url", url_key), Quiz.canonical_url == url_key)
+
+    async def get_by_content(self, db: AsyncSession, digest: str) -> Optional[QuizOutput]:
+        return await self._lookup(db, ("content", digest), Quiz.content_hash == digest)
+
+    async def get_by_id(self, db: AsyncSession, quiz_id: int) -> Optional[QuizOutput]:
+        return await self._lookup(db, ("id", quiz_id), Quiz.id == quiz_id)
+
+    def put(self, url_key: Optional[str], digest: Optional[str], quiz: QuizOutput):
+        if url_key:
+            self._memory.set(("url", url_key), quiz)
+        if digest:
+            self._memory.set(("content", digest), quiz)
+
+    def clear(self):
+        self._memory.clear()
+
+    async def _lookup(self, db: AsyncSession, key, condition) -> Optional[QuizOutput]:
+        quiz = self._memory.get(key)
+        if quiz is not None:
+            self.stats["memory_hits"] += 1
+            CACHE_LOOKUPS.inc(key=key[0], result="memory_hit")
+            return quiz
+
+        with stage_timer("db_read"):
+            result = await db.execute(
+                select(Quiz.full_quiz_data, Quiz.quiz_blob, Quiz.storage_format, Quiz.canonical_url, Quiz.content_hash)
+                .where(condition)
+                .order_by(Quiz.date_generated.desc())
+                .limit(1)
+            )
+            row = result.first()
+        if row is None:
+            self.stats["misses"] += 1
+            CACHE_LOOKUPS.inc(key=key[0], result="miss")
+            return None
+
+        try:
+            quiz = load_quiz(row)
+        except (TypeError, ValueError, zlib.error):
+            # A corrupt row is treated as a miss so the quiz gets regenerated
+            self.stats["misses"] += 1
+            CACHE_LOOKUPS.inc(key=key[0], result="miss")
+            return None
+
+        self.stats["db_hits"] += 1
+        CACHE_LOOKUPS.inc(key=key[0], result="db_hit")
+        self.put(row.canonical_url, row.content_hash, quiz)
+        return quiz
+
+
+quiz_cache = QuizCache()
@@ -0,0 +1,178 @@
+import json
+import os
+from typing import List, NamedTuple, Tuple
+
+from pydantic import ValidationError
+
+from models import KeyEntity, Question
+
+# Fewer usable questions than this triggers a follow-up call for the rest
+MIN_QUESTIONS = int(os.getenv("QUIZ_MIN_QUESTIONS", "5"))
+
+QUIZ_FIELDS = ("title", "summary", "questions", "key_entities", "related_topics")
+
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def repair_json(text: str) -> Tuple[dict, List[str]]:
+    """
+    Parse the JSON object in an LLM response, repairing the usual defects.
+
+    Returns the object and the repairs that were needed, any of:
+    extra_text (prose or fences around the object), trailing_comma,
+    missing_comma, control_char (raw newlines inside strings) and truncated
+    (the response was cut off; everything up to the last complete value is
+    kept and the open arrays and objects are closed). Raises ValueError if
+    no object can be recovered.
+    """
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("No JSON object in AI response")
+    repairs = set()
+    if text[:start].replace("```json", "").replace("```", "").strip():
+        repairs.add("extra_text")
+
+    out = []
+    stack = []          # per open container: [closer, expecting a value (objects only)]
+    cut = None          # (output length, closers) just after the last complete value
+    last = None         # "value", "key", or the last structural character
+    comma_at = None     # output index of a comma that may turn out to be trailing
+    in_string = escape = literal = False
+    end = len(text)
+
+    def value_end():
+        nonlocal last, cut
+        top = stack[-1]
+        if top[0] == "}" and not top[1]:
+            last = "key"
+            return
+        last = "value"
+        top[1] = False
+        cut = (len(out), "".join(s[0] for s in reversed(stack)))
+
+    i = start
+    while i < len(text):
+        ch = text[i]
+        i += 1
+
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+                value_end()
+                continue
+            elif ch in _CONTROL_ESCAPES:
+                repairs.add("control_char")
+                ch = _CONTROL_ESCAPES[ch]
+            out.append(ch)
+            continue
+
+        if literal and (ch in ",:]}" or ch.isspace()):
+            literal = False
+            value_end()
+
+        if ch.isspace():
+            out.append(ch)
+        elif ch in '"{[' or (not literal and ch not in ",:]}"):
+            if last == "value":
+                repairs.add("missing_comma")
+                out.append(",")
+                if stack[-1][0] == "}":
+                    stack[-1][1] = False
+            if ch == '"':
+                in_string = True
+            elif ch in "{[":
+                stack.append(["}" if ch == "{" else "]", False])
+            else:
+                literal = True
+            last = ch
+            out.append(ch)
+        elif literal:
+            out.append(ch)
+        elif ch == ",":
+            comma_at = len(out)
+            last = ","
+            out.append(ch)
+        elif ch == ":":
+            if stack:
+                stack[-1][1] = True
+            last = ":"
+            out.append(ch)
+        elif ch in "]}":
+            if not stack:
+                break
+            if last == ",":
+                repairs.add("trailing_comma")
+                out[comma_at] = ""
+            out.append(stack.pop()[0])
+            if not stack:
+                end = i
+                break
+            value_end()
+
+    if stack:
+        repairs.add("truncated")
+        if cut is None:
+            raise ValueError("AI response was cut off before any complete value")
+        length, closers = cut
+        del out[length:]
+        out.append(closers)
+    elif text[end:].replace("```", "").strip():
+        repairs.add("extra_text")
+
+    try:
+        data = json.loads("".join(out))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"AI response is not repairable JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("AI response is not a JSON object")
+    return data, sorted(repairs)
+
+
+def answerable(question: Question) -> bool:
+    options = {o.strip().lower() for o in question.options}
+    return len(options) >= 2 and question.correct_answer.strip().lower() in options
+
+
+class SalvagedQuiz(NamedTuple):
+    data: dict              # Every usable field, elements validated
+    missing: List[str]      # Fields a follow-up call should supply
+    dropped: int            # Elements that failed validation
+
+
+def salvage_quiz(data: dict, title: str) -> SalvagedQuiz:
+    """Keep the valid parts of a (possibly partial) quiz object and list what is missing"""
+    dropped = 0
+
+    def valid(model, items, check=None):
+        nonlocal dropped
+        out = []
+        for item in items if isinstance(items, list) else []:
+            try:
+                element = model(**item)
+            except (TypeError, ValidationError):
+                dropped += 1
+                continue
+            if check and not check(element):
+                dropped += 1
+                continue
+            out.append(element)
+        return out
+
+    summary = data.get("summary")
+    salvaged = {
+        "title": data.get("title") if isinstance(data.get("title"), str) and data["title"].strip() else title,
+        "summary": summary.strip() if isinstance(summary, str) else "",
+        "questions": valid(Question, data.get("questions"), answerable),
+        "key_entities": valid(KeyEntity, data.get("key_entities")),
+        "related_topics": [t for t in data.get("related_topics") or [] if isinstance(t, str) and t.strip()],
+    }
+    missing = [
+        field for field in QUIZ_FIELDS[1:]
+        if not salvaged[field] or (field == "questions" and len(salvaged[field]) < MIN_QUESTIONS)
+    ]
+    return SalvagedQuiz(salvaged, missing, dropped)
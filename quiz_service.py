@@ -0,0 +1,234 @@
+import asyncio
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from condense import condense
+from database import AsyncSessionLocal
+from metrics import stage_timer
+from models import QuizOutput
+from scraper import scrape_wikipedia
+from llm_quiz_generator_simple import quiz_generator
+from near_duplicates import near_duplicate_index, simhash_of
+from quiz_cache import quiz_cache, normalize_url, content_hash, resolved_url_key
+from singleflight import SingleFlight
+from storage import save_quiz
+
+# Identical in-flight requests share one fetch (keyed by normalized URL)
+# and one generation (keyed by generation mode and content hash, which also
+# covers two URLs for the same article).
+#
+# The quiz cache is mode-agnostic: a cached quiz is served whichever mode it
+# was generated with, so switching modes for an article needs force_refresh.
+scrape_flight = SingleFlight("scrape")
+generate_flight = SingleFlight("generate")
+
+# Called as listener(url, scraped_data, quiz) after each newly generated quiz
+# is saved (the prefetcher registers here). Listeners must not block.
+generation_listeners = []
+
+
+async def _report(progress, stage: str):
+    if progress is not None:
+        await progress(stage)
+
+
+async def build_quiz(db: AsyncSession, url: str, force_refresh: bool = False, progress=None, mode: str = "single") -> QuizOutput:
+    """
+    Scrape -> generate -> persist pipeline shared by the HTTP handlers and job workers.
+
+    progress is an optional async callback that receives each stage name;
+    mode is "single" or "map_reduce" (see generate).
+    """
+    url_key = normalize_url(url)
+    if not force_refresh:
+        cached_quiz = await quiz_cache.get_by_url(db, url_key)
+        if cached_quiz:
+            return cached_quiz
+
+    # Hand the pooled connection back while we wait on the network
+    await db.rollback()
+
+    await _report(progress, "scraping")
+    scraped_data = await scrape_flight.do(url_key, lambda: scrape_wikipedia(url))
+    digest = content_hash(scraped_data["content"])
+    article_key = resolved_url_key(url_key, scraped_data["title"])
+    if not force_refresh:
+        cached_quiz = await find_existing(db, url_key, article_key, digest, scraped_data["content"])
+        if cached_quiz:
+            return cached_quiz
+        await db.rollback()
+
+    await _report(progress, "generating")
+    quiz = await generate_flight.do(
+        (mode, digest), lambda: _generate_and_save(url, article_key, digest, scraped_data, progress, mode)
+    )
+    quiz_cache.put(url_key, None, quiz)
+    return quiz
+
+
+async def find_existing(db: AsyncSession, url_key: str, article_key: str, digest: str, content: str) -> Optional[QuizOutput]:
+    """
+    A stored quiz for an article scraped under url_key that the URL lookup
+    missed: the article a redirect led to, the same content under another
+    URL, or a near-identical copy of the content (see near_duplicates.py).
+    Hits are cached under url_key and digest.
+    """
+    quiz = None
+    if article_key != url_key:
+        quiz = await quiz_cache.get_by_url(db, article_key)
+    if quiz is None:
+        quiz = await quiz_cache.get_by_content(db, digest)
+    if quiz is None:
+        with stage_timer("near_duplicate"):
+            quiz_id = await near_duplicate_index.find(db, content, url_key)
+        if quiz_id is not None:
+            quiz = await quiz_cache.get_by_id(db, quiz_id)
+    if quiz is not None:
+        quiz_cache.put(url_key, digest, quiz)
+    return quiz
+
+
+async def prompt_content(scraped_data: dict) -> str:
+    """The article text packed into PROMPT_TOKEN_BUDGET for the LLM prompt"""
+    with stage_timer("prompt_build"):
+        condensed = await asyncio.to_thread(condense, scraped_data.get("sections"), scraped_data["content"])
+    return condensed.text
+
+
+async def generate(scraped_data: dict, mode: str = "single") -> QuizOutput:
+    """
+    single: one prompt with the article condensed into PROMPT_TOKEN_BUDGET.
+    map_reduce: one prompt per group of sections, run in parallel and merged,
+    which covers long articles in more depth for about the latency of one
+    section.
+    """
+    if mode == "map_reduce":
+        sections = scraped_data.get("sections") or [{"heading": "", "paragraphs": [scraped_data["content"]]}]
+        return await quiz_generator.generate_quiz_map_reduce(scraped_data["title"], sections)
+    return await quiz_generator.generate_quiz(scraped_data["title"], await prompt_content(scraped_data))
+
+
+async def _generate_and_save(url: str, url_key: str, digest: str, scraped_data: dict, progress=None, mode: str = "single") -> QuizOutput:
+    quiz_data = await generate(scraped_data, mode)
+
+    await _report(progress, "saving")
+    await _save(url, url_key, digest, scraped_data, quiz_data)
+    return quiz_data
+
+
+async def _save(url: str, url_key: str, digest: str, scraped_data: dict, quiz_data: QuizOutput):
+    # The flight can outlive the request that started it, so it saves
+    # through its own session rather than the caller's.
+    with stage_timer("db_write"):
+        async with AsyncSessionLocal() as db:
+            simhash = await asyncio.to_thread(simhash_of, scraped_data["content"])
+            await save_quiz(db, url, url_key, digest, scraped_data["title"], scraped_data["content"], quiz_data, simhash=simhash)
+            await db.commit()
+    quiz_cache.put(url_key, digest, quiz_data)
+    for listener in generation_listeners:
+        listener(url, scraped_data, quiz_data)
+
+
+def _replay(quiz: QuizOutput):
+    """The events a streamed generation of this quiz would have produced"""
+    yield "title", quiz.title
+    yield "summary", quiz.summary
+    for question in quiz.questions:
+        yield "question", question
+    for entity in quiz.key_entities:
+        yield "key_entity", entity
+    yield "related_topics", quiz.related_topics
+    yield "quiz", quiz
+
+
+async def stream_quiz(db: AsyncSession, url: str, force_refresh: bool = False, mode: str = "single"):
+    """
+    Streaming variant of build_quiz: yields (event, value) pairs as the quiz
+    is produced -- ("stage", name) while scraping and generating, then the
+    summary, each KeyEntity and each Question as soon as the LLM completes
+    it, and finally ("quiz", QuizOutput). Cached quizzes are replayed at once.
+
+    map_reduce generations only have a result once every section is merged,
+    so their quiz is replayed when it is ready.
+    """
+    url_key = normalize_url(url)
+    if not force_refresh:
+        cached_quiz = await quiz_cache.get_by_url(db, url_key)
+        if cached_quiz:
+            for event in _replay(cached_quiz):
+                yield event
+            return
+
+    await db.rollback()
+
+    yield "stage", "scraping"
+    scraped_data = await scrape_flight.do(url_key, lambda: scrape_wikipedia(url))
+    digest = content_hash(scraped_data["content"])
+    article_key = resolved_url_key(url_key, scraped_data["title"])
+    if not force_refresh:
+        cached_quiz = await find_existing(db, url_key, article_key, digest, scraped_data["content"])
+        if cached_quiz:
+            for event in _replay(cached_quiz):
+                yield event
+            return
+        await db.rollback()
+
+    yield "stage", "generating"
+    # The generation runs as a shielded flight that feeds this queue, so it
+    # still gets saved if the client disconnects, and concurrent requests for
+    # the same article (streaming or not) share it.
+    events = asyncio.Queue()
+    if mode == "map_reduce":
+        quiz = await generate_flight.do(
+            (mode, digest), lambda: _generate_and_save(url, article_key, digest, scraped_data, mode=mode)
+        )
+        for event in _replay(quiz):
+            yield event
+        return
+
+    task, started = generate_flight.start(
+        (mode, digest), lambda: _stream_and_save(url, article_key, digest, scraped_data, events)
+    )
+    if not started:
+        for event in _replay(await asyncio.shield(task)):
+            yield event
+        return
+
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        yield event
+    yield "quiz", await asyncio.shield(task)
+
+
+async def _stream_and_save(url: str, url_key: str, digest: str, scraped_data: dict, events: asyncio.Queue) -> QuizOutput:
+    quiz_data = None
+    try:
+        content = await prompt_content(scraped_data)
+        async for event, value in quiz_generator.generate_quiz_stream(scraped_data["title"], content):
+            if event == "quiz":
+                quiz_data = value
+            else:
+                events.put_nowait((event, value))
+    finally:
+        events.put_nowait(None)
+
+    await _save(url, url_key, digest, scraped_data, quiz_data)
+    return quiz_data
+
+
+def coalescing_stats() -> dict:
+    return {flight.name: dict(flight.stats, inflight=flight.inflight) for flight in (scrape_flight, generate_flight)}
+
+
+def repair_stats() -> dict:
+    """How often LLM responses needed repair, follow-up calls or full retries"""
+    return getattr(quiz_generator, "repair_stats", {})
+
+
+def router_stats() -> dict:
+    """Per-model latency, error rate and circuit state when requests go through a ModelRouter"""
+    model = getattr(quiz_generator, "model", None)
+    return model.snapshot() if hasattr(model, "snapshot") else {}
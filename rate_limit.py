@@ -0,0 +1,185 @@
+import hashlib
+import hmac
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import select, update
+
+from database import AsyncSessionLocal, RateLimitBucket
+from metrics import RATE_LIMITED
+from storage import insert_ignore
+
+# Rate limiting configuration (override through environment variables)
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")  # memory (one node) | sql (shared by all nodes)
+# Per-endpoint limits as "<count>/<second|minute|hour|day>", or "off"
+RATE_LIMITS = {
+    "generate": os.getenv("RATE_LIMIT_GENERATE", "10/minute"),  # /generate_quiz and /generate_quiz/stream
+    "batch": os.getenv("RATE_LIMIT_BATCH", "1000/hour"),        # charged per URL in the batch
+    "jobs": os.getenv("RATE_LIMIT_JOBS", "10/minute"),
+}
+# Comma-separated API keys that identify a client (X-API-Key header).
+# Requests without a listed key are limited per IP address.
+API_KEYS = [key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()]
+# Proxies in front of the app that append the address they saw to
+# X-Forwarded-For (1 on Render). Entries further left than that are sent by
+# the client and are ignored; 0 uses the connecting address
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+MEMORY_MAX_BUCKETS = 100_000  # least recently used buckets are dropped (a dropped bucket starts full)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Rate(NamedTuple):
+    count: int
+    period: str
+
+    @property
+    def per_second(self) -> float:
+        return self.count / PERIODS[self.period]
+
+    def __str__(self):
+        return f"{self.count}/{self.period}"
+
+
+def parse_rate(spec: str) -> Optional[Rate]:
+    spec = spec.strip().lower()
+    if spec in ("", "0", "off"):
+        return None
+    count, _, period = spec.partition("/")
+    if period not in PERIODS or not count.isdigit():
+        raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. 10/minute")
+    return Rate(int(count), period)
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    rate: Rate
+    remaining: int
+    retry_after: float
+
+    def headers(self) -> dict:
+        headers = {"X-RateLimit-Limit": str(self.rate), "X-RateLimit-Remaining": str(self.remaining)}
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+
+def _refill_and_take(tokens: float, elapsed: float, rate: Rate, cost: int):
+    """Bucket arithmetic shared by the stores: (new tokens, allowed, retry_after)"""
+    tokens = min(float(rate.count), tokens + max(0.0, elapsed) * rate.per_second)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / rate.per_second
+
+
+class MemoryBucketStore:
+    """Token buckets in process memory; each node enforces its own limits"""
+
+    def __init__(self, max_buckets: int = MEMORY_MAX_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: Rate, cost: int):
+        with self._lock:
+            now = self._clock()
+            tokens, updated = self._buckets.get(key, (float(rate.count), now))
+            tokens, allowed, retry_after = _refill_and_take(tokens, now - updated, rate, cost)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return tokens, allowed, retry_after
+
+
+class SQLBucketStore:
+    """
+    Token buckets in the rate_limit_buckets table, so every node draws on
+    the same bucket. Each take is one short transaction that locks the row.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, clock=time.time):
+        self._session_factory = session_factory
+        self._clock = clock
+
+    async def take(self, key: str, rate: Rate, cost: int):
+        async with self._session_factory() as db:
+            now = self._clock()
+            await db.execute(insert_ignore(db, RateLimitBucket).values(key=key, tokens=float(rate.count), updated_at=now))
+            row = (await db.execute(
+                select(RateLimitBucket.tokens, RateLimitBucket.updated_at)
+                .where(RateLimitBucket.key == key)
+                .with_for_update()
+            )).one()
+            tokens, allowed, retry_after = _refill_and_take(row.tokens, now - row.updated_at, rate, cost)
+            await db.execute(
+                update(RateLimitBucket).where(RateLimitBucket.key == key).values(tokens=tokens, updated_at=now)
+            )
+            await db.commit()
+        return tokens, allowed, retry_after
+
+
+STORES = {"memory": MemoryBucketStore, "sql": SQLBucketStore}
+
+
+def client_address(forwarded_for: List[str], peer: Optional[str], hops: int = TRUSTED_PROXY_HOPS) -> Optional[str]:
+    """
+    The client's address: the X-Forwarded-For entry added by the outermost
+    trusted proxy, counted from the right. A request with fewer entries did
+    not come through the proxies, so the connecting address is used.
+    """
+    if hops <= 0:
+        return peer
+    entries = [entry.strip() for header in forwarded_for for entry in header.split(",") if entry.strip()]
+    return entries[-hops] if len(entries) >= hops else peer
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiting per client and endpoint. A bucket holds up to
+    `count` requests and refills at count per period, so a client can burst
+    to the full limit and then continues at the average rate.
+    """
+
+    def __init__(self, limits: dict = None, store=None, api_keys=API_KEYS):
+        self.limits = {endpoint: parse_rate(spec) for endpoint, spec in (limits or RATE_LIMITS).items()}
+        if store is None:
+            if RATE_LIMIT_STORE not in STORES:
+                raise ValueError(f"Unknown rate limit store: {RATE_LIMIT_STORE}")
+            store = STORES[RATE_LIMIT_STORE]()
+        self.store = store
+        self.api_keys = list(api_keys)
+        self.stats = {"allowed": 0, "rejected": 0}
+
+    def client_id(self, api_key: Optional[str], host: Optional[str]) -> str:
+        """
+        A listed API key identifies the client; it is stored hashed. Anything
+        else falls back to the address, so made-up keys do not get fresh buckets.
+        """
+        if api_key and any(hmac.compare_digest(api_key, known) for known in self.api_keys):
+            return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        return f"ip:{host or 'unknown'}"
+
+    async def check(self, endpoint: str, client: str, cost: int = 1) -> Optional[Decision]:
+        """
+        Charge `cost` requests to the client's bucket for endpoint. None when
+        the endpoint has no limit; raises ValueError when cost can never fit.
+        """
+        rate = self.limits.get(endpoint)
+        if rate is None:
+            return None
+        if cost > rate.count:
+            raise ValueError(f"At most {rate.count} requests per {rate.period} are allowed, this one needs {cost}")
+        tokens, allowed, retry_after = await self.store.take(f"{endpoint}:{client}", rate, cost)
+        self.stats["allowed" if allowed else "rejected"] += 1
+        if not allowed:
+            RATE_LIMITED.inc(endpoint=endpoint)
+        return Decision(allowed, rate, int(tokens), retry_after)
+
+
+rate_limiter = RateLimiter()
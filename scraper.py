@@ -1,8 +1,34 @@
-import requests
+import asyncio
+import logging
+import os
+import httpx
 from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from typing import Callable, List, NamedTuple, Optional
+from urllib.parse import unquote
 import re
 
-def scrape_wikipedia(url: str):
+from dump_store import dump_store
+from fetcher import wikipedia_fetcher
+from metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError:  # lxml is optional, the other engines cover its absence
+    lxml = None
+
+# bs4 | lxml | stream | auto (stream). lxml is opt-in: on malformed markup it
+# closes paragraphs the way browsers do (a <div> ends an open <p>), so its
+# text can differ from bs4's, which stream matches
+SCRAPER_ENGINE = os.getenv("SCRAPER_ENGINE", "auto")
+# web | dump (local store built by ingest_dump.py, no network) | auto (dump, then web for articles it lacks)
+CONTENT_SOURCE = os.getenv("CONTENT_SOURCE", "web")
+CONTENT_SOURCES = ("web", "dump", "auto")
+
+async def scrape_wikipedia(url: str):
     """
     Robust Wikipedia scraper that properly extracts article content
     """
@@ -11,124 +37,499 @@ def scrape_wikipedia(url: str):
         if 'wikipedia.org' not in url.lower():
             raise ValueError("Please provide a valid Wikipedia URL")
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        
-        print(f"Fetching Wikipedia URL: {url}")
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Get title - multiple selectors for robustness
-        title = None
-        title_selectors = ['h1#firstHeading', 'h1.firstHeading', 'h1']
-        for selector in title_selectors:
-            title = soup.select_one(selector)
-            if title:
-                break
-        
-        title_text = title.get_text().strip() if title else "Unknown Title"
-        print(f"Found title: {title_text}")
-        
-        # Find the main content area - multiple strategies
-        content_area = None
-        
-        # Strategy 1: Look for the main content div
-        content_selectors = [
-            'div#mw-content-text',
-            'div.mw-content-text', 
-            'div.mw-parser-output',
-            'div.content'
-        ]
-        
-        for selector in content_selectors:
-            content_area = soup.select_one(selector)
-            if content_area:
-                print(f"Found content using selector: {selector}")
-                break
-        
-        # Strategy 2: If no specific content div, look for paragraphs in body
-        if not content_area:
-            print("No specific content div found, using body content")
-            content_area = soup.find('body')
+        if CONTENT_SOURCE not in CONTENT_SOURCES:
+            raise ValueError(f"Unknown content source: {CONTENT_SOURCE}")
+        if CONTENT_SOURCE == "dump" or CONTENT_SOURCE == "auto" and dump_store.exists():
+            with stage_timer("dump_read"):
+                article = await asyncio.to_thread(dump_store.get_url, url)
+            if article is not None:
+                return article
+            if CONTENT_SOURCE == "dump":
+                raise ValueError("This article is not in the Wikipedia dump")
+            logger.debug("Not in the Wikipedia dump, fetching: %s", url)
+
+        logger.debug("Fetching Wikipedia URL: %s", url)
+        with stage_timer("fetch"):
+            html = await wikipedia_fetcher.fetch(url)
         
-        if not content_area:
-            raise ValueError("Could not find any content area on the page")
+        # Parsing is CPU bound, keep it off the event loop
+        return await asyncio.to_thread(parse_wikipedia_html, html)
         
-        # Remove unwanted elements - be more specific
-        unwanted_elements = content_area.find_all([
-            'script', 'style', 'table', 'sup', 'div.thumb', 'div.navbox',
-            'div.infobox', 'div.hatnote', 'span.reference', 'div.reference',
-            'ol.references', 'div.mw-references-wrap', 'link', 'meta',
-            'img', 'figure', 'aside', 'nav', 'footer', 'header'
-        ])
+    except httpx.HTTPError as e:
+        raise ValueError(f"Failed to fetch the Wikipedia page: {str(e)}")
+    except Exception as e:
+        raise ValueError(f"Error processing the page: {str(e)}")
+
+# Elements removed from the content area before paragraphs are read
+UNWANTED_TAGS = (
+    'script', 'style', 'table', 'sup', 'link', 'meta',
+    'img', 'figure', 'aside', 'nav', 'footer', 'header'
+)
+
+# Also remove elements by class that contain navigation or metadata
+UNWANTED_CLASSES = (
+    'navbox', 'infobox', 'hatnote', 'reference', 'citation',
+    'external', 'mw-editsection', 'mw-redirect', 'geo',
+    'coordinates', 'metadata', 'ambox', 'sidebar'
+)
+
+CONTENT_SELECTORS = [
+    'div#mw-content-text',
+    'div.mw-content-text',
+    'div.mw-parser-output',
+    'div.content'
+]
+
+TITLE_SELECTORS = ['h1#firstHeading', 'h1.firstHeading', 'h1']
+
+CITATION_NUMBER_RE = re.compile(r'\[\d+\]')   # [1], [2], etc.
+CITATION_WORD_RE = re.compile(r'\[\w+\]')     # [citation needed], etc.
+WHITESPACE_RE = re.compile(r'\s+')
+# /wiki/<Title> links to other articles; a colon marks another namespace (File:, Help:, ...)
+ARTICLE_LINK_RE = re.compile(r'^/wiki/([^:#?]+)(?:#.*)?$')
+SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+
+class ExtractedPage(NamedTuple):
+    title: Optional[str]            # Raw heading text, None if no h1 was found
+    selector: Optional[str]         # Content selector that matched, None for <body>
+    paragraphs: List[str]           # Raw text of every remaining <p>, in document order
+    sections: List[str]             # Raw "h2" or "h2 / h3" heading above each paragraph ('' for the lead)
+    area_text: Callable[[], str]    # Full text of the cleaned content area (fallback path)
+    links: List[str]                # href of every <a> left in those paragraphs, in document order
+
+def parse_wikipedia_html(html, engine: str = None):
+    """
+    Extract the article title and cleaned paragraph text from a Wikipedia page
+    """
+    engine = resolve_engine(engine or SCRAPER_ENGINE)
+    with stage_timer("parse"):
+        page = EXTRACTORS[engine](html)
+    return build_article(page)
+
+def build_article(page: ExtractedPage) -> dict:
+    """
+    The scraped article for an extracted page: title, cleaned content,
+    sections and linked article titles. Raises ValueError when too little
+    text is left.
+    """
+    title_text = page.title.strip() if page.title is not None else "Unknown Title"
+    logger.debug("Found title: %s", title_text)
+    if page.selector:
+        logger.debug("Found content using selector: %s", page.selector)
+    else:
+        logger.debug("No specific content div found, using body content")
+    
+    with stage_timer("cleanup"):
+        clean_text, sections = _clean_page(page)
+    
+    logger.debug("Final content length: %d characters", len(clean_text))
+    
+    if len(clean_text) < 100:
+        # If still too short, provide more diagnostic info
+        logger.warning("Diagnostic - Number of paragraphs found: %d", len(page.paragraphs))
+        logger.warning("Diagnostic - First paragraph preview: %s", page.paragraphs[0][:100] if page.paragraphs else "No paragraphs")
+        raise ValueError(f"Not enough meaningful content found. Only extracted {len(clean_text)} characters.")
+    
+    logger.info("Successfully scraped Wikipedia article: %s", title_text)
+    # The whole article is kept; condense.py picks what fits in the prompt
+    return {
+        "title": title_text,
+        "content": clean_text,
+        "sections": sections,
+        "links": _article_links(page.links, title_text),
+    }
+
+def _article_links(hrefs: List[str], title: str) -> List[str]:
+    """Titles of the articles the paragraphs link to, first mention first"""
+    titles = {}
+    for href in hrefs:
+        match = ARTICLE_LINK_RE.match(href)
+        if match:
+            linked = unquote(match.group(1)).replace('_', ' ').strip()
+            if linked and linked != title and linked != 'Main Page':
+                titles.setdefault(linked, None)
+    return list(titles)
+
+def _clean_page(page: ExtractedPage):
+    """Clean paragraph text and group it by section; returns (content, sections)"""
+    text_content = []
+    sections = []
+    for raw_text, raw_heading in zip(page.paragraphs, page.sections):
+        text = raw_text.strip()
+        # Clean the text
+        text = CITATION_NUMBER_RE.sub('', text)
+        text = CITATION_WORD_RE.sub('', text)
+        text = WHITESPACE_RE.sub(' ', text)
+        text = text.strip()
         
-        for element in unwanted_elements:
+        # Only include substantial paragraphs (not navigation, disclaimers, etc.)
+        if (len(text) > 50 and 
+            not text.startswith('This article') and
+            not text.startswith('For other uses') and
+            not text.startswith('In other projects') and
+            'disambiguation' not in text.lower()):
+            text_content.append(text)
+            heading = WHITESPACE_RE.sub(' ', raw_heading).strip()
+            if not sections or sections[-1]["heading"] != heading:
+                sections.append({"heading": heading, "paragraphs": []})
+            sections[-1]["paragraphs"].append(text)
+    
+    # If we still don't have enough content, try a different approach
+    if len(text_content) < 3:
+        logger.info("Not enough paragraphs found, trying alternative extraction")
+        # Split the whole content area into sentences and take the first substantial ones
+        sentences = SENTENCE_SPLIT_RE.split(page.area_text())
+        text_content = [s.strip() for s in sentences if len(s.strip()) > 30][:20]
+        sections = [{"heading": "", "paragraphs": text_content}]
+    
+    clean_text = ' '.join(text_content)
+    
+    # Final cleanup
+    clean_text = WHITESPACE_RE.sub(' ', clean_text).strip()
+    return clean_text, sections
+
+def resolve_engine(engine: str) -> str:
+    if engine == "auto":
+        return "stream"
+    if engine not in EXTRACTORS:
+        raise ValueError(f"Unknown scraper engine: {engine}")
+    if engine == "lxml" and lxml is None:
+        raise ValueError("The lxml scraper engine requires the lxml package")
+    return engine
+
+def _subsection(h2: str, h3: str) -> str:
+    return f"{h2.strip()} / {h3.strip()}" if h2.strip() else h3
+
+def _decode(html) -> str:
+    if isinstance(html, bytes):
+        return html.decode('utf-8', errors='replace')
+    return html
+
+# --- BeautifulSoup engine: the reference implementation ---------------------
+
+def extract_with_bs4(html) -> ExtractedPage:
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    title = None
+    for selector in TITLE_SELECTORS:
+        title = soup.select_one(selector)
+        if title:
+            break
+    
+    content_area = None
+    matched_selector = None
+    for selector in CONTENT_SELECTORS:
+        content_area = soup.select_one(selector)
+        if content_area:
+            matched_selector = selector
+            break
+    
+    if not content_area:
+        content_area = soup.find('body')
+    
+    if not content_area:
+        raise ValueError("Could not find any content area on the page")
+    
+    for element in content_area.find_all(list(UNWANTED_TAGS)):
+        element.decompose()
+    
+    for class_name in UNWANTED_CLASSES:
+        for element in content_area.find_all(class_=class_name):
             element.decompose()
-        
-        # Also remove elements by class that contain navigation or metadata
-        unwanted_classes = [
-            'navbox', 'infobox', 'hatnote', 'reference', 'citation',
-            'external', 'mw-editsection', 'mw-redirect', 'geo',
-            'coordinates', 'metadata', 'ambox', 'sidebar'
+    
+    paragraphs = []
+    sections = []
+    links = []
+    h2 = heading = ''
+    for element in content_area.find_all(['h2', 'h3', 'p']):
+        if element.name == 'h2':
+            h2 = heading = element.get_text()
+        elif element.name == 'h3':
+            heading = _subsection(h2, element.get_text())
+        else:
+            paragraphs.append(element.get_text())
+            sections.append(heading)
+            links.extend(a['href'] for a in element.find_all('a', href=True))
+    
+    return ExtractedPage(
+        title=title.get_text() if title else None,
+        selector=matched_selector,
+        paragraphs=paragraphs,
+        sections=sections,
+        area_text=content_area.get_text,
+        links=links,
+    )
+
+# --- lxml engine: C parser, one walk over the content area ------------------
+
+def _class_test(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+_UNWANTED_TAG_SET = frozenset(UNWANTED_TAGS)
+_UNWANTED_CLASS_SET = frozenset(UNWANTED_CLASSES)
+
+if lxml is not None:
+    _TITLE_XPATHS = [
+        etree.XPath("(//h1[@id='firstHeading'])[1]"),
+        etree.XPath(f"(//h1[{_class_test('firstHeading')}])[1]"),
+        etree.XPath("(//h1)[1]"),
+    ]
+    _CONTENT_XPATHS = [
+        (selector, etree.XPath(xpath)) for selector, xpath in [
+            ('div#mw-content-text', "(//div[@id='mw-content-text'])[1]"),
+            ('div.mw-content-text', f"(//div[{_class_test('mw-content-text')}])[1]"),
+            ('div.mw-parser-output', f"(//div[{_class_test('mw-parser-output')}])[1]"),
+            ('div.content', f"(//div[{_class_test('content')}])[1]"),
         ]
+    ]
+
+def extract_with_lxml(html) -> ExtractedPage:
+    parser = lxml.html.HTMLParser(remove_comments=True)
+    root = lxml.html.document_fromstring(_decode(html), parser=parser)
+    
+    title = None
+    for xpath in _TITLE_XPATHS:
+        found = xpath(root)
+        if found:
+            title = found[0]
+            break
+    
+    content_area = None
+    matched_selector = None
+    for selector, xpath in _CONTENT_XPATHS:
+        found = xpath(root)
+        if found:
+            content_area = found[0]
+            matched_selector = selector
+            break
+    
+    if content_area is None:
+        content_area = root.find('body')
+    
+    if content_area is None:
+        raise ValueError("Could not find any content area on the page")
+    
+    title_text = title.text_content() if title is not None else None
+    
+    # A plain walk beats an XPath class predicate by an order of magnitude here
+    unwanted = []
+    elements = content_area.iter()
+    next(elements)  # the content area itself is never removed
+    for element in elements:
+        if element.tag in _UNWANTED_TAG_SET:
+            unwanted.append(element)
+            continue
+        classes = element.get('class')
+        if classes and not _UNWANTED_CLASS_SET.isdisjoint(classes.split()):
+            unwanted.append(element)
+    
+    for element in unwanted:
+        # drop_tree keeps the element's tail text, like bs4's decompose()
+        element.drop_tree()
+    
+    paragraphs = []
+    sections = []
+    links = []
+    h2 = heading = ''
+    for element in content_area.iter('h2', 'h3', 'p'):
+        if element.tag == 'h2':
+            h2 = heading = element.text_content()
+        elif element.tag == 'h3':
+            heading = _subsection(h2, element.text_content())
+        else:
+            paragraphs.append(element.text_content())
+            sections.append(heading)
+            links.extend(a.get('href') for a in element.iter('a') if a.get('href') is not None)
+    
+    return ExtractedPage(
+        title=title_text,
+        selector=matched_selector,
+        paragraphs=paragraphs,
+        sections=sections,
+        area_text=content_area.text_content,
+        links=links,
+    )
+
+# --- Streaming engine: single html.parser pass, no tree ---------------------
+
+# Void elements close themselves, mirroring bs4's html.parser tree builder
+VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+    'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+    'nextid', 'spacer'
+))
+
+class _Capture:
+    """Text collected for the first element matching one selector"""
+    
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.parts = []
+        self.paragraphs = []
+        self.open_paragraphs = []  # (depth, index) of <p> elements still open
+        self.headings = []         # (tag, text parts) of every <h2>/<h3>
+        self.open_headings = []    # (depth, index) of headings still open
+        self.sections = []         # index into headings for each paragraph, -1 for the lead
+        self.links = []            # href of every <a> opened inside a paragraph
+
+class _StreamingExtractor(HTMLParser):
+    """
+    Walks the token stream once, tracking an element stack the same way
+    bs4's html.parser builder would. Text under an unwanted element is
+    skipped for any capture that started above that element.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []            # (tag, unwanted) for every open element
+        self.unwanted_depths = []  # stack depths of open unwanted elements
+        self.titles = {}           # title selector -> _Capture
+        self.areas = {}            # content selector (or 'body') -> _Capture
+    
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs)
+        if tag in VOID_TAGS:
+            self._close_to(len(self.stack) - 1)
+    
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs)
+        self._close_to(len(self.stack) - 1)
+    
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                self._close_to(index)
+                return
+    
+    def handle_data(self, data):
+        for capture in self.titles.values():
+            if capture.depth is not None:
+                capture.parts.append(data)
+        deepest_unwanted = self.unwanted_depths[-1] if self.unwanted_depths else -1
+        for capture in self.areas.values():
+            if capture.depth is None or deepest_unwanted > capture.depth:
+                continue
+            capture.parts.append(data)
+            for _, index in capture.open_paragraphs:
+                capture.paragraphs[index].append(data)
+            for _, index in capture.open_headings:
+                capture.headings[index][1].append(data)
+    
+    def _open(self, tag, attrs):
+        element_id = None
+        classes = ()
+        href = None
+        for name, value in attrs:
+            if name == 'id':
+                element_id = value
+            elif name == 'class' and value:
+                classes = value.split()
+            elif name == 'href':
+                href = value
         
-        for class_name in unwanted_classes:
-            elements = content_area.find_all(class_=class_name)
-            for element in elements:
-                element.decompose()
-        
-        # Extract text from paragraphs
-        paragraphs = content_area.find_all('p')
-        text_content = []
-        
-        for p in paragraphs:
-            text = p.get_text().strip()
-            # Clean the text
-            text = re.sub(r'\[\d+\]', '', text)  # Remove [1], [2], etc.
-            text = re.sub(r'\[\w+\]', '', text)  # Remove [citation needed], etc.
-            text = re.sub(r'\s+', ' ', text)     # Normalize whitespace
-            text = text.strip()
-            
-            # Only include substantial paragraphs (not navigation, disclaimers, etc.)
-            if (len(text) > 50 and 
-                not text.startswith('This article') and
-                not text.startswith('For other uses') and
-                not text.startswith('In other projects') and
-                'disambiguation' not in text.lower()):
-                text_content.append(text)
-        
-        # If we still don't have enough content, try a different approach
-        if len(text_content) < 3:
-            print("Not enough paragraphs found, trying alternative extraction...")
-            # Get all text from the main content area
-            all_text = content_area.get_text()
-            # Split into sentences and take the first substantial ones
-            sentences = re.split(r'[.!?]+', all_text)
-            text_content = [s.strip() for s in sentences if len(s.strip()) > 30][:20]
-        
-        clean_text = ' '.join(text_content)
-        
-        # Final cleanup
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-        
-        print(f"Final content length: {len(clean_text)} characters")
-        
-        if len(clean_text) < 100:
-            # If still too short, provide more diagnostic info
-            print(f"Diagnostic - Number of paragraphs found: {len(paragraphs)}")
-            print(f"Diagnostic - First paragraph preview: {paragraphs[0].get_text()[:100] if paragraphs else 'No paragraphs'}")
-            raise ValueError(f"Not enough meaningful content found. Only extracted {len(clean_text)} characters.")
-        
-        print(f"Successfully scraped Wikipedia article: {title_text}")
-        return {
-            "title": title_text,
-            "content": clean_text[:12000]  # Limit for LLM
-        }
+        depth = len(self.stack)
+        unwanted = tag in _UNWANTED_TAG_SET or not _UNWANTED_CLASS_SET.isdisjoint(classes)
+        self.stack.append((tag, unwanted))
+        if unwanted:
+            self.unwanted_depths.append(depth)
         
-    except requests.RequestException as e:
-        raise ValueError(f"Failed to fetch the Wikipedia page: {str(e)}")
-    except Exception as e:
-        raise ValueError(f"Error processing the page: {str(e)}")
\ No newline at end of file
+        if tag == 'h1':
+            if element_id == 'firstHeading':
+                self._start_capture(self.titles, 'h1#firstHeading', depth)
+            if 'firstHeading' in classes:
+                self._start_capture(self.titles, 'h1.firstHeading', depth)
+            self._start_capture(self.titles, 'h1', depth)
+        elif tag == 'div':
+            if element_id == 'mw-content-text':
+                self._start_capture(self.areas, 'div#mw-content-text', depth)
+            if 'mw-content-text' in classes:
+                self._start_capture(self.areas, 'div.mw-content-text', depth)
+            if 'mw-parser-output' in classes:
+                self._start_capture(self.areas, 'div.mw-parser-output', depth)
+            if 'content' in classes:
+                self._start_capture(self.areas, 'div.content', depth)
+        elif tag == 'body':
+            self._start_capture(self.areas, 'body', depth)
+        elif tag == 'a' and href is not None:
+            deepest_unwanted = self.unwanted_depths[-1] if self.unwanted_depths else -1
+            for capture in self.areas.values():
+                if capture.depth is not None and capture.open_paragraphs and deepest_unwanted <= capture.depth:
+                    # Once per link, however many paragraphs are open around it
+                    capture.links.append(href)
+        elif tag == 'p' or tag == 'h2' or tag == 'h3':
+            deepest_unwanted = self.unwanted_depths[-1] if self.unwanted_depths else -1
+            for capture in self.areas.values():
+                if capture.depth is not None and depth > capture.depth and deepest_unwanted <= capture.depth:
+                    if tag == 'p':
+                        capture.open_paragraphs.append((depth, len(capture.paragraphs)))
+                        capture.paragraphs.append([])
+                        capture.sections.append(len(capture.headings) - 1)
+                    else:
+                        capture.open_headings.append((depth, len(capture.headings)))
+                        capture.headings.append((tag, []))
+    
+    def _start_capture(self, captures, selector, depth):
+        # Only the first matching element counts, like select_one()
+        if selector not in captures:
+            captures[selector] = _Capture(depth)
+    
+    def _close_to(self, index):
+        del self.stack[index:]
+        while self.unwanted_depths and self.unwanted_depths[-1] >= index:
+            self.unwanted_depths.pop()
+        for capture in (*self.titles.values(), *self.areas.values()):
+            if capture.depth is not None and capture.depth >= index:
+                capture.depth = None
+            while capture.open_paragraphs and capture.open_paragraphs[-1][0] >= index:
+                capture.open_paragraphs.pop()
+            while capture.open_headings and capture.open_headings[-1][0] >= index:
+                capture.open_headings.pop()
+
+def _stream_sections(area: _Capture) -> List[str]:
+    names = []
+    h2 = ''
+    for tag, parts in area.headings:
+        if tag == 'h2':
+            h2 = ''.join(parts)
+            names.append(h2)
+        else:
+            names.append(_subsection(h2, ''.join(parts)))
+    return [names[i] if i >= 0 else '' for i in area.sections]
+
+def extract_with_stream(html) -> ExtractedPage:
+    extractor = _StreamingExtractor()
+    extractor.feed(_decode(html))
+    extractor.close()
+    
+    title = None
+    for selector in TITLE_SELECTORS:
+        if selector in extractor.titles:
+            title = ''.join(extractor.titles[selector].parts)
+            break
+    
+    area = None
+    matched_selector = None
+    for selector in CONTENT_SELECTORS + ['body']:
+        if selector in extractor.areas:
+            area = extractor.areas[selector]
+            matched_selector = selector if selector != 'body' else None
+            break
+    
+    if area is None:
+        raise ValueError("Could not find any content area on the page")
+    
+    return ExtractedPage(
+        title=title,
+        selector=matched_selector,
+        paragraphs=[''.join(parts) for parts in area.paragraphs],
+        sections=_stream_sections(area),
+        area_text=lambda: ''.join(area.parts),
+        links=area.links,
+    )
+
+EXTRACTORS = {
+    'bs4': extract_with_bs4,
+    'lxml': extract_with_lxml,
+    'stream': extract_with_stream,
+}
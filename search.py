@@ -0,0 +1,153 @@
+import os
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import DateTime, Float, Integer, String, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import QuizOutput, SearchResult
+
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "20"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+# Leading characters of each article that are indexed; 0 indexes all of it
+SEARCH_CONTENT_CHARS = int(os.getenv("SEARCH_CONTENT_CHARS", "0"))
+# Words a query may hold, each one a lookup in the inverted index
+SEARCH_MAX_TERMS = 16
+
+# A match in the title counts most, one somewhere in the article least.
+# Same ratios as PostgreSQL's default ts_rank weights for A, B, C and D
+COLUMN_WEIGHTS = {"title": 10.0, "summary": 4.0, "questions": 2.0, "content": 1.0}
+TS_CONFIG = "english"
+WORD_RE = re.compile(r"\w+")
+
+SCHEMA = {
+    # Contentless: only the inverted index is kept, the text itself stays in
+    # quizzes/articles. The rowid is the quiz id
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS quiz_search USING fts5("
+        "title, summary, questions, content, content='', tokenize='porter unicode61 remove_diacritics 2')",
+    ],
+    "postgresql": [
+        "CREATE TABLE IF NOT EXISTS quiz_search ("
+        "quiz_id INTEGER PRIMARY KEY REFERENCES quizzes (id) ON DELETE CASCADE, document TSVECTOR NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_quiz_search_document ON quiz_search USING GIN (document)",
+    ],
+}
+
+INSERT = {
+    "sqlite": text(
+        "INSERT INTO quiz_search (rowid, title, summary, questions, content) "
+        "VALUES (:id, :title, :summary, :questions, :content)"
+    ),
+    "postgresql": text(
+        "INSERT INTO quiz_search (quiz_id, document) VALUES (:id, "
+        f"setweight(to_tsvector('{TS_CONFIG}', :title), 'A') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', :summary), 'B') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', :questions), 'C') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', :content), 'D')"
+        ") ON CONFLICT (quiz_id) DO NOTHING"
+    ),
+}
+
+_weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS.values())
+_pg_weights = ", ".join(str(weight / COLUMN_WEIGHTS["title"]) for weight in reversed(COLUMN_WEIGHTS.values()))
+RESULT_COLUMNS = dict(id=Integer, url=String, title=String, date_generated=DateTime, score=Float)
+
+QUERY = {
+    # bm25() is lower for better matches. Ranking inside the FTS table and
+    # joining only the page's rows avoids a quizzes lookup for every match
+    "sqlite": text(
+        "SELECT quizzes.id, quizzes.url, quizzes.title, quizzes.date_generated, page.score "
+        f"FROM (SELECT rowid, -bm25(quiz_search, {_weights}) AS score FROM quiz_search "
+        "WHERE quiz_search MATCH :query ORDER BY score DESC, rowid DESC LIMIT :limit OFFSET :offset) AS page "
+        "JOIN quizzes ON quizzes.id = page.rowid "
+        "ORDER BY page.score DESC, quizzes.id DESC"
+    ).columns(**RESULT_COLUMNS),
+    "postgresql": text(
+        "SELECT quizzes.id, quizzes.url, quizzes.title, quizzes.date_generated, "
+        f"ts_rank_cd('{{{_pg_weights}}}', quiz_search.document, query) AS score "
+        "FROM quiz_search JOIN quizzes ON quizzes.id = quiz_search.quiz_id, "
+        f"plainto_tsquery('{TS_CONFIG}', :query) AS query "
+        "WHERE quiz_search.document @@ query "
+        "ORDER BY score DESC, quizzes.id DESC LIMIT :limit OFFSET :offset"
+    ).columns(**RESULT_COLUMNS),
+}
+
+INDEXED_IDS = {
+    "sqlite": "SELECT rowid FROM quiz_search",
+    "postgresql": "SELECT quiz_id FROM quiz_search",
+}
+
+
+def _dialect(name: str) -> str:
+    if name not in SCHEMA:
+        raise ValueError(f"Search is not supported on {name}")
+    return name
+
+
+def create_search_index(conn):
+    """Create the search index if it is missing; takes a synchronous connection (run_sync)"""
+    for ddl in SCHEMA[_dialect(conn.dialect.name)]:
+        conn.exec_driver_sql(ddl)
+
+
+def search_document(quiz_id: int, title: str, content: str, quiz: QuizOutput) -> dict:
+    """The indexed fields of one quiz, as INSERT parameters"""
+    return {
+        "id": quiz_id,
+        "title": title or quiz.title,
+        "summary": quiz.summary,
+        "questions": "\n".join(question.question for question in quiz.questions),
+        "content": (content or "")[:SEARCH_CONTENT_CHARS or None],
+    }
+
+
+def index_statement(dialect_name: str):
+    """INSERT for search_document() rows; execute it with a list of them"""
+    return INSERT[_dialect(dialect_name)]
+
+
+def indexed_ids_sql(dialect_name: str) -> str:
+    return INDEXED_IDS[_dialect(dialect_name)]
+
+
+def query_words(q: str) -> List[str]:
+    words = WORD_RE.findall(q)
+    if not words:
+        raise ValueError("Search query has no words")
+    return words[:SEARCH_MAX_TERMS]
+
+
+def match_query(dialect_name: str, q: str) -> str:
+    """
+    A user query as a full-text query matching quizzes that hold all of its
+    words. Only the words are kept and FTS5 gets each one quoted, so
+    operators typed by the user are never interpreted
+    """
+    words = query_words(q)
+    if dialect_name == "sqlite":
+        return " ".join(f'"{word}"' for word in words)
+    # plainto_tsquery ANDs the words it is given
+    return " ".join(words)
+
+
+async def search_quizzes(
+    db: AsyncSession,
+    q: str,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    offset: int = 0,
+) -> Tuple[List[SearchResult], Optional[int]]:
+    """
+    One page of quizzes matching q, best first, plus the offset of the next
+    page. Every word must appear in the title, summary, questions or article
+    (after stemming); matches in the title rank highest.
+    """
+    dialect = _dialect(db.bind.dialect.name)
+    params = {"query": match_query(dialect, q), "limit": limit + 1, "offset": offset}
+    # One extra row tells whether another page exists
+    rows = (await db.execute(QUERY[dialect], params)).all()
+    next_offset = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_offset = offset + limit
+    return [SearchResult.model_validate(row) for row in rows], next_offset
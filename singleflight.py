@@ -0,0 +1,47 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into a single execution.
+
+    The first caller starts the work as its own task and later callers await
+    the same task. The task is shielded, so a caller that disconnects does
+    not cancel the work for everyone else.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def start(self, key, fn):
+        """
+        The in-flight task for key, starting fn() if there is none.
+        Returns (task, started) so the caller knows whether it owns the work.
+        """
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return task, False
+        self.stats["executions"] += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda finished: self._forget(key, finished))
+        return task, True
+
+    async def do(self, key, fn):
+        task, _ = self.start(key, fn)
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,180 @@
+import json
+import os
+import zlib
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Article, Quiz
+from models import QuizOutput
+from search import index_statement, search_document
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+# text (legacy Text columns) | zlib | zstd
+QUIZ_STORAGE_FORMAT = os.getenv("QUIZ_STORAGE_FORMAT", "zlib")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+TEXT_FORMATS = (None, "text")
+
+
+def check_format(fmt: str) -> str:
+    if fmt == "text" or fmt == "zlib":
+        return fmt
+    if fmt == "zstd":
+        if zstandard is None:
+            raise ValueError("The zstd storage format requires the zstandard package")
+        return fmt
+    raise ValueError(f"Unknown storage format: {fmt}")
+
+
+# Fail at startup rather than on the first write
+check_format(QUIZ_STORAGE_FORMAT)
+
+
+def compress(data: bytes, fmt: str) -> bytes:
+    if fmt == "zlib":
+        return zlib.compress(data, ZLIB_LEVEL)
+    if fmt == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unknown storage format: {fmt}")
+
+
+def decompress(blob: bytes, fmt: str) -> bytes:
+    if fmt == "zlib":
+        return zlib.decompress(blob)
+    if fmt == "zstd":
+        return zstandard.ZstdDecompressor().decompress(blob)
+    raise ValueError(f"Unknown storage format: {fmt}")
+
+
+def quiz_json_bytes(row) -> bytes:
+    """
+    Stored quiz JSON for a Quiz row (or any row with the same columns),
+    without parsing or validating it
+    """
+    if row.storage_format in TEXT_FORMATS:
+        return row.full_quiz_data.encode("utf-8")
+    return decompress(row.quiz_blob, row.storage_format)
+
+
+def load_quiz(row) -> QuizOutput:
+    return QuizOutput.model_validate_json(quiz_json_bytes(row))
+
+
+def new_quiz_row(url: str, url_key: str, digest: str, title: str, content: str, quiz: QuizOutput, fmt: str = None, simhash: int = None) -> Quiz:
+    fmt = check_format(fmt or QUIZ_STORAGE_FORMAT)
+    if fmt == "text":
+        return Quiz(
+            url=url,
+            canonical_url=url_key,
+            content_hash=digest,
+            simhash=simhash,
+            title=title,
+            scraped_content=content,
+            full_quiz_data=json.dumps(quiz.model_dump()),
+            storage_format="text",
+        )
+    # The article itself lives once in the articles table, keyed by content_hash
+    return Quiz(
+        url=url,
+        canonical_url=url_key,
+        content_hash=digest,
+        simhash=simhash,
+        title=title,
+        quiz_blob=compress(quiz.model_dump_json().encode("utf-8"), fmt),
+        storage_format=fmt,
+    )
+
+
+def insert_ignore(db: AsyncSession, model):
+    """INSERT that silently skips rows whose primary key already exists"""
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    return sqlite.insert(model).on_conflict_do_nothing()
+
+
+def article_values(digest: str, content: str, fmt: str = None) -> Optional[dict]:
+    fmt = check_format(fmt or QUIZ_STORAGE_FORMAT)
+    if fmt == "text":
+        return None
+    return {
+        "content_hash": digest,
+        "storage_format": fmt,
+        "content": compress(content.encode("utf-8"), fmt),
+    }
+
+
+class QuizRecord(NamedTuple):
+    url: str
+    url_key: str
+    digest: str
+    title: str
+    content: str
+    quiz: QuizOutput
+    simhash: Optional[int] = None
+
+
+async def save_quiz(db: AsyncSession, url: str, url_key: str, digest: str, title: str, content: str, quiz: QuizOutput, fmt: str = None, simhash: int = None) -> Quiz:
+    """
+    Stage a quiz (and, for compressed formats, its deduplicated article)
+    in the session; the caller commits
+    """
+    article = article_values(digest, content, fmt)
+    if article is not None:
+        await db.execute(insert_ignore(db, Article), [article])
+    db_quiz = new_quiz_row(url, url_key, digest, title, content, quiz, fmt, simhash)
+    db.add(db_quiz)
+    # The search index row is keyed by the quiz id
+    await db.flush()
+    await db.execute(index_statement(db.bind.dialect.name), [search_document(db_quiz.id, title, content, quiz)])
+    return db_quiz
+
+
+async def save_quizzes(db: AsyncSession, records: List[QuizRecord], fmt: str = None) -> int:
+    """
+    Stage many quizzes with one multi-row INSERT for their articles, one for
+    the quizzes (Core executemany, returning the new ids in order) and one
+    for their search index rows; the caller commits
+    """
+    articles = {}
+    for record in records:
+        if record.digest not in articles:
+            articles[record.digest] = article_values(record.digest, record.content, fmt)
+    articles = [article for article in articles.values() if article is not None]
+    if articles:
+        await db.execute(insert_ignore(db, Article), articles)
+
+    columns = [c.key for c in Quiz.__table__.columns if c.key not in ("id", "date_generated")]
+    rows = [
+        new_quiz_row(r.url, r.url_key, r.digest, r.title, r.content, r.quiz, fmt, r.simhash)
+        for r in records
+    ]
+    if rows:
+        ids = (await db.execute(
+            insert(Quiz).returning(Quiz.id, sort_by_parameter_order=True),
+            [{key: getattr(row, key) for key in columns} for row in rows],
+        )).scalars().all()
+        await db.execute(index_statement(db.bind.dialect.name), [
+            search_document(quiz_id, r.title, r.content, r.quiz) for quiz_id, r in zip(ids, records)
+        ])
+    return len(rows)
+
+
+async def load_article(db: AsyncSession, digest: str) -> Optional[str]:
+    row = (await db.execute(
+        select(Article.content, Article.storage_format).where(Article.content_hash == digest)
+    )).first()
+    if row is not None:
+        return decompress(row.content, row.storage_format).decode("utf-8")
+    # Rows written in the text format keep the article inline
+    legacy = (await db.execute(
+        select(Quiz.scraped_content).where(Quiz.content_hash == digest, Quiz.scraped_content.isnot(None)).limit(1)
+    )).first()
+    return legacy.scraped_content if legacy else None
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import tempfile
+
+# The app reads its configuration at import time, so this runs before any
+# test module imports it: a throwaway SQLite file, the fake LLM backend and
+# no on-disk fetch cache
+_directory = tempfile.mkdtemp(prefix="quiztest-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'test.db')}"
+os.environ["DUMP_STORE_PATH"] = os.path.join(_directory, "wiki_dump")
+os.environ["QUIZ_LLM_BACKEND"] = "fake"
+os.environ["FAKE_LLM_LATENCY"] = "0"
+os.environ["FETCH_CACHE_DIR"] = ""
+os.environ["MODEL_CACHE_PATH"] = ""
+os.environ["LOG_LEVEL"] = "WARNING"
+# Tests that cover rate limits and the LLM governor build their own
+for name in ("RATE_LIMIT_GENERATE", "RATE_LIMIT_BATCH", "RATE_LIMIT_JOBS"):
+    os.environ[name] = "off"
+for name in ("LLM_MAX_CONCURRENCY", "LLM_TOKENS_PER_MINUTE"):
+    os.environ[name] = "0"
+
+import httpx
+import pytest
+
+from fake_llm import FakeQuizGenerator
+from tests.fakes import StubWikipediaServer
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    # One loop for the whole session: the app's engine, HTTP client and
+    # locks are module singletons bound to the loop that first uses them
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def run(event_loop):
+    """Run a coroutine to completion on the session loop"""
+    return event_loop.run_until_complete
+
+
+@pytest.fixture(scope="session")
+def database(event_loop):
+    from database import init_db
+    event_loop.run_until_complete(init_db())
+
+
+@pytest.fixture(scope="session")
+def wikipedia():
+    from fetcher import wikipedia_fetcher
+    with StubWikipediaServer() as server:
+        wikipedia_fetcher.origin = server.base_url
+        yield server
+        wikipedia_fetcher.origin = ""
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    import quiz_service
+    fake = FakeQuizGenerator(latency=0)
+    monkeypatch.setattr(quiz_service, "quiz_generator", fake)
+    return fake
+
+
+@pytest.fixture
+def client(run, database, wikipedia, generator):
+    """An HTTP client for the app, with a fresh quiz cache and generator"""
+    import main
+    from quiz_cache import quiz_cache
+    quiz_cache.clear()
+    api = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+    yield api
+    run(api.aclose())
+
+
+@pytest.fixture
+def unique(request):
+    """A name no other test uses, for article titles and URLs"""
+    return request.node.name.replace("[", "_").replace("]", "").replace("-", "_")
@@ -0,0 +1,620 @@
+import asyncio
+import bz2
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from xml.sax.saxutils import escape, quoteattr
+
+from fake_llm import make_fake_quiz
+
+
+class _StubChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubResponse:
+    """Mirrors the SDK response: .text, and async iteration over chunks when streamed"""
+
+    def __init__(self, text: str, chunk_size: int = 0, chunk_delay: float = 0.0):
+        self.text = text
+        self._chunk_size = chunk_size or len(text) or 1
+        self._chunk_delay = chunk_delay
+
+    async def __aiter__(self):
+        for i in range(0, len(self.text), self._chunk_size):
+            await asyncio.sleep(self._chunk_delay)
+            yield _StubChunk(self.text[i:i + self._chunk_size])
+
+
+class StubGeminiModel:
+    """
+    Offline stand-in for genai.GenerativeModel, for driving LLMQuizGenerator
+    itself: LLMQuizGenerator(model=StubGeminiModel()).
+
+    It answers the probe, the full-article prompt and the section prompt
+    with schema-valid JSON built from the article text in the prompt, so
+    every question quotes a sentence and names the section it came from.
+    Latency follows a simple serving model -- a fixed overhead, prompt
+    tokens at prefill_tps and output tokens at output_tps -- scaled by
+    time_scale, times a log-normal jitter; stall_rate makes a share of calls
+    take stall_factor times longer, for tail latency. failure_rate makes
+    calls raise 429/503 errors at random, and defect_rate corrupts full-quiz
+    responses with a random MALFORMED_DEFECTS entry. tokens_per_minute
+    emulates the provider's quota: a call that would take the last (scaled)
+    minute past it is rejected with a 429. All of these are plain
+    attributes, so a model can be degraded and restored mid-run.
+    """
+
+    def __init__(
+        self,
+        overhead: float = 0.3,
+        prefill_tps: float = 5000,
+        output_tps: float = 150,
+        time_scale: float = 1.0,
+        failure_rate: float = 0.0,
+        defect_rate: float = 0.0,
+        jitter: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_factor: float = 5.0,
+        chunk_size: int = 64,
+        seed: int = 0,
+        tokens_per_minute: int = 0,
+    ):
+        self.overhead = overhead
+        self.prefill_tps = prefill_tps
+        self.output_tps = output_tps
+        self.time_scale = time_scale
+        self.failure_rate = failure_rate
+        self.defect_rate = defect_rate
+        self.jitter = jitter
+        self.stall_rate = stall_rate
+        self.stall_factor = stall_factor
+        self.defects = defaultdict(int)
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+        self.tokens_per_minute = tokens_per_minute
+        self._quota_window = deque()  # (time, tokens) of admitted calls
+        self.quota_rejections = 0
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        self.calls += 1
+        text = self._respond(prompt)
+        prompt_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        if self.tokens_per_minute and not self._admit(prompt_tokens + output_tokens):
+            self.quota_rejections += 1
+            await asyncio.sleep(self.time_scale * self.overhead)
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        self.prompt_tokens += prompt_tokens
+        self.output_tokens += output_tokens
+
+        scale = self.time_scale * self.rng.lognormvariate(0, self.jitter)
+        if self.rng.random() < self.stall_rate:
+            scale *= self.stall_factor
+        first_token = scale * (self.overhead + prompt_tokens / self.prefill_tps)
+        generation = scale * output_tokens / self.output_tps
+        if self.rng.random() < self.failure_rate:
+            await asyncio.sleep(first_token)
+            raise RuntimeError(self.rng.choice([
+                "503 The model is overloaded. Please try again later.",
+                "429 Resource has been exhausted (e.g. check quota).",
+            ]))
+        if stream:
+            await asyncio.sleep(first_token)
+            chunks = max(1, -(-len(text) // self.chunk_size))
+            return _StubResponse(text, self.chunk_size, generation / chunks)
+        await asyncio.sleep(first_token + generation)
+        return _StubResponse(text)
+
+    def _admit(self, tokens: int) -> bool:
+        now = time.monotonic()
+        window = 60 * self.time_scale
+        while self._quota_window and self._quota_window[0][0] <= now - window:
+            self._quota_window.popleft()
+        if sum(used for _, used in self._quota_window) + tokens > self.tokens_per_minute:
+            return False
+        self._quota_window.append((now, tokens))
+        return True
+
+    def _respond(self, prompt: str) -> str:
+        if "MISSING FIELDS:" in prompt:
+            title = self._field(prompt, "ARTICLE TITLE:")
+            content = prompt.split("ARTICLE CONTENT:", 1)[1].split("MISSING FIELDS:", 1)[0]
+            missing = self._field(prompt, "MISSING FIELDS:").split(", ")
+            data = {
+                "summary": f"{title} is summarised here from its article text.",
+                "questions": self._questions(content, int(self._field(prompt, "QUESTIONS NEEDED:"))),
+                "key_entities": self._entities(content, 3),
+                "related_topics": [f"{title} {w}" for w in self._sample_words(content, 3)],
+            }
+            return json.dumps({field: data[field] for field in missing if field in data})
+        if "SECTION CONTENT:" in prompt:
+            title = self._field(prompt, "ARTICLE TITLE:")
+            content = prompt.split("SECTION CONTENT:", 1)[1].split("Generate this exact JSON", 1)[0]
+            count = int(prompt.split("- Create ", 1)[1].split()[0])
+            data = {
+                "summary": f"This section of {title} covers {self._field(prompt, 'SECTION:')}.",
+                "questions": self._questions(content, count),
+                "key_entities": self._entities(content, 2),
+                "related_topics": [f"{title} {w}" for w in self._sample_words(content, 2)],
+            }
+        elif "ARTICLE CONTENT:" in prompt:
+            title = self._field(prompt, "ARTICLE TITLE:")
+            content = prompt.split("ARTICLE CONTENT:", 1)[1].split("Generate a quiz", 1)[0]
+            data = {
+                "title": title,
+                "summary": f"{title} is summarised here from its article text.",
+                "questions": self._questions(content, 6),
+                "key_entities": self._entities(content, 4),
+                "related_topics": [f"{title} {w}" for w in self._sample_words(content, 4)],
+            }
+            if self.rng.random() < self.defect_rate:
+                defect = self.rng.choice(sorted(MALFORMED_DEFECTS))
+                self.defects[defect] += 1
+                return MALFORMED_DEFECTS[defect](data, self.rng)
+        else:
+            return "Hello"
+        return "```json\n" + json.dumps(data, indent=2) + "\n```"
+
+    @staticmethod
+    def _field(prompt: str, label: str) -> str:
+        return prompt.split(label, 1)[1].strip().splitlines()[0].strip()
+
+    @staticmethod
+    def _sentences(content: str):
+        """(heading, sentence) pairs, tracking the '## heading' lines in the text"""
+        heading = "Introduction"
+        pairs = []
+        for line in content.strip().splitlines():
+            line = line.strip()
+            if line.startswith("## "):
+                heading = line[3:]
+            elif line:
+                pairs.extend((heading, s.strip()) for s in line.split(". ") if len(s.split()) >= 4)
+        return pairs
+
+    def _sample_words(self, content: str, count: int):
+        words = sorted({w.strip(".,;:").lower() for w in content.split() if len(w) > 5})
+        return self.rng.sample(words, min(count, len(words)))
+
+    def _questions(self, content: str, count: int):
+        pairs = self._sentences(content)
+        if not pairs or count < 1:
+            return []
+        # Evenly spaced through the text, as a model reading it in order would
+        step = len(pairs) / min(count, len(pairs))
+        questions = []
+        for i in range(min(count, len(pairs))):
+            heading, sentence = pairs[int(i * step)]
+            words = sentence.rstrip(".").split()
+            blank = self.rng.randrange(len(words))
+            answer = words[blank].strip(",;:")
+            words[blank] = "____"
+            distractors = [w for w in self._sample_words(content, 6) if w != answer.lower()][:3]
+            options = distractors + [answer]
+            self.rng.shuffle(options)
+            questions.append({
+                "question": f"[{heading}] Which word completes: \"{' '.join(words)}\"?",
+                "options": options,
+                "correct_answer": answer,
+                "explanation": f"The article's {heading} section says: {sentence}",
+            })
+        return questions
+
+    def _entities(self, content: str, count: int):
+        return [
+            {"name": word.capitalize(), "description": f"{word} as discussed in the article", "relevance": "Mentioned in the text"}
+            for word in self._sample_words(content, count)
+        ]
+
+
+
+def _quiz_json(quiz: dict) -> str:
+    return json.dumps(quiz, indent=2)
+
+
+def _truncated(quiz: dict, rng: random.Random) -> str:
+    text = _quiz_json(quiz)
+    # Cut off somewhere in the questions, as when the output token limit is hit
+    start = text.index('"questions"')
+    return text[:rng.randrange(start + (len(text) - start) // 3, len(text) - 2)]
+
+
+def _raw_newlines(quiz: dict, rng: random.Random) -> str:
+    # Multi-line explanations with the newlines left unescaped
+    quiz = json.loads(json.dumps(quiz))
+    for question in quiz["questions"]:
+        question["explanation"] += "\nSee the article for details."
+    return _quiz_json(quiz).replace("\\n", "\n")
+
+
+def _invalid_questions(quiz: dict, rng: random.Random) -> str:
+    quiz = json.loads(json.dumps(quiz))
+    quiz["questions"][0]["correct_answer"] = "None of the options"
+    del quiz["questions"][-1]["options"]
+    return _quiz_json(quiz)
+
+
+# Malformed LLM responses seen in practice, as transformations of a valid
+# quiz dict (fields in prompt order) into response text
+MALFORMED_DEFECTS = {
+    "prose": lambda quiz, rng: (
+        "Sure! Here is the quiz you asked for:\n\n```json\n" + _quiz_json(quiz)
+        + "\n```\n\nLet me know if you would like more questions."
+    ),
+    "trailing_commas": lambda quiz, rng: re.sub(r'(["\d\]}el])(\s*\n\s*)([\]}])', r"\1,\2\3", _quiz_json(quiz)),
+    "missing_commas": lambda quiz, rng: _quiz_json(quiz).replace("},\n    {", "}\n    {"),
+    "raw_newlines": _raw_newlines,
+    "truncated": _truncated,
+    "missing_fields": lambda quiz, rng: _quiz_json({k: v for k, v in quiz.items() if k not in ("key_entities", "related_topics")}),
+    "invalid_questions": _invalid_questions,
+}
+
+
+def malformed_corpus(num_quizzes: int = 20, seed: int = 0):
+    """(defect, quiz dict, response text) for every defect applied to num_quizzes quizzes"""
+    rng = random.Random(seed)
+    for i in range(num_quizzes):
+        quiz = make_fake_quiz(f"Corpus article {i}", rng.randint(5, 7)).model_dump()
+        quiz = {key: quiz[key] for key in ("title", "summary", "questions", "key_entities", "related_topics")}
+        for defect in sorted(MALFORMED_DEFECTS):
+            yield defect, quiz, MALFORMED_DEFECTS[defect](quiz, rng)
+
+
+_WORDS = (
+    "history species population culture science theory river empire language "
+    "music energy system city century research province structure evolution "
+    "economy network religion climate medicine literature government island "
+    "mountain chemistry festival tradition architecture industry railway"
+).split()
+
+
+def make_article_html(title: str, sections: int = 8, paragraphs_per_section: int = 4, seed: int = None) -> str:
+    """
+    Render a page that mirrors the markup of a Wikipedia article: site chrome,
+    hatnote, infobox, reference superscripts, TemplateStyles, edit links,
+    figures, navboxes and a reference list around the article paragraphs.
+    """
+    rng = random.Random(title if seed is None else seed)
+
+    def sentence():
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 18))]
+        words[0] = words[0].capitalize()
+        linked = rng.randrange(len(words))
+        words[linked] = f'<a href="/wiki/{words[linked].capitalize()}" title="{words[linked]}">{words[linked]}</a>'
+        if rng.random() < 0.3:
+            words.append("&amp; caf&#233; &#160;na&#239;ve")
+        return " ".join(words) + "."
+
+    def paragraph():
+        parts = []
+        for _ in range(rng.randint(3, 6)):
+            parts.append(sentence())
+            if rng.random() < 0.4:
+                parts.append(f'<sup id="cite_ref-{rng.randint(1, 99)}" class="reference"><a href="#cite_note-1">[{rng.randint(1, 99)}]</a></sup>')
+            if rng.random() < 0.05:
+                parts.append('<sup class="noprint Inline-Template Template-Fact" style="white-space:nowrap;">[<i><a href="/wiki/Wikipedia:Citation_needed" title="Wikipedia:Citation needed"><span title="This claim needs references">citation needed</span></a></i>]</sup>')
+        return "<p>" + " ".join(parts) + "\n</p>"
+
+    body = []
+    for s in range(sections):
+        heading = f"{rng.choice(_WORDS).capitalize()} {s + 1}"
+        if s:
+            body.append(
+                f'<div class="mw-heading mw-heading2"><h2 id="{heading.replace(" ", "_")}">{heading}</h2>'
+                f'<span class="mw-editsection"><span class="mw-editsection-bracket">[</span><a href="/w/index.php?action=edit&amp;section={s}">edit</a><span class="mw-editsection-bracket">]</span></span></div>'
+            )
+            body.append(f'<div role="note" class="hatnote navigation-not-searchable">Main article: <a href="/wiki/{heading}">{heading}</a></div>')
+        if s % 3 == 1:
+            body.append(
+                '<figure class="mw-default-size" typeof="mw:File/Thumb"><a href="/wiki/File:X.jpg" class="mw-file-description">'
+                '<img src="//upload.wikimedia.org/x.jpg" width="220" height="147" class="mw-file-element"></a>'
+                f'<figcaption>A picture of {heading}</figcaption></figure>'
+            )
+        for p in range(paragraphs_per_section):
+            if s % 3 == 2 and p == paragraphs_per_section // 2 and p:
+                subheading = f"{rng.choice(_WORDS).capitalize()} {s + 1}.1"
+                body.append(
+                    f'<div class="mw-heading mw-heading3"><h3 id="{subheading.replace(" ", "_")}">{subheading}</h3>'
+                    f'<span class="mw-editsection"><span class="mw-editsection-bracket">[</span><a href="/w/index.php?action=edit&amp;section={s}">edit</a><span class="mw-editsection-bracket">]</span></span></div>'
+                )
+            body.append(paragraph())
+        if s % 4 == 2:
+            body.append("<ul>" + "".join(f"<li>{sentence()}</li>" for _ in range(4)) + "</ul>")
+
+    infobox_rows = "".join(
+        f'<tr><th scope="row" class="infobox-label">{rng.choice(_WORDS)}</th><td class="infobox-data">{sentence()}</td></tr>'
+        for _ in range(8)
+    )
+    references = "".join(
+        f'<li id="cite_note-{i}"><span class="reference-text"><cite class="citation web cs1">{sentence()}</cite></span></li>'
+        for i in range(1, 30)
+    )
+    return f"""<!DOCTYPE html>
+<html class="client-nojs" lang="en" dir="ltr">
+<head>
+<meta charset="UTF-8">
+<title>{title} - Wikipedia</title>
+<script>document.documentElement.className="client-js";</script>
+<link rel="stylesheet" href="/w/load.php?modules=site.styles">
+<link rel="canonical" href="https://en.wikipedia.org/wiki/{title.replace(' ', '_')}">
+</head>
+<body class="skin-vector mediawiki ltr">
+<header class="vector-header mw-header"><nav class="vector-main-menu"><ul><li><a href="/wiki/Main_Page">Main page</a></li></ul></nav></header>
+<div class="mw-page-container">
+<main id="content" class="mw-body">
+<header class="mw-body-header vector-page-titlebar">
+<h1 id="firstHeading" class="firstHeading mw-first-heading"><span class="mw-page-title-main">{title}</span></h1>
+</header>
+<div id="bodyContent" class="vector-body">
+<div id="siteSub" class="noprint">From Wikipedia, the free encyclopedia</div>
+<div id="mw-content-text" class="mw-body-content"><div class="mw-content-ltr mw-parser-output" lang="en" dir="ltr">
+<div class="shortdescription nomobile noexcerpt noprint searchaux" style="display:none">Article about {title}</div>
+<div role="note" class="hatnote navigation-not-searchable">For other uses, see <a href="/wiki/{title}_(disambiguation)" class="mw-disambig">{title} (disambiguation)</a>.</div>
+<style data-mw-deduplicate="TemplateStyles:r1">.mw-parser-output .infobox{{border:1px solid #a2a9b1}}</style>
+<table class="infobox vcard"><tbody><tr><th colspan="2" class="infobox-above">{title}</th></tr>{infobox_rows}</tbody></table>
+<p class="mw-empty-elt">
+</p>
+{chr(10).join(body)}
+<div class="mw-heading mw-heading2"><h2 id="References">References</h2></div>
+<link rel="mw-deduplicated-inline-style" href="mw-data:TemplateStyles:r1">
+<div class="reflist"><div class="mw-references-wrap mw-references-columns"><ol class="references">{references}</ol></div></div>
+<div class="navbox-styles"><style data-mw-deduplicate="TemplateStyles:r2">.navbox{{box-sizing:border-box}}</style></div>
+<div role="navigation" class="navbox" aria-labelledby="Nav"><table class="nowraplinks navbox-inner"><tbody><tr><th class="navbox-title">{title} topics</th></tr><tr><td class="navbox-list"><p>{sentence()}</p></td></tr></tbody></table></div>
+<!-- NewPP limit report Parsed by mw-api-int CPU time usage: 0.512 seconds -->
+</div></div>
+<div id="catlinks" class="catlinks"><div id="mw-normal-catlinks" class="mw-normal-catlinks"><a href="/wiki/Help:Category">Categories</a>: <ul><li><a href="/wiki/Category:{title}">{title}</a></li></ul></div></div>
+</div>
+</main>
+</div>
+<footer id="footer" class="mw-footer"><ul id="footer-info"><li>This page was last edited on 1 January 2024.</li></ul></footer>
+<script>(RLQ=window.RLQ||[]).push(function(){{mw.config.set({{"wgBackendResponseTime":120}});}});</script>
+</body>
+</html>
+"""
+
+
+def make_wikitext_article(title: str, sections: int = 8, paragraphs_per_section: int = 4, seed: int = None, link_titles=()) -> str:
+    """
+    MediaWiki markup for an article shaped like make_article_html's: hatnote
+    and infobox templates, references (inline and named), files with linked
+    captions, tables, lists, comments, categories and interlanguage links
+    around the article paragraphs. Some links point at link_titles.
+    """
+    rng = random.Random(title if seed is None else seed)
+
+    def link(word):
+        if link_titles and rng.random() < 0.5:
+            return f"[[{rng.choice(link_titles)}|{word}]]"
+        return rng.choice([f"[[{word.capitalize()}]]", f"[[{word.capitalize()}|{word}]]", f"[[{word}]]s"])
+
+    def sentence():
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 18))]
+        words[0] = words[0].capitalize()
+        linked = rng.randrange(1, len(words))
+        words[linked] = link(words[linked])
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(1, len(words)), "''emphasis''")
+        if rng.random() < 0.3:
+            words.append("&amp; caf&#233; &nbsp;na&#239;ve")
+        return " ".join(words) + "."
+
+    def paragraph():
+        parts = []
+        for _ in range(rng.randint(3, 6)):
+            parts.append(sentence())
+            if rng.random() < 0.4:
+                parts.append(f'<ref name="r{rng.randint(1, 99)}">{{{{cite web |url=https://example.org/{rng.randint(1, 999)} |title={sentence()}}}}}</ref>')
+            elif rng.random() < 0.2:
+                parts.append(f'<ref name="r{rng.randint(1, 99)}" />')
+            if rng.random() < 0.05:
+                parts.append("{{citation needed|date=January 2024}}")
+        return " ".join(parts)
+
+    infobox = "".join(f"| {rng.choice(_WORDS)} = {sentence()}\n" for _ in range(8))
+    body = [
+        f"{{{{Short description|Article about {title}}}}}",
+        f"{{{{About|the subject|other uses|{title} (disambiguation)}}}}",
+        f"{{{{Infobox thing\n| name = {title}\n{infobox}| image = {{{{Image frame|content=x}}}}\n}}}}",
+        f"'''{title}''' {paragraph()}",
+    ]
+    for s in range(sections):
+        heading = f"{rng.choice(_WORDS).capitalize()} {s + 1}"
+        if s:
+            body.append(f"== {heading} ==")
+            body.append(f"{{{{Main|{heading}}}}}")
+        if s % 3 == 1:
+            body.append(f"[[File:X.jpg|thumb|A picture of [[{heading}]] and [[{rng.choice(_WORDS)}]]]]")
+        for p in range(paragraphs_per_section):
+            if s % 3 == 2 and p == paragraphs_per_section // 2 and p:
+                body.append(f"=== {rng.choice(_WORDS).capitalize()} {s + 1}.1 ===")
+            body.append(paragraph())
+            if rng.random() < 0.1:
+                body.append("<!-- editors: keep this section short -->")
+        if s % 4 == 2:
+            body.append("\n".join(f"* {sentence()}" for _ in range(4)))
+        if s % 5 == 3:
+            body.append('{| class="wikitable"\n|-\n! Year !! Value\n|-\n| 2001 || {{convert|12|km}}\n|}')
+    body += [
+        "== References ==",
+        "{{Reflist}}",
+        "== External links ==",
+        f"* [https://example.org/{title.replace(' ', '_')} Official site]",
+        f"{{{{{title} topics}}}}",
+        f"[[Category:{title}]]",
+        f"[[de:{title}]]",
+    ]
+    return "\n\n".join(body) + "\n"
+
+
+def write_xml_dump(path: str, num_articles: int, sections: int = 6, paragraphs_per_section: int = 4, seed: int = 0) -> dict:
+    """
+    Write a MediaWiki XML export (pages-articles format, bz2-compressed
+    when path ends in .bz2) of num_articles articles titled "Article <n>"
+    that link to each other. Every tenth has a redirect "Art <n>" and every
+    twentieth a talk page. Pages are rendered one at a time, so any size
+    can be written. Returns page counts.
+    """
+    rng = random.Random(seed)
+    opener = bz2.open if path.endswith(".bz2") else open
+    counts = {"articles": 0, "redirects": 0, "other_namespaces": 0}
+    page_id = 0
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write('<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/" version="0.11" xml:lang="en">\n'
+                "  <siteinfo><sitename>Wikipedia</sitename><dbname>enwiki</dbname></siteinfo>\n")
+
+        def page(title, ns, text, redirect=None):
+            nonlocal page_id
+            page_id += 1
+            redirect_tag = f"    <redirect title={quoteattr(redirect)} />\n" if redirect else ""
+            f.write(f"  <page>\n    <title>{escape(title)}</title>\n    <ns>{ns}</ns>\n    <id>{page_id}</id>\n"
+                    f"{redirect_tag}    <revision>\n      <id>{page_id * 10}</id>\n"
+                    f'      <text bytes="{len(text)}" xml:space="preserve">{escape(text)}</text>\n'
+                    "    </revision>\n  </page>\n")
+
+        for i in range(num_articles):
+            title = f"Article {i}"
+            links = [f"Article {rng.randrange(num_articles)}" for _ in range(10)]
+            page(title, 0, make_wikitext_article(title, sections, paragraphs_per_section, seed=seed + i, link_titles=links))
+            counts["articles"] += 1
+            if i % 10 == 0:
+                page(f"Art {i}", 0, f"#REDIRECT [[{title}]]", redirect=title)
+                counts["redirects"] += 1
+            if i % 20 == 0:
+                page(f"Talk:{title}", 1, "== Sources ==\nShould we cite more? ~~~~")
+                counts["other_namespaces"] += 1
+        f.write("</mediawiki>\n")
+    return counts
+
+
+class StubWikipediaServer:
+    """
+    Local HTTP/1.1 server that stands in for wikipedia.org.
+
+    Serves pages from a dict keyed by path, or renders make_article_html
+    for any /wiki/<Title> path when generate=True. Responses carry an ETag
+    and Last-Modified and honour conditional requests and gzip. fail_next()
+    scripts error responses, and request/connection counters expose
+    keep-alive reuse.
+
+        with StubWikipediaServer() as server:
+            os.environ["WIKIPEDIA_ORIGIN"] = server.base_url
+    """
+
+    LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    def __init__(self, pages: dict = None, generate: bool = True, latency: float = 0.0, port: int = 0):
+        self.pages = dict(pages or {})
+        self.generate = generate
+        self.latency = latency
+        self.requests = defaultdict(int)
+        self.statuses = defaultdict(int)
+        self.connections = 0
+        self._failures = defaultdict(list)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, path: str, status: int, count: int = 1, retry_after: str = None):
+        with self._lock:
+            self._failures[path].extend([(status, retry_after)] * count)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _page(self, path: str):
+        if path in self.pages:
+            body = self.pages[path]
+        elif self.generate and path.startswith("/wiki/"):
+            body = make_article_html(unquote(path[len("/wiki/"):]).replace("_", " "))
+        else:
+            return None
+        return body.encode("utf-8") if isinstance(body, str) else body
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b"", headers: dict = None):
+                with stub._lock:
+                    stub.statuses[status] += 1
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                with stub._lock:
+                    stub.requests[path] += 1
+                    failure = stub._failures[path].pop(0) if stub._failures[path] else None
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if failure:
+                    status, retry_after = failure
+                    self._send(status, b"stub failure", {"Retry-After": retry_after} if retry_after else None)
+                    return
+
+                body = stub._page(path)
+                if body is None:
+                    self._send(404, b"Not Found")
+                    return
+
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                validators = {"ETag": etag, "Last-Modified": stub.LAST_MODIFIED}
+                if self.headers.get("If-None-Match") == etag or (
+                    "If-None-Match" not in self.headers
+                    and self.headers.get("If-Modified-Since") == stub.LAST_MODIFIED
+                ):
+                    self._send(304, headers=validators)
+                    return
+
+                headers = dict(validators, **{"Content-Type": "text/html; charset=UTF-8"})
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=5)
+                    headers["Content-Encoding"] = "gzip"
+                self._send(200, body, headers)
+
+        return Handler
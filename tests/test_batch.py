@@ -0,0 +1,87 @@
+import asyncio
+import json
+import time
+
+from batch import HostLimiter, RateLimitedPool
+
+
+def batch(run, client, urls: list) -> list:
+    response = run(client.post("/generate_quiz/batch", json=[{"url": url} for url in urls]))
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_streams_a_result_per_url_then_a_summary(run, client, generator, wikipedia, unique):
+    urls = [
+        f"https://en.wikipedia.org/wiki/{unique}_1",
+        f"https://en.wikipedia.org/wiki/{unique}_2",
+        f"https://en.m.wikipedia.org/wiki/{unique}_1",  # the first article again
+        "https://example.com/wiki/Cat",
+    ]
+    events = batch(run, client, urls)
+    by_index = {event["data"]["index"]: event for event in events[:-1]}
+
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert by_index[3]["event"] == "error" and by_index[3]["data"]["status"] == 400
+    assert by_index[0]["data"]["quiz"] == by_index[2]["data"]["quiz"]
+    assert events[-1] == {"event": "done", "data": {"total": 4, "succeeded": 3, "failed": 1, "generated": 2, "saved": 2}}
+    # Repeated articles are fetched and generated once
+    assert generator.calls == 2
+    assert wikipedia.requests[f"/wiki/{unique}_1"] == 1
+
+    # The batch's quizzes were saved
+    response = run(client.post("/generate_quiz", json={"url": urls[1]}))
+    assert response.json() == by_index[1]["data"]["quiz"]
+    assert generator.calls == 2
+
+
+def test_saved_quizzes_are_returned_as_cached(run, client, generator, unique):
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+    quiz = run(client.post("/generate_quiz", json={"url": url})).json()
+    events = batch(run, client, [url])
+    assert events[0]["data"]["cached"] and events[0]["data"]["quiz"] == quiz
+    assert events[-1]["data"]["generated"] == events[-1]["data"]["saved"] == 0
+    assert generator.calls == 1
+
+
+def test_empty_batch_is_rejected(run, client):
+    assert run(client.post("/generate_quiz/batch", json=[])).status_code == 400
+
+
+def test_pool_caps_concurrency(run):
+    pool = RateLimitedPool(concurrency=2)
+    running, peak = 0, 0
+
+    async def work():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def scenario():
+        await asyncio.gather(*(pool.run(work) for _ in range(6)))
+
+    run(scenario())
+    assert peak == 2
+
+
+def test_pool_spaces_out_starts(run):
+    pool = RateLimitedPool(concurrency=10, per_minute=1200)  # one start every 50ms
+    starts = []
+
+    async def work():
+        starts.append(time.monotonic())
+
+    async def scenario():
+        await asyncio.gather(*(pool.run(work) for _ in range(4)))
+
+    run(scenario())
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert min(gaps) >= 0.04
+
+
+def test_host_limiter_is_per_host():
+    hosts = HostLimiter(per_host=3)
+    assert hosts("https://en.wikipedia.org/wiki/A") is hosts("https://EN.wikipedia.org/wiki/B")
+    assert hosts("https://en.wikipedia.org/wiki/A") is not hosts("https://de.wikipedia.org/wiki/A")
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution(run):
+    flight = SingleFlight("test")
+    executions = 0
+
+    async def work():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    assert run(scenario()) == ["result"] * 5
+    assert executions == 1
+    assert flight.stats == {"calls": 5, "executions": 1, "coalesced": 4}
+    assert flight.inflight == 0
+    # A later call starts a new execution
+    run(flight.do("key", work))
+    assert executions == 2
+
+
+def test_errors_reach_every_caller(run):
+    flight = SingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+
+    assert [type(result) for result in run(scenario())] == [ValueError] * 3
+
+
+def test_a_cancelled_caller_does_not_cancel_the_work(run):
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert run(scenario()) == "done"
+
+
+def test_identical_requests_make_one_generation(run, client, generator, wikipedia, unique):
+    generator.latency = 0.1
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+
+    async def scenario():
+        return await asyncio.gather(*(client.post("/generate_quiz", json={"url": url}) for _ in range(4)))
+
+    responses = run(scenario())
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.text for response in responses}) == 1
+    assert generator.calls == 1
+    assert wikipedia.requests[f"/wiki/{unique}"] == 1
+
+
+@pytest.mark.parametrize("spelling", ["https://en.m.wikipedia.org/wiki/{}", "https://en.wikipedia.org/wiki/{}#Lead"])
+def test_url_spellings_of_one_article_coalesce(run, client, generator, unique, spelling):
+    generator.latency = 0.1
+    urls = [f"https://en.wikipedia.org/wiki/{unique}", spelling.format(unique)]
+
+    async def scenario():
+        return await asyncio.gather(*(client.post("/generate_quiz", json={"url": url}) for url in urls))
+
+    assert {response.status_code for response in run(scenario())} == {200}
+    assert generator.calls == 1
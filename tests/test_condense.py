@@ -0,0 +1,71 @@
+import importlib
+
+from condense import MAX_PASSAGE_TOKENS, PROMPT_TOKEN_BUDGET, condense, estimate_tokens, score_passages, split_passages
+from fake_llm import make_fake_quiz
+from scraper import parse_wikipedia_html
+from tests.fakes import make_article_html
+
+FILLER = "It was there and then it was also here, as it had been before and would be again."
+INFORMATIVE = "Marie Curie discovered polonium and radium in Paris in 1898 with Pierre Curie."
+
+
+def sections_of(title: str, sections: int = 8) -> list:
+    return parse_wikipedia_html(make_article_html(title, sections=sections))["sections"]
+
+
+def test_short_article_is_kept_whole():
+    sections = [{"heading": "", "paragraphs": ["The lead."]}, {"heading": "History", "paragraphs": ["Some history."]}]
+    condensed = condense(sections, budget=1000)
+    assert condensed.text == "The lead.\n\n## History\nSome history."
+    assert condensed.passages_used == condensed.passages_total == 2
+
+
+def test_long_article_fits_the_budget_and_covers_every_section():
+    sections = sections_of("Condensed", sections=8)
+    condensed = condense(sections, budget=1000)
+    assert condensed.tokens <= 1000
+    assert condensed.passages_used < condensed.passages_total
+    assert condensed.sections_used == condensed.sections_total == len(sections)
+    # The lead comes first and sections keep their order
+    headings = [line[3:] for line in condensed.text.splitlines() if line.startswith("## ")]
+    assert headings == [section["heading"] for section in sections[1:]]
+    assert not condensed.text.startswith("## ")
+
+
+def test_informative_passages_are_preferred():
+    sections = [{"heading": "", "paragraphs": [FILLER, INFORMATIVE, FILLER.replace("there", "then")]}]
+    scores = score_passages(split_passages(sections))
+    assert scores.argmax() == 1
+    assert condense(sections, budget=estimate_tokens(INFORMATIVE) + 1).text == INFORMATIVE
+
+
+def test_long_paragraphs_are_split_into_passages():
+    paragraph = " ".join([INFORMATIVE] * 40)
+    passages = split_passages([{"heading": "", "paragraphs": [paragraph]}])
+    assert len(passages) > 1
+    assert all(passage.tokens <= MAX_PASSAGE_TOKENS for passage in passages)
+    assert " ".join(passage.text for passage in passages) == paragraph
+
+
+def test_content_without_sections():
+    condensed = condense(None, "Plain text with no sections.")
+    assert condensed.text == "Plain text with no sections."
+    assert condensed.sections_total == 1
+
+
+def test_gemini_pro_generator_condenses_its_content(run, monkeypatch):
+    # The module builds its client at import, which only needs a key
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    generator = importlib.import_module("llm_quiz_generator").LLMQuizGenerator()
+    prompts = []
+
+    class Model:
+        async def generate_content_async(self, prompt):
+            prompts.append(prompt)
+            return type("Reply", (), {"text": make_fake_quiz("Long").model_dump_json()})()
+
+    generator.model = Model()
+    article = "\n".join(" ".join([INFORMATIVE] * 4) for _ in range(200))
+    assert run(generator.generate_quiz("Long", article)).title == "Long"
+    content = prompts[0].split("Content: ", 1)[1].split("Generate the following", 1)[0].strip()
+    assert estimate_tokens(content) <= PROMPT_TOKEN_BUDGET < estimate_tokens(article)
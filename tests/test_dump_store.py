@@ -0,0 +1,82 @@
+import pytest
+
+import ingest_dump
+import scraper
+from dump_store import DumpStore, title_from_url
+from tests.fakes import make_article_html, write_xml_dump
+
+CURID_URL = "https://en.wikipedia.org/w/index.php?curid=12345"
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("dump")
+    write_xml_dump(str(directory / "pages.xml"), 20, sections=3)
+    counts = ingest_dump.ingest(str(directory / "pages.xml"), str(directory / "store"), progress_every=0)
+    assert (counts["articles"], counts["redirects"]) == (20, 2)
+    found = DumpStore(str(directory / "store"))
+    yield found
+    found.close()
+
+
+@pytest.fixture
+def curid_page(wikipedia, monkeypatch):
+    monkeypatch.setitem(wikipedia.pages, "/w/index.php", make_article_html("Page by id"))
+
+
+def test_titles_from_urls():
+    assert title_from_url("https://en.wikipedia.org/wiki/Albert_Einstein") == "Albert Einstein"
+    assert title_from_url("https://en.wikipedia.org/w/index.php?title=albert_Einstein&oldid=1") == "Albert Einstein"
+    with pytest.raises(ValueError):
+        title_from_url(CURID_URL)
+
+
+def test_lookups(store):
+    assert store.get("Article 3")["title"] == "Article 3"
+    assert store.get("article_3")["title"] == "Article 3"
+    # Redirects are followed
+    assert store.get("Art 10")["title"] == "Article 10"
+    assert store.get("Talk:Article 0") is None
+    assert store.get("Missing article") is None
+    assert store.get_url("https://en.wikipedia.org/wiki/Article_7")["title"] == "Article 7"
+    assert store.get_url("https://en.m.wikipedia.org/wiki/Article_7")["title"] == "Article 7"
+
+
+def test_store_records_the_wiki_it_is_from(store, tmp_path):
+    # The export's <dbname> names it
+    assert store.host == "en.wikipedia.org"
+    assert store.get_url("https://de.wikipedia.org/wiki/Article_7") is None
+
+    write_xml_dump(str(tmp_path / "pages.xml"), 2)
+    with pytest.raises(ValueError, match="pass --host"):
+        ingest_dump.ingest(str(tmp_path / "pages.xml"), str(tmp_path / "store"), host="example.org", progress_every=0)
+    ingest_dump.ingest(str(tmp_path / "pages.xml"), str(tmp_path / "store"), host="de.wikipedia.org", progress_every=0)
+    german = DumpStore(str(tmp_path / "store"))
+    assert german.get_url("https://de.wikipedia.org/wiki/Article_1")["title"] == "Article 1"
+    assert german.get_url("https://en.wikipedia.org/wiki/Article_1") is None
+    german.close()
+
+
+def test_url_without_a_title_is_not_in_the_dump(store):
+    assert store.get_url(CURID_URL) is None
+
+
+def test_auto_source_falls_back_to_the_web(run, store, wikipedia, curid_page, monkeypatch):
+    monkeypatch.setattr(scraper, "dump_store", store)
+    monkeypatch.setattr(scraper, "CONTENT_SOURCE", "auto")
+    assert run(scraper.scrape_wikipedia("https://en.wikipedia.org/wiki/Article_2"))["title"] == "Article 2"
+    assert run(scraper.scrape_wikipedia(CURID_URL))["title"] == "Page by id"
+    # The same title on another wiki is another article
+    before = wikipedia.requests["/wiki/Article_2"]
+    run(scraper.scrape_wikipedia("https://fr.wikipedia.org/wiki/Article_2"))
+    assert wikipedia.requests["/wiki/Article_2"] == before + 1
+
+
+def test_dump_source_never_fetches(run, store, wikipedia, monkeypatch):
+    monkeypatch.setattr(scraper, "dump_store", store)
+    monkeypatch.setattr(scraper, "CONTENT_SOURCE", "dump")
+    before = sum(wikipedia.requests.values())
+    for url in ("https://en.wikipedia.org/wiki/Missing_article", CURID_URL):
+        with pytest.raises(ValueError, match="not in the Wikipedia dump"):
+            run(scraper.scrape_wikipedia(url))
+    assert sum(wikipedia.requests.values()) == before
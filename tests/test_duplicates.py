@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from fake_llm import make_fake_quiz
+from near_duplicates import NEAR_DUPLICATE_MIN_SIMILARITY, NearDuplicateIndex, fingerprint, similarity, simhash_of
+from quiz_cache import content_hash, normalize_url, resolved_url_key
+from scraper import parse_wikipedia_html
+from storage import QuizRecord, save_quizzes
+from tests.fakes import make_article_html
+
+
+def article(title: str, seed: int = 0) -> str:
+    return parse_wikipedia_html(make_article_html(title, sections=4, seed=seed))["content"]
+
+
+@pytest.mark.parametrize("url", [
+    "https://en.wikipedia.org/wiki/Albert_Einstein",
+    "http://en.wikipedia.org/wiki/Albert_Einstein",
+    "https://en.m.wikipedia.org/wiki/Albert_Einstein",
+    "https://en.wikipedia.org/wiki/Albert_Einstein#Early_life",
+    "https://en.wikipedia.org/wiki/Albert_Einstein?oldid=1187654321",
+    "https://en.wikipedia.org/w/index.php?title=Albert_Einstein&oldid=1187654321",
+    "https://en.wikipedia.org/wiki/Albert%20Einstein",
+    "https://en.wikipedia.org/wiki/albert_Einstein",
+    "https://www.en.wikipedia.org/wiki/Albert_Einstein",
+])
+def test_url_spellings_share_one_key(url):
+    assert normalize_url(url) == "https://en.wikipedia.org/wiki/Albert_Einstein"
+
+
+def test_other_languages_and_sites_keep_their_own_key():
+    assert normalize_url("https://de.wikipedia.org/wiki/Albert_Einstein") != normalize_url("https://en.wikipedia.org/wiki/Albert_Einstein")
+    assert normalize_url("https://example.com/Page/#top") == "https://example.com/Page"
+
+
+def test_redirect_resolves_to_the_article_title():
+    assert resolved_url_key("https://en.wikipedia.org/wiki/Felis_catus", "Cat") == "https://en.wikipedia.org/wiki/Cat"
+    assert resolved_url_key("https://example.com/page", "Cat") == "https://example.com/page"
+
+
+def test_short_articles_have_no_fingerprint():
+    assert fingerprint("a few words only") is None
+    assert simhash_of("a few words only") is None
+
+
+def test_fingerprint_ignores_word_padding():
+    content = article("Padding")
+    longer = content + " " + "pneumonoultramicroscopicsilicovolcanoconiosis"
+    # Appending one word longer than any other adds shingles, it must not change the rest
+    assert np.isin(fingerprint(content).shingles, fingerprint(longer).shingles).all()
+    assert similarity(fingerprint(content), fingerprint(longer)) >= NEAR_DUPLICATE_MIN_SIMILARITY
+
+
+def test_unrelated_articles_are_not_similar():
+    assert similarity(fingerprint(article("First", seed=1)), fingerprint(article("Second", seed=2))) < 0.5
+
+
+def save_article(run, url_key: str, content: str):
+    from database import AsyncSessionLocal
+
+    title = url_key.rsplit("/", 1)[-1]
+    record = QuizRecord(url_key, url_key, content_hash(content), title, content, make_fake_quiz(title), simhash_of(content))
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await save_quizzes(db, [record])
+            await db.commit()
+    run(scenario())
+
+
+def find(run, index: NearDuplicateIndex, content: str, url_key: str):
+    from database import AsyncSessionLocal
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            return await index.find(db, content, url_key)
+    return run(scenario())
+
+
+def test_index_finds_an_edited_copy(run, database, unique):
+    url_key = f"https://en.wikipedia.org/wiki/{unique}"
+    content = article(unique)
+    save_article(run, url_key, content)
+
+    index = NearDuplicateIndex()
+    edited = content.replace(" the ", " a ", 1) + " Supercalifragilisticexpialidocious"
+    assert find(run, index, edited, f"https://en.wikipedia.org/wiki/{unique}_copy") is not None
+    assert find(run, index, article("Unrelated", seed=99), f"https://en.wikipedia.org/wiki/{unique}_other") is None
+
+
+def test_copies_on_another_host_are_not_reused(run, database, unique):
+    content = article(unique, seed=7)
+    save_article(run, f"https://en.wikipedia.org/wiki/{unique}", content)
+
+    index = NearDuplicateIndex()
+    assert find(run, index, content, f"https://simple.wikipedia.org/wiki/{unique}") is None
+    # No quiz from that host at all, so the article was not even fingerprinted
+    assert index.stats["lookups"] == 0
+
+    save_article(run, f"https://simple.wikipedia.org/wiki/{unique}_unrelated", article("Unrelated", seed=98))
+    assert find(run, index, content, f"https://simple.wikipedia.org/wiki/{unique}") is None
+    assert index.stats["lookups"] == 1
+    assert find(run, index, content, f"https://en.wikipedia.org/wiki/{unique}_copy") is not None
@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+from fetcher import ResponseStore, WikipediaFetcher
+
+
+def age(store: ResponseStore, url: str, seconds: float):
+    """Make a stored page look unused for seconds"""
+    _, body_path = store._paths(url)
+    when = time.time() - seconds
+    os.utime(body_path, (when, when))
+
+
+def test_directory_is_created_on_first_write(tmp_path):
+    directory = tmp_path / "pages"
+    store = ResponseStore(str(directory))
+    assert not directory.exists()
+    assert store.load("https://en.wikipedia.org/wiki/Cat") is None
+    assert not directory.exists()
+    store.save("https://en.wikipedia.org/wiki/Cat", '"v1"', None, b"<html>cat</html>")
+    assert store.load("https://en.wikipedia.org/wiki/Cat") == ('"v1"', None, b"<html>cat</html>")
+
+
+def test_unused_pages_expire(tmp_path):
+    store = ResponseStore(str(tmp_path), ttl_seconds=60)
+    for name in ("Cat", "Dog"):
+        store.save(f"https://en.wikipedia.org/wiki/{name}", '"v1"', None, b"body")
+    age(store, "https://en.wikipedia.org/wiki/Cat", 120)
+    assert store.load("https://en.wikipedia.org/wiki/Cat") is None
+    assert store.prune() == 1
+    assert store.load("https://en.wikipedia.org/wiki/Dog") is not None
+
+
+def test_least_recently_used_pages_are_evicted_past_the_size_limit(tmp_path):
+    store = ResponseStore(str(tmp_path), max_bytes=250, ttl_seconds=0)
+    urls = [f"https://en.wikipedia.org/wiki/Page_{i}" for i in range(4)]
+    for i, url in enumerate(urls):
+        store.save(url, '"v1"', None, b"x" * 100)
+        age(store, url, 100 - i)
+    # Reading a page makes it the most recently used
+    assert store.load(urls[0]) is not None
+    assert store.prune() == 2
+    assert [store.load(url) is not None for url in urls] == [True, False, False, True]
+
+
+@pytest.fixture
+def fetcher(run, wikipedia, tmp_path):
+    fetcher = WikipediaFetcher(cache_dir=str(tmp_path), origin=wikipedia.base_url, backoff_seconds=0.01)
+    yield fetcher
+    run(fetcher.aclose())
+
+
+def test_refetch_is_conditional(run, fetcher, unique):
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+    first = run(fetcher.fetch(url))
+    assert run(fetcher.fetch(url)) == first
+    assert fetcher.stats["not_modified"] == 1
+
+
+def test_retries_server_errors(run, fetcher, wikipedia, unique):
+    wikipedia.fail_next(f"/wiki/{unique}", 503, count=2, retry_after="0")
+    assert b"<html" in run(fetcher.fetch(f"https://en.wikipedia.org/wiki/{unique}"))
+    assert fetcher.stats["retries"] == 2
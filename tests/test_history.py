@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from database import AsyncSessionLocal, Quiz
+
+START = datetime(2024, 1, 1)
+
+
+def seed(run, prefix: str, count: int) -> list:
+    """count quizzes titled with prefix, two per timestamp so pages split ties; returns them newest first"""
+    rows = [
+        {"url": f"https://en.wikipedia.org/wiki/{prefix}_{i}", "title": f"{prefix} {i}",
+         "date_generated": START + timedelta(hours=i // 2)}
+        for i in range(count)
+    ]
+
+    async def insert_rows():
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(Quiz), rows)
+            await db.commit()
+    run(insert_rows())
+    return [row["title"] for row in reversed(rows)]
+
+
+def walk(run, client, **params) -> list:
+    titles, cursor, pages = [], None, 0
+    while True:
+        response = run(client.get("/history", params=dict(params, **({"cursor": cursor} if cursor else {}))))
+        assert response.status_code == 200
+        titles += [item["title"] for item in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return titles, pages
+
+
+def test_pages_cover_every_quiz_once_newest_first(run, client, unique):
+    expected = seed(run, unique, 11)
+    titles, pages = walk(run, client, title_prefix=unique, limit=3)
+    assert pages == 4
+    # Ties on date_generated are ordered by id, newest first
+    assert titles == expected
+
+
+def test_items_are_projected(run, client, unique):
+    seed(run, unique, 1)
+    item = run(client.get("/history", params={"title_prefix": unique})).json()[0]
+    assert set(item) == {"id", "url", "title", "date_generated"}
+
+
+def test_date_range(run, client, unique):
+    seed(run, unique, 8)
+    titles, _ = walk(run, client, title_prefix=unique, limit=2,
+                     date_from=(START + timedelta(hours=1)).isoformat(), date_to=(START + timedelta(hours=3)).isoformat())
+    assert titles == [f"{unique} {i}" for i in (5, 4, 3, 2)]
+
+
+def test_title_prefix_is_literal(run, client, unique):
+    seed(run, unique, 2)
+    assert run(client.get("/history", params={"title_prefix": unique[:-1] + "%"})).json() == []
+
+
+def test_bad_cursor_and_limit(run, client):
+    assert run(client.get("/history", params={"cursor": "not-a-cursor"})).status_code == 400
+    assert run(client.get("/history", params={"limit": 10_000})).status_code == 422
@@ -0,0 +1,120 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from database import AsyncSessionLocal, Job
+from jobs import JobQueue, JobQueueFull, TERMINAL_STATUSES
+
+
+@pytest.fixture
+def job_queue(run, database, wikipedia, generator):
+    # The ASGI test client does not run the lifespan hook that starts the workers
+    run(main.job_queue.start())
+    yield main.job_queue
+    run(main.job_queue.stop())
+
+
+def wait_for(run, queue: JobQueue, job_id: str, timeout: float = 5.0) -> Job:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = run(queue.get(job_id))
+        if job.status in TERMINAL_STATUSES:
+            return job
+        run(asyncio.sleep(0.01))
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_job_runs_in_the_background(run, client, job_queue, generator, unique):
+    response = run(client.post("/jobs", json={"url": f"https://en.wikipedia.org/wiki/{unique}"}))
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+    job_id = response.json()["id"]
+
+    wait_for(run, job_queue, job_id)
+    status = run(client.get(f"/jobs/{job_id}")).json()
+    assert status["status"] == "done" and status["quiz"]["title"] == unique.replace("_", " ")
+    assert generator.calls == 1
+
+
+def test_failed_job_reports_its_error(run, client, job_queue):
+    job_id = run(client.post("/jobs", json={"url": "https://example.com/wiki/Cat"})).json()["id"]
+    job = wait_for(run, job_queue, job_id)
+    assert job.status == "failed" and "Wikipedia" in job.error
+
+
+def test_job_events_end_with_the_result(run, client, job_queue, monkeypatch, unique):
+    monkeypatch.setattr(main, "JOB_POLL_INTERVAL", 0.01)
+    job_id = run(client.post("/jobs", json={"url": f"https://en.wikipedia.org/wiki/{unique}"})).json()["id"]
+    events = run(client.get(f"/jobs/{job_id}/events")).text
+    assert events.rstrip().splitlines()[-2] == "event: done"
+
+
+def test_unknown_job_is_404(run, client):
+    assert run(client.get("/jobs/missing")).status_code == 404
+    assert run(client.get("/jobs/missing/events")).status_code == 404
+
+
+def test_full_queue_rejects_jobs(run, database):
+    queue = JobQueue(workers=0, max_queued=1)
+    run(queue.submit("https://en.wikipedia.org/wiki/First"))
+    with pytest.raises(JobQueueFull):
+        run(queue.submit("https://en.wikipedia.org/wiki/Second"))
+
+
+def add_running_job(run, url: str, **fields) -> str:
+    job_id = uuid.uuid4().hex
+
+    async def interrupted():
+        async with AsyncSessionLocal() as db:
+            db.add(Job(id=job_id, url=url, status="running", stage="generating", **fields))
+            await db.commit()
+    run(interrupted())
+    return job_id
+
+
+def test_unfinished_jobs_are_recovered_on_start(run, database, wikipedia, generator, unique):
+    # Left by a release without leases
+    job_id = add_running_job(run, f"https://en.wikipedia.org/wiki/{unique}")
+
+    queue = JobQueue(workers=1)
+    run(queue.start())
+    try:
+        assert wait_for(run, queue, job_id).status == "done"
+    finally:
+        run(queue.stop())
+
+
+def test_jobs_leased_to_a_live_node_are_left_alone(run, database, wikipedia, generator, unique):
+    lease = datetime.utcnow() + timedelta(seconds=0.5)
+    job_id = add_running_job(run, f"https://en.wikipedia.org/wiki/{unique}", owner="other-node", lease_expires_at=lease)
+
+    queue = JobQueue(workers=1, lease_seconds=0.15)
+    run(queue.start())
+    try:
+        run(asyncio.sleep(0.2))
+        job = run(queue.get(job_id))
+        assert (job.status, job.owner) == ("running", "other-node")
+        assert generator.calls == 0
+        # The other node stopped renewing: a heartbeat takes the job over
+        job = wait_for(run, queue, job_id)
+        assert (job.status, job.owner) == ("done", queue.owner)
+    finally:
+        run(queue.stop())
+
+
+def test_leases_are_renewed_and_released(run, database):
+    queue = JobQueue(workers=0, lease_seconds=0.15)
+    run(queue.start())
+    try:
+        job_id = run(queue.submit("https://en.wikipedia.org/wiki/Leased")).id
+        run(asyncio.sleep(0.3))
+        # Past the first lease, but renewed, so no other pool may recover it
+        assert run(JobQueue(workers=0)._recover()) == 0
+        assert run(queue.get(job_id)).lease_expires_at > datetime.utcnow()
+    finally:
+        run(queue.stop())
+    assert run(queue.get(job_id)).lease_expires_at is None
@@ -0,0 +1,87 @@
+import json
+
+from fake_llm import make_fake_quiz
+from llm_quiz_generator_simple import LLMQuizGenerator
+from quiz_repair import repair_json
+
+CONTENT = "The article text."
+
+
+class Reply:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ScriptedModel:
+    """Answers each call with the next scripted response, streamed in small chunks when asked"""
+
+    def __init__(self, *responses: str):
+        self.responses = list(responses)
+        self.prompts = []
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        self.prompts.append(prompt)
+        text = self.responses.pop(0)
+        if not stream:
+            return Reply(text)
+
+        async def chunks():
+            for start in range(0, len(text), 40):
+                yield Reply(text[start:start + 40])
+        return chunks()
+
+
+def quiz_with_unanswerable(title: str, num_questions: int) -> dict:
+    quiz = make_fake_quiz(title, num_questions).model_dump()
+    quiz["questions"][1]["correct_answer"] = "None of the options"
+    return quiz
+
+
+def stream(generator: LLMQuizGenerator, run, title: str) -> list:
+    async def collect():
+        return [event async for event in generator.generate_quiz_stream(title, CONTENT)]
+    return run(collect())
+
+
+def test_repairs_malformed_json(run):
+    text = "```json\n" + json.dumps(make_fake_quiz("Repaired").model_dump())[:-1] + ",}\n```"
+    data, repairs = repair_json(text)
+    assert data["title"] == "Repaired" and repairs
+    generator = LLMQuizGenerator(model=ScriptedModel(text))
+    assert len(run(generator.generate_quiz("Repaired", CONTENT)).questions) == 5
+    assert generator.repair_stats["repaired"] == 1
+
+
+def test_stream_skips_unanswerable_questions(run):
+    response = json.dumps(quiz_with_unanswerable("Streamed", 6))
+    expected = run(LLMQuizGenerator(model=ScriptedModel(response)).generate_quiz("Streamed", CONTENT))
+    events = stream(LLMQuizGenerator(model=ScriptedModel(response)), run, "Streamed")
+
+    questions = [value for event, value in events if event == "question"]
+    assert "Question 2 about Streamed?" not in [question.question for question in questions]
+    assert events[-1] == ("quiz", expected)
+    assert questions == expected.questions
+
+
+def test_stream_asks_for_missing_questions_like_the_full_response(run):
+    extra = make_fake_quiz("More", 2).model_dump()["questions"]
+    model = ScriptedModel(json.dumps(quiz_with_unanswerable("Short", 5)), json.dumps({"questions": extra}))
+    events = stream(LLMQuizGenerator(model=model), run, "Short")
+
+    assert len(model.prompts) == 2
+    questions = [value for event, value in events if event == "question"]
+    event, quiz = events[-1]
+    assert event == "quiz" and len(quiz.questions) == 6
+    assert questions == quiz.questions
+
+
+def test_followup_asks_only_for_missing_fields(run):
+    quiz = make_fake_quiz("Partial").model_dump()
+    partial = json.dumps({key: quiz[key] for key in ("title", "summary", "questions")})
+    extra = {"key_entities": quiz["key_entities"], "related_topics": quiz["related_topics"]}
+    model = ScriptedModel(partial, json.dumps(extra))
+    generator = LLMQuizGenerator(model=model)
+
+    assert run(generator.generate_quiz("Partial", CONTENT)).model_dump() == quiz
+    assert "MISSING FIELDS: key_entities, related_topics" in model.prompts[1]
+    assert generator.repair_stats["followups"] == 1
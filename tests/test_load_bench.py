@@ -0,0 +1,83 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def load_bench(monkeypatch):
+    # Importing the benchmark points DATABASE_URL at its own file; keep ours
+    monkeypatch.setenv("DATABASE_URL", os.environ["DATABASE_URL"])
+    return importlib.import_module("benchmarks.load_bench")
+
+
+def row(endpoint: str = "quiz", requests: int = 3000, spread: dict = None, **figures) -> dict:
+    values = {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 40.0, "throughput_rps": 100.0, "rss_peak_mb": 100.0}
+    values.update(figures)
+    return dict(values, scenario="quiz", concurrency=8, endpoint=endpoint, requests=requests, errors=0, spread=spread or {})
+
+
+def results(*rows, repeats: int = 3) -> dict:
+    return {"meta": {"commit": "abc", "settings": {"repeats": repeats}}, "results": list(rows)}
+
+
+def regressed(load_bench, baseline: dict, current: dict) -> list:
+    return [(r[2], r[3]) for r in load_bench.compare(results(baseline), results(current), threshold=0.25, min_delta_ms=2.0)]
+
+
+def test_combine_takes_medians_and_spread(load_bench):
+    repeats = [[row(p50_ms=10.0, requests=100)], [row(p50_ms=12.0, requests=100)], [row(p50_ms=11.0, requests=100)]]
+    combined = load_bench.combine("quiz", 8, repeats)[0]
+    assert combined["requests"] == 300
+    assert combined["p50_ms"] == 11.0
+    assert combined["spread"]["p50_ms"] == pytest.approx(2 / 11, abs=1e-3)
+
+
+def test_slower_and_bigger_figures_are_regressions(load_bench):
+    assert regressed(load_bench, row(), row(p95_ms=30.0, throughput_rps=70.0, rss_peak_mb=130.0)) == [
+        ("quiz", "p95_ms"), ("quiz", "throughput_rps"), ("quiz", "rss_peak_mb"),
+    ]
+    # Faster and smaller is never a regression
+    assert regressed(load_bench, row(), row(p50_ms=1.0, throughput_rps=500.0, rss_peak_mb=50.0)) == []
+
+
+def test_noise_is_not_a_regression(load_bench):
+    # Within the baseline's own spread
+    assert regressed(load_bench, row(spread={"p95_ms": 0.6}), row(p95_ms=30.0)) == []
+    # A large relative change of a few milliseconds
+    assert regressed(load_bench, row(p50_ms=1.0), row(p50_ms=2.0)) == []
+    # p99 over too few requests to have a tail
+    assert regressed(load_bench, row(requests=300), row(requests=300, p99_ms=80.0)) == []
+
+
+def test_rows_only_in_one_run_are_skipped(load_bench):
+    assert regressed(load_bench, row(endpoint="history"), row(endpoint="quiz", p50_ms=100.0)) == []
+
+
+def test_run_and_compare_offline(tmp_path):
+    """A short real run against a stub server, then compared with itself and with a faster baseline"""
+    output = tmp_path / "current.json"
+    bench = [sys.executable, "-m", "benchmarks.load_bench"]
+    subprocess.run(
+        bench + ["--scenarios", "quiz", "--levels", "1", "--duration", "0.3", "--warmup", "0",
+                 "--repeats", "1", "--seed", "20", "--output", str(output)],
+        cwd=REPO_ROOT, check=True, capture_output=True, timeout=120,
+    )
+    current = json.loads(output.read_text())
+    [measured] = current["results"]
+    assert measured["endpoint"] == "quiz" and measured["requests"] > 0 and measured["errors"] == 0
+
+    compare = bench + ["--current", str(output), "--compare"]
+    assert subprocess.run(compare + [str(output)], cwd=REPO_ROOT, capture_output=True).returncode == 0
+
+    baseline = tmp_path / "baseline.json"
+    faster = dict(measured, p50_ms=measured["p50_ms"] / 10, throughput_rps=measured["throughput_rps"] * 10)
+    baseline.write_text(json.dumps(dict(current, results=[faster])))
+    compared = subprocess.run(compare + [str(baseline)], cwd=REPO_ROOT, capture_output=True, text=True)
+    assert compared.returncode == 1
+    assert "throughput_rps" in compared.stdout
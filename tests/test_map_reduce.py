@@ -0,0 +1,135 @@
+import asyncio
+import json
+import re
+import time
+
+import pytest
+
+from llm_quiz_generator_simple import LLMQuizGenerator
+from map_reduce import SectionQuiz, group_sections, merge_section_quizzes, parse_section_quiz
+from models import Question
+from scraper import parse_wikipedia_html
+from tests.fakes import make_article_html
+
+
+class Reply:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class SectionModel:
+    """Answers each section prompt with questions about that section after a fixed delay"""
+
+    def __init__(self, latency: float = 0.05, failing: str = None):
+        self.latency = latency
+        self.failing = failing
+        self.sections = []
+        self.asked = {}
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        heading = re.search(r"SECTION: (.*)", prompt).group(1).strip()
+        num_questions = int(re.search(r"Create (\d+) multiple choice", prompt).group(1))
+        self.sections.append(heading)
+        n = len(self.sections)
+        await asyncio.sleep(self.latency)
+        if heading == self.failing:
+            raise RuntimeError("section failed")
+        # Questions with no words in common, so none are merged as duplicates
+        self.asked[heading] = [
+            f"What links w{n}x{i}a w{n}x{i}b w{n}x{i}c?"
+            for i in range(num_questions)
+        ]
+        return Reply(json.dumps({
+            "summary": f"About {heading}. More detail.",
+            "questions": [question(text) for text in self.asked[heading]],
+            "key_entities": [{"name": f"{heading} entity", "description": "d", "relevance": "r"}],
+            "related_topics": [f"{heading} topic"],
+        }))
+
+
+def question(text: str, answer: str = "A") -> dict:
+    return {"question": text, "options": ["A", "B", "C", "D"], "correct_answer": answer, "explanation": "e"}
+
+
+def part(heading: str, *questions: str) -> SectionQuiz:
+    return SectionQuiz(heading, f"{heading} summary.", [], [], [Question(**question(q)) for q in questions])
+
+
+def sources(model: SectionModel, quiz) -> set:
+    return {heading for q in quiz.questions for heading, asked in model.asked.items() if q.question in asked}
+
+
+def long_article(title: str) -> list:
+    return parse_wikipedia_html(make_article_html(title, sections=12, paragraphs_per_section=6))["sections"]
+
+
+def test_sections_are_generated_in_parallel(run):
+    model = SectionModel(latency=0.1)
+    sections = long_article("Parallel")
+    started = time.monotonic()
+    quiz = run(LLMQuizGenerator(model=model).generate_quiz_map_reduce("Parallel", sections))
+
+    assert len(model.sections) > 2
+    # Bounded by the slowest section, not their sum
+    assert time.monotonic() - started < 0.1 * len(model.sections) / 2
+    assert len(quiz.questions) == 10
+    # Questions are taken across sections rather than from the first ones
+    assert sources(model, quiz) == set(model.sections)
+    assert model.sections[0].startswith("Introduction")
+
+
+def test_failed_sections_are_left_out(run):
+    sections = long_article("Partial")
+    headings = [group.heading for group in group_sections(sections, 8, 800)]
+    model = SectionModel(failing=headings[1])
+    quiz = run(LLMQuizGenerator(model=model).generate_quiz_map_reduce("Partial", sections))
+    assert len(quiz.questions) == 10
+    assert sources(model, quiz) == set(model.sections) - {headings[1]}
+
+
+def test_every_section_failing_is_an_error(run):
+    sections = [{"heading": "", "paragraphs": ["Only a lead."]}]
+    with pytest.raises(Exception, match="all 1 section requests failed"):
+        run(LLMQuizGenerator(model=SectionModel(failing="Introduction")).generate_quiz_map_reduce("Failed", sections))
+
+
+def test_groups_keep_order_and_respect_the_limit():
+    sections = long_article("Grouped")
+    groups = group_sections(sections, max_groups=4, token_budget=200)
+    assert len(groups) <= 4
+    assert groups[0].heading.startswith("Introduction")
+    headings = "; ".join(group.heading for group in groups).split("; ")
+    assert headings == ["Introduction"] + [section["heading"] for section in sections[1:]]
+
+
+def test_merge_drops_duplicates_and_unanswerable_questions():
+    parts = [
+        part("Lead", "When was the city founded?", "Who founded the city?"),
+        part("History", "When was the city first founded?", "What river runs through it?"),
+    ]
+    parts[1].questions.append(Question(**question("Which is wrong?", answer="None of the options")))
+    quiz = merge_section_quizzes("City", parts, num_questions=10)
+    assert [q.question for q in quiz.questions] == [
+        "When was the city founded?", "Who founded the city?", "What river runs through it?",
+    ]
+    assert quiz.summary == "Lead summary.\n\nHistory summary."
+
+
+def test_invalid_section_questions_are_dropped():
+    text = json.dumps({"summary": "s", "questions": [question("Fine?"), {"question": "Missing options?"}]})
+    assert [q.question for q in parse_section_quiz("Lead", text).questions] == ["Fine?"]
+
+
+def test_mode_is_selectable_per_request(run, client, generator, monkeypatch, unique):
+    modes = []
+    generate_map_reduce = generator.generate_quiz_map_reduce
+
+    async def recorded(title, sections):
+        modes.append(len(sections))
+        return await generate_map_reduce(title, sections)
+    monkeypatch.setattr(generator, "generate_quiz_map_reduce", recorded)
+
+    response = run(client.post("/generate_quiz", json={"url": f"https://en.wikipedia.org/wiki/{unique}", "mode": "map_reduce"}))
+    assert response.status_code == 200
+    assert len(modes) == 1 and modes[0] > 1
+    assert run(client.post("/generate_quiz", json={"url": "https://en.wikipedia.org/wiki/X", "mode": "other"})).status_code == 422
@@ -0,0 +1,88 @@
+import logging
+import re
+
+import pytest
+
+import metrics
+from fake_llm import make_fake_quiz
+from llm_quiz_generator_simple import LLMQuizGenerator
+from logging_config import SamplingFilter
+from metrics import Counter, Histogram, stage_timer
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Instruments made by a test are dropped from the exposition afterwards
+    monkeypatch.setattr(metrics, "_registry", list(metrics._registry))
+
+
+def stage_counts() -> dict:
+    return {stage: value["count"] for stage, value in metrics.STAGE_SECONDS.snapshot().items()}
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = Histogram("test_seconds", "Test", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, kind="a")
+    text = metrics.render_prometheus()
+    assert 'test_seconds_bucket{kind="a",le="0.1"} 1\n' in text
+    assert 'test_seconds_bucket{kind="a",le="1.0"} 3\n' in text
+    assert 'test_seconds_bucket{kind="a",le="+Inf"} 4\n' in text
+    assert 'test_seconds_count{kind="a"} 4\n' in text
+    assert histogram.snapshot()["a"]["p50"] == 1.0
+
+
+def test_label_values_are_escaped(registry):
+    counter = Counter("test_escaped_total", "Test", ("type",))
+    counter.inc(type='say "hi"\n')
+    assert 'test_escaped_total{type="say \\"hi\\"\\n"} 1\n' in metrics.render_prometheus()
+
+
+def test_stage_timer_counts_errors_by_type():
+    before = metrics.ERRORS.snapshot().get("test_stage/KeyError", 0)
+    with pytest.raises(KeyError):
+        with stage_timer("test_stage"):
+            raise KeyError("missing")
+    assert metrics.ERRORS.snapshot()["test_stage/KeyError"] == before + 1
+    assert stage_counts()["test_stage"] >= 1
+
+
+def test_generation_records_every_stage(run, client, unique):
+    before = stage_counts()
+    assert run(client.post("/generate_quiz", json={"url": f"https://en.wikipedia.org/wiki/{unique}"})).status_code == 200
+    after = stage_counts()
+    for stage in ("fetch", "parse", "cleanup", "prompt_build", "db_write"):
+        assert after.get(stage, 0) == before.get(stage, 0) + 1, stage
+
+
+def test_llm_calls_record_latency_and_sizes(run):
+    response = make_fake_quiz("Sized").model_dump_json()
+
+    class Model:
+        async def generate_content_async(self, prompt, **kwargs):
+            return type("Reply", (), {"text": response})()
+
+    before = (stage_counts().get("llm", 0), metrics.LLM_RESPONSE_CHARS.snapshot().get("quiz", {}).get("count", 0))
+    run(LLMQuizGenerator(model=Model()).generate_quiz("Sized", "Content."))
+    assert stage_counts()["llm"] == before[0] + 1
+    assert metrics.LLM_RESPONSE_CHARS.snapshot()["quiz"]["count"] == before[1] + 1
+    assert metrics.LLM_PROMPT_CHARS.snapshot()["quiz"]["count"] >= 1
+
+
+def test_metrics_endpoint(run, client, unique):
+    run(client.post("/generate_quiz", json={"url": f"https://en.wikipedia.org/wiki/{unique}"}))
+    stages = run(client.get("/metrics")).json()["instrumentation"]["quiz_stage_seconds"]
+    assert stages["fetch"]["count"] >= 1 and stages["fetch"]["p95"] >= stages["fetch"]["p50"]
+
+    text = run(client.get("/metrics", headers={"Accept": "text/plain"})).text
+    assert "# TYPE quiz_stage_seconds histogram" in text
+    # Requests are labelled by route template, not the raw path
+    assert re.search(r'http_request_seconds_count\{method="POST",route="/generate_quiz",status="200"\} \d+', text)
+    assert run(client.get("/metrics", params={"format": "prometheus"})).text.startswith("# HELP")
+
+
+def test_sampling_keeps_warnings():
+    sampler = SamplingFilter(0.0)
+    record = lambda level: logging.LogRecord("test", level, __file__, 1, "message", None, None)
+    assert not sampler.filter(record(logging.INFO))
+    assert sampler.filter(record(logging.WARNING))
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+
+import warm_cache
+from fake_llm import make_fake_quiz
+from prefetch import PREFETCH_CLIENT, Prefetcher, article_url, next_articles
+from quiz_cache import normalize_url
+from usage import current_client
+
+SOURCE = "https://en.wikipedia.org/wiki/Source"
+
+
+@pytest.fixture
+def prefetcher(run, database, wikipedia, generator):
+    prefetcher = Prefetcher(enabled=True, max_per_quiz=2, daily_tokens=0, workers=1, poll_interval=0.01)
+    run(prefetcher.start())
+    yield prefetcher
+    run(prefetcher.stop())
+
+
+def wait_for(run, condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        run(asyncio.sleep(0.01))
+
+
+def test_next_articles_alternate_topics_and_links():
+    quiz = make_fake_quiz("Source").model_copy(update={"related_topics": ["Topic one", "Source", "Topic two"]})
+    scraped = {"title": "Source", "links": ["Link one", "Topic one", "Link two"]}
+    assert next_articles(SOURCE, scraped, quiz, limit=4) == [
+        normalize_url(article_url(SOURCE, title)) for title in ("Topic one", "Link one", "Topic two", "Link two")
+    ]
+
+
+def test_article_url_matches_the_link_a_reader_clicks():
+    assert article_url("https://de.wikipedia.org/wiki/X", "Café (Paris)") == "https://de.wikipedia.org/wiki/Caf%C3%A9_(Paris)"
+
+
+def test_generated_quiz_warms_the_articles_after_it(run, client, generator, prefetcher, unique):
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+    assert run(client.post("/generate_quiz", json={"url": url})).status_code == 200
+    wait_for(run, lambda: prefetcher.stats.get("generated", 0) == 2)
+    assert generator.calls == 3
+
+    # Prefetched quizzes do not offer their own articles
+    assert prefetcher.queued == 0
+    # and the follow-on request is served from the store
+    next_url = f"https://en.wikipedia.org/wiki/{unique}_history"
+    assert run(client.post("/generate_quiz", json={"url": next_url})).status_code == 200
+    assert generator.calls == 3
+
+
+def test_offers_made_by_prefetching_are_ignored(database):
+    prefetcher = Prefetcher(enabled=True)
+    token = current_client.set((PREFETCH_CLIENT, "prefetch"))
+    try:
+        prefetcher.offer(SOURCE, {"title": "Source", "links": ["Other"]}, make_fake_quiz("Source"))
+    finally:
+        current_client.reset(token)
+    assert prefetcher.queued == 0
+
+
+def test_daily_budget_stops_generation(run, database, wikipedia, generator, unique):
+    prefetcher = Prefetcher(enabled=False, daily_tokens=1)
+    assert run(prefetcher.prefetch(f"https://en.wikipedia.org/wiki/{unique}")) == "over_budget"
+    assert generator.calls == 0
+
+
+def test_warm_cache_skips_stored_articles(run, database, wikipedia, generator, tmp_path, unique):
+    listing = tmp_path / "urls.txt"
+    urls = [f"https://en.wikipedia.org/wiki/{unique}_{i}" for i in range(3)]
+    listing.write_text("# trending\n" + "\n".join(urls) + f"\n{urls[0]}  # again\n")
+    assert warm_cache.read_urls(str(listing)) == urls
+
+    prefetcher = Prefetcher(enabled=False, daily_tokens=0)
+    assert run(prefetcher.warm(urls[:2])) == {"generated": 2}
+    assert run(prefetcher.warm(urls)) == {"already_stored": 2, "generated": 1}
+    assert generator.calls == 3
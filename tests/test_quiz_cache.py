@@ -0,0 +1,65 @@
+from quiz_cache import LRUCache, quiz_cache
+from tests.fakes import make_article_html
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def generate(run, client, url: str, **options):
+    response = run(client.post("/generate_quiz", json=dict(url=url, **options)))
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_lru_evicts_the_least_recently_used_and_expires_entries():
+    clock = Clock()
+    cache = LRUCache(max_entries=2, ttl_seconds=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    clock.now = 10
+    assert cache.get("a") is None and len(cache) == 1
+
+
+def test_repeat_and_equivalent_urls_skip_scraping_and_generation(run, client, generator, wikipedia, unique):
+    quiz = generate(run, client, f"https://en.wikipedia.org/wiki/{unique}")
+    fetched = wikipedia.requests[f"/wiki/{unique}"]
+    for url in (
+        f"https://en.wikipedia.org/wiki/{unique}",
+        f"https://en.m.wikipedia.org/wiki/{unique}#History",
+        f"https://en.wikipedia.org/w/index.php?title={unique}&oldid=1",
+    ):
+        assert generate(run, client, url) == quiz
+    assert generator.calls == 1
+    assert wikipedia.requests[f"/wiki/{unique}"] == fetched
+
+
+def test_same_content_under_another_url_reuses_the_quiz(run, client, generator, wikipedia, monkeypatch, unique):
+    monkeypatch.setitem(wikipedia.pages, f"/wiki/Mirror_of_{unique}", make_article_html(unique.replace("_", " ")))
+    quiz = generate(run, client, f"https://en.wikipedia.org/wiki/{unique}")
+    assert generate(run, client, f"https://en.wikipedia.org/wiki/Mirror_of_{unique}") == quiz
+    assert generator.calls == 1
+
+
+def test_stored_quizzes_survive_the_memory_tier(run, client, generator, unique):
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+    quiz = generate(run, client, url)
+    quiz_cache.clear()
+    hits = quiz_cache.stats["db_hits"]
+    assert generate(run, client, url) == quiz
+    assert quiz_cache.stats["db_hits"] == hits + 1
+    assert generator.calls == 1
+
+
+def test_force_refresh_regenerates(run, client, generator, unique):
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+    generate(run, client, url)
+    generate(run, client, url, force_refresh=True)
+    assert generator.calls == 2
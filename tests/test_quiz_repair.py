@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from fake_llm import make_fake_quiz
+from quiz_repair import repair_json, salvage_quiz
+from tests.fakes import MALFORMED_DEFECTS, malformed_corpus
+
+CORPUS = list(malformed_corpus(num_quizzes=10))
+
+EXPECTED_REPAIRS = {
+    "prose": ["extra_text"],
+    "trailing_commas": ["trailing_comma"],
+    "missing_commas": ["missing_comma"],
+    "raw_newlines": ["control_char"],
+    "truncated": ["truncated"],
+    "missing_fields": [],
+    "invalid_questions": [],
+}
+
+
+def test_every_defect_is_covered():
+    assert set(EXPECTED_REPAIRS) == set(MALFORMED_DEFECTS)
+
+
+@pytest.mark.parametrize("defect", sorted(MALFORMED_DEFECTS))
+def test_corpus_is_repaired(defect):
+    for _, quiz, text in (case for case in CORPUS if case[0] == defect):
+        data, repairs = repair_json(text)
+        assert repairs == EXPECTED_REPAIRS[defect]
+        if defect in ("prose", "trailing_commas", "missing_commas"):
+            assert data == quiz
+        elif defect == "raw_newlines":
+            assert [q["explanation"] for q in data["questions"]] == [
+                q["explanation"] + "\nSee the article for details." for q in quiz["questions"]
+            ]
+        elif defect == "truncated":
+            # Everything before the cut survives; the last question may be partial
+            assert (data["title"], data["summary"]) == (quiz["title"], quiz["summary"])
+            complete = data["questions"][:-1]
+            assert complete == quiz["questions"][:len(complete)]
+
+
+def test_salvage_keeps_valid_parts_and_lists_what_is_missing():
+    for defect, quiz, text in CORPUS:
+        salvaged = salvage_quiz(repair_json(text)[0], quiz["title"])
+        if defect == "missing_fields":
+            assert salvaged.missing == ["key_entities", "related_topics"]
+        elif defect == "invalid_questions":
+            assert salvaged.dropped == 2
+            assert len(salvaged.data["questions"]) == len(quiz["questions"]) - 2
+        elif defect != "truncated":
+            assert salvaged.missing == [] and salvaged.dropped == 0
+
+
+def test_unrecoverable_responses_are_errors():
+    for text in ("I cannot help with that.", "[1, 2, 3]"):
+        with pytest.raises(ValueError):
+            repair_json(text)
+
+
+def test_escaped_text_is_left_alone():
+    quiz = make_fake_quiz("Escapes").model_dump()
+    quiz["summary"] = 'A "quoted" {brace}, [bracket] and trailing comma,}\n'
+    assert repair_json(json.dumps(quiz)) == (quiz, [])
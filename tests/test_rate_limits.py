@@ -0,0 +1,135 @@
+import json
+
+import pytest
+
+import main
+from llm_governor import LLMGovernor, LLMOverloaded, LLM_OUTPUT_TOKENS_ESTIMATE
+import rate_limit
+from rate_limit import MemoryBucketStore, RateLimiter, client_address, parse_rate
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def limiter(clock=None, **limits) -> RateLimiter:
+    store = MemoryBucketStore(clock=clock) if clock else MemoryBucketStore()
+    return RateLimiter(limits, store=store, api_keys=["known"])
+
+
+def article_urls(prefix: str, count: int) -> list:
+    return [{"url": f"https://en.wikipedia.org/wiki/{prefix}_{i}"} for i in range(count)]
+
+
+def test_parse_rate():
+    assert parse_rate("10/minute").per_second == pytest.approx(10 / 60)
+    assert parse_rate("off") is None
+    with pytest.raises(ValueError):
+        parse_rate("10 per minute")
+
+
+def test_bucket_bursts_then_refills(run):
+    clock = Clock()
+    rate_limiter = limiter(clock, generate="2/second")
+    assert run(rate_limiter.check("generate", "ip:a")).allowed
+    assert run(rate_limiter.check("generate", "ip:a")).allowed
+    denied = run(rate_limiter.check("generate", "ip:a"))
+    assert not denied.allowed and denied.retry_after == pytest.approx(0.5)
+    # Buckets are per client
+    assert run(rate_limiter.check("generate", "ip:b")).allowed
+    clock.now = 0.5
+    assert run(rate_limiter.check("generate", "ip:a")).allowed
+
+
+def test_cost_larger_than_the_bucket_is_rejected(run):
+    with pytest.raises(ValueError):
+        run(limiter(batch="5/hour").check("batch", "ip:a", cost=6))
+
+
+def test_token_budget_below_one_call_is_rejected():
+    with pytest.raises(ValueError):
+        LLMGovernor(concurrency=2, tokens_per_minute=1000)
+
+
+def test_call_larger_than_the_token_window_is_shed(run):
+    governor = LLMGovernor(concurrency=2, tokens_per_minute=LLM_OUTPUT_TOKENS_ESTIMATE + 100)
+
+    async def call(prompt: str):
+        async with governor.slot(prompt):
+            pass
+
+    with pytest.raises(LLMOverloaded) as shed:
+        run(call("x" * 4000))
+    assert shed.value.reason == "too_large" and shed.value.retry_after == 60.0
+    # Calls that fit are unaffected
+    run(call("x" * 40))
+    assert governor.stats["calls"] == 1 and governor.stats["shed"] == {"too_large": 1}
+
+
+def test_unknown_api_keys_fall_back_to_the_address():
+    rate_limiter = limiter()
+    assert rate_limiter.client_id("made-up", "10.0.0.1") == "ip:10.0.0.1"
+    assert rate_limiter.client_id("known", "10.0.0.1").startswith("key:")
+
+
+def test_client_address_is_added_by_the_trusted_proxy():
+    assert client_address(["1.1.1.1"], "10.0.0.1", hops=0) == "10.0.0.1"
+    # Entries left of the proxy's own are whatever the client sent
+    assert client_address(["6.6.6.6, 7.7.7.7", "1.1.1.1"], "10.0.0.1", hops=1) == "1.1.1.1"
+    assert client_address(["6.6.6.6, 1.1.1.1, 10.0.0.2"], "10.0.0.1", hops=2) == "1.1.1.1"
+    # A request that bypassed the proxies
+    assert client_address([], "10.0.0.1", hops=1) == "10.0.0.1"
+
+
+def test_forged_forwarded_for_does_not_get_a_fresh_bucket(run, client, monkeypatch, unique):
+    monkeypatch.setattr(main, "rate_limiter", limiter(generate="1/hour"))
+    monkeypatch.setattr(main, "client_address", lambda forwarded_for, peer: rate_limit.client_address(forwarded_for, peer, hops=1))
+    statuses = [
+        run(client.post("/generate_quiz", json={"url": f"https://en.wikipedia.org/wiki/{unique}_{i}"},
+                        headers={"X-Forwarded-For": f"10.9.9.{i}, 1.1.1.1"})).status_code
+        for i in range(2)
+    ]
+    assert statuses == [200, 429]
+
+
+def test_generate_is_limited(run, client, monkeypatch, unique):
+    monkeypatch.setattr(main, "rate_limiter", limiter(generate="1/hour"))
+    first = run(client.post("/generate_quiz", json={"url": f"https://en.wikipedia.org/wiki/{unique}_1"}))
+    second = run(client.post("/generate_quiz", json={"url": f"https://en.wikipedia.org/wiki/{unique}_2"}))
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert "Retry-After" in second.headers
+
+
+def test_batch_larger_than_the_bucket_is_rejected_up_front(run, client, monkeypatch, generator, unique):
+    monkeypatch.setattr(main, "BATCH_MAX_URLS", 10)
+    monkeypatch.setattr(main, "rate_limiter", limiter(batch="3/hour"))
+    response = run(client.post("/generate_quiz/batch", json=article_urls(unique, 4)))
+    assert response.status_code == 400
+    assert "at most 3 URLs" in response.json()["detail"]
+    assert generator.calls == 0
+
+
+def test_batch_up_to_the_largest_size_is_admitted(run, client, monkeypatch, unique):
+    monkeypatch.setattr(main, "BATCH_MAX_URLS", 4)
+    monkeypatch.setattr(main, "rate_limiter", limiter(batch="10/hour"))
+    response = run(client.post("/generate_quiz/batch", json=article_urls(unique, 4)))
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events].count("result") == 4
+
+
+def test_cached_quizzes_do_not_draw_on_the_generate_limit(run, client, monkeypatch, generator, unique):
+    monkeypatch.setattr(main, "rate_limiter", limiter(generate="1/hour"))
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+    assert run(client.post("/generate_quiz", json={"url": url})).status_code == 200
+    for _ in range(3):
+        assert run(client.post("/generate_quiz", json={"url": url})).status_code == 200
+        assert run(client.post("/generate_quiz/stream", json={"url": url})).status_code == 200
+    assert generator.calls == 1
+    # Regenerating is charged
+    assert run(client.post("/generate_quiz", json={"url": url, "force_refresh": True})).status_code == 429
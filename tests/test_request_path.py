@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+
+def article_url(title: str) -> str:
+    return f"https://en.wikipedia.org/wiki/{title}"
+
+
+def test_generate_history_and_quiz(run, client, generator, unique):
+    response = run(client.post("/generate_quiz", json={"url": article_url(unique)}))
+    assert response.status_code == 200
+    quiz = response.json()
+    assert quiz["title"] == unique.replace("_", " ")
+    assert generator.calls == 1
+
+    history = run(client.get("/history", params={"limit": 100})).json()
+    stored = next(item for item in history if item["title"] == quiz["title"])
+    assert run(client.get(f"/quiz/{stored['id']}")).json() == quiz
+
+
+def test_unknown_quiz_is_404(run, client):
+    assert run(client.get("/quiz/999999999")).status_code == 404
+
+
+def test_non_wikipedia_url_is_rejected(run, client, generator):
+    response = run(client.post("/generate_quiz", json={"url": "https://example.com/wiki/Cat"}))
+    assert response.status_code == 400
+    assert generator.calls == 0
+
+
+def test_slow_generation_does_not_block_other_requests(run, client, generator, unique):
+    generator.latency = 0.5
+
+    async def scenario():
+        generation = asyncio.ensure_future(client.post("/generate_quiz", json={"url": article_url(unique)}))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        history = await client.get("/history")
+        elapsed = time.perf_counter() - started
+        await generation
+        return history, elapsed
+
+    history, elapsed = run(scenario())
+    assert history.status_code == 200
+    assert elapsed < 0.4
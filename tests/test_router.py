@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from fake_llm import make_fake_quiz
+from llm_governor import LLMGovernor
+from llm_quiz_generator_simple import LLMQuizGenerator
+from model_router import ModelRouter
+from usage import current_client, usage_recorder
+
+QUIZ = json.dumps(make_fake_quiz("Routed").model_dump())
+
+
+class Reply:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class Model:
+    """Answers with a fixed quiz after delay seconds, or fails"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("503 Service Unavailable")
+        return Reply(QUIZ)
+
+
+def router(*models, **options) -> ModelRouter:
+    return ModelRouter([(f"model-{i}", model) for i, model in enumerate(models)], **options)
+
+
+def test_falls_back_to_the_next_model(run):
+    broken, working = Model(fail=True), Model()
+    routed = router(broken, working, hedge_after="off")
+    assert run(routed.generate_content_async("prompt")).text == QUIZ
+    assert routed.stats["fallbacks"] == 1 and (broken.calls, working.calls) == (1, 1)
+
+
+def test_breaker_skips_a_failing_model(run):
+    broken, working = Model(fail=True), Model()
+    routed = router(broken, working, hedge_after="off", cooldown=60)
+    for _ in range(5):
+        run(routed.generate_content_async("prompt"))
+    assert routed.routes[0].state == "open"
+    assert broken.calls == 3  # ROUTER_BREAKER_FAILURES
+
+
+def test_every_model_failing_raises(run):
+    with pytest.raises(RuntimeError):
+        run(router(Model(fail=True), Model(fail=True), hedge_after="off").generate_content_async("prompt"))
+
+
+def test_hedged_calls_are_governed_and_counted(run, database):
+    governor = LLMGovernor(concurrency=4, tokens_per_minute=0, requests_per_minute=0)
+    slow, fast = Model(delay=0.5), Model()
+    routed = router(slow, fast, hedge_after="0.05", governor=governor)
+    generator = LLMQuizGenerator(model=routed, governor=governor)
+    client = "ip:hedged"
+
+    async def request():
+        current_client.set((client, "generate"))
+        return await generator.generate_quiz("Routed", "The article text.")
+
+    assert run(request()).title == "Routed"
+    assert routed.stats["hedges"] == 1 and routed.stats["hedge_wins"] == 1
+    # The request's call and its hedge
+    assert governor.stats["calls"] == 2
+    usage = run(usage_recorder.for_client(client, days=1))
+    assert sum(row["llm_calls"] for row in usage) == 2
+    assert sum(row["llm_tokens"] for row in usage) == governor.stats["tokens"]
+
+
+def test_no_hedge_without_spare_capacity(run):
+    governor = LLMGovernor(concurrency=1, tokens_per_minute=0, requests_per_minute=0)
+    slow, fast = Model(delay=0.2), Model()
+    routed = router(slow, fast, hedge_after="0.05", governor=governor)
+    generator = LLMQuizGenerator(model=routed, governor=governor)
+    assert run(generator.generate_quiz("Routed", "The article text.")).title == "Routed"
+    assert routed.stats["hedges_skipped"] == 1 and fast.calls == 0
+    assert governor.stats["calls"] == 1
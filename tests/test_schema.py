@@ -0,0 +1,40 @@
+from sqlalchemy import create_engine, inspect, text
+
+from database import ensure_schema
+
+# The quizzes table as the first release created it
+LEGACY_QUIZZES = """
+CREATE TABLE quizzes (
+    id INTEGER PRIMARY KEY,
+    url VARCHAR,
+    title VARCHAR,
+    date_generated DATETIME,
+    scraped_content TEXT,
+    full_quiz_data TEXT
+)
+"""
+
+
+def test_existing_tables_get_new_columns_and_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_QUIZZES))
+        conn.execute(text("INSERT INTO quizzes (url, title) VALUES ('https://en.wikipedia.org/wiki/Cat', 'Cat')"))
+
+    with engine.begin() as conn:
+        added = ensure_schema(conn)
+    assert {"quizzes.canonical_url", "quizzes.content_hash", "quizzes.storage_format",
+            "quizzes.quiz_blob", "quizzes.simhash"} <= set(added)
+
+    inspector = inspect(engine)
+    assert {"ix_quizzes_canonical_url", "ix_quizzes_content_hash"} <= {
+        index["name"] for index in inspector.get_indexes("quizzes")
+    }
+    assert {"articles", "jobs", "usage"} <= set(inspector.get_table_names())
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT title, canonical_url FROM quizzes")).one() == ("Cat", None)
+
+    # Running again on every start changes nothing
+    with engine.begin() as conn:
+        assert ensure_schema(conn) == []
+    engine.dispose()
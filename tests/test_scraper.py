@@ -0,0 +1,54 @@
+import pytest
+
+import scraper
+from scraper import EXTRACTORS, parse_wikipedia_html, resolve_engine
+from tests.fakes import make_article_html
+
+MALFORMED_PAGES = [
+    # A block element inside a paragraph, which browsers (and lxml) read as closing it
+    '<p>Opening words of the lead<div class="hatnote">See also: Other</div> and the tail of the sentence.</p>',
+    # Unclosed paragraphs and inline elements
+    "<p>First paragraph without an end tag<p>Second one with <b>bold<p>text</b> across paragraphs</p>",
+    # A paragraph inside a list item, and a stray end tag
+    "<ul><li>Item<p>Paragraph inside a list item</p></ul></span><p>After the list</p>",
+]
+
+
+def page(body: str) -> str:
+    return f'<html><body><h1 id="firstHeading">Malformed</h1><div id="mw-content-text">{body}</div></body></html>'
+
+
+def extracted(engine: str, html: str):
+    found = EXTRACTORS[engine](html)
+    return found.title, found.paragraphs, found.sections, found.links
+
+
+@pytest.mark.parametrize("engine", sorted(EXTRACTORS))
+def test_engines_agree_on_article_markup(engine):
+    for seed in range(3):
+        html = make_article_html(f"Parity {seed}", sections=6, seed=seed)
+        assert extracted(engine, html) == extracted("bs4", html)
+
+
+@pytest.mark.parametrize("body", MALFORMED_PAGES)
+def test_default_engine_matches_bs4_on_malformed_markup(body):
+    html = page(body)
+    default = resolve_engine(scraper.SCRAPER_ENGINE)
+    assert extracted(default, html) == extracted("bs4", html)
+
+
+def test_default_engine_keeps_text_after_a_nested_block():
+    html = page(MALFORMED_PAGES[0])
+    assert "tail of the sentence" in " ".join(EXTRACTORS[resolve_engine("auto")](html).paragraphs)
+
+
+def test_article_fields():
+    article = parse_wikipedia_html(make_article_html("Fields", sections=4))
+    assert article["title"] == "Fields"
+    assert article["content"]
+    assert article["sections"] and all("paragraphs" in section for section in article["sections"])
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        resolve_engine("regex")
@@ -0,0 +1,111 @@
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import migrate_storage
+import search
+from database import AsyncSessionLocal, ensure_schema
+from fake_llm import make_fake_quiz
+from quiz_cache import content_hash
+from storage import new_quiz_row, save_quiz
+
+
+def word() -> str:
+    """A word no other quiz contains"""
+    return "w" + uuid.uuid4().hex[:12]
+
+
+def save(run, title: str, content: str = "Article text.", summary: str = None, question: str = None) -> int:
+    quiz = make_fake_quiz(title)
+    if summary:
+        quiz.summary = summary
+    if question:
+        quiz.questions[0].question = question
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            row = await save_quiz(db, f"https://en.wikipedia.org/wiki/{uuid.uuid4().hex}", uuid.uuid4().hex,
+                                  content_hash(content), title, content, quiz)
+            await db.commit()
+            return row.id
+    return run(scenario())
+
+
+def find(run, client, q: str, **params):
+    response = run(client.get("/search", params=dict(params, q=q)))
+    assert response.status_code == 200
+    return response
+
+
+def titles(response) -> list:
+    return [item["title"] for item in response.json()]
+
+
+def test_finds_every_indexed_field(run, client):
+    term = word()
+    save(run, f"Title {term}")
+    save(run, "Summary", summary=f"About {term}.")
+    save(run, "Question", question=f"What is {term}?")
+    save(run, "Content", content=f"The article mentions {term} once.")
+    # Title matches rank highest and article text lowest
+    assert titles(find(run, client, term)) == [f"Title {term}", "Summary", "Question", "Content"]
+
+
+def test_every_word_must_match_after_stemming(run, client):
+    term = word()
+    save(run, "Both", content=f"{term} painters were painting.")
+    save(run, "One", content=f"{term} alone.")
+    assert titles(find(run, client, f"{term} painted")) == ["Both"]
+
+
+def test_pages(run, client):
+    term = word()
+    for i in range(5):
+        save(run, f"Page {i}", content=f"{term}.")
+    first = find(run, client, term, limit=3)
+    assert first.headers["X-Next-Offset"] == "3"
+    second = find(run, client, term, limit=3, offset=3)
+    assert "X-Next-Offset" not in second.headers
+    assert sorted(titles(first) + titles(second)) == [f"Page {i}" for i in range(5)]
+
+
+def test_query_operators_are_plain_words(run, client):
+    term = word()
+    save(run, "Operators", content=f"{term} near other words.")
+    assert titles(find(run, client, f'{term} OR "NEAR" -x*')) == []
+    assert titles(find(run, client, f"{term}*")) == ["Operators"]
+    assert run(client.get("/search", params={"q": "?!"})).status_code == 400
+
+
+def test_batch_saved_quizzes_are_indexed(run, client, unique):
+    urls = [{"url": f"https://en.wikipedia.org/wiki/{unique}_{i}"} for i in range(2)]
+    run(client.post("/generate_quiz/batch", json=urls))
+    title = unique.replace("_", " ")
+    assert sorted(titles(find(run, client, title))) == [f"{title} 0", f"{title} 1"]
+
+
+def test_migration_indexes_older_quizzes(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    with engine.begin() as conn:
+        ensure_schema(conn)
+    sessions = sessionmaker(bind=engine)
+    monkeypatch.setattr(migrate_storage, "engine", engine)
+    monkeypatch.setattr(migrate_storage, "SessionLocal", sessions)
+    term = word()
+    with sessions() as db:
+        db.add(new_quiz_row("url", "key", "digest", f"Old {term}", "Old article.", make_fake_quiz(f"Old {term}")))
+        db.commit()
+
+    def search_ids():
+        with engine.connect() as conn:
+            return conn.exec_driver_sql(
+                "SELECT rowid FROM quiz_search WHERE quiz_search MATCH ?", (search.match_query("sqlite", term),)
+            ).fetchall()
+
+    assert search_ids() == []
+    assert migrate_storage.index_search(batch_size=10) == 1
+    assert len(search_ids()) == 1
+    # Quizzes already indexed are left alone
+    assert migrate_storage.index_search(batch_size=10) == 0
+    engine.dispose()
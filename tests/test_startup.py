@@ -0,0 +1,96 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from llm_quiz_generator_simple import LLMQuizGenerator
+
+NAMES = ["best", "good", "fallback"]
+
+
+class Reply:
+    text = "Hello"
+
+
+class ProbedModel:
+    def __init__(self, name: str, latency: float, works: bool):
+        self.name, self.latency, self.works = name, latency, works
+        self.probes = 0
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        self.probes += 1
+        await asyncio.sleep(self.latency)
+        if not self.works:
+            raise RuntimeError(f"{self.name} is unavailable")
+        return Reply()
+
+
+class FakeGenai:
+    """Stands in for the google.generativeai module, handing out scripted models by name"""
+
+    def __init__(self, **models: ProbedModel):
+        self.models = models
+
+    def GenerativeModel(self, name: str) -> ProbedModel:
+        return self.models[name]
+
+
+def make_generator(tmp_path, **kwargs) -> LLMQuizGenerator:
+    return LLMQuizGenerator(model_names=NAMES, cache_path=str(tmp_path / "model.json"), **kwargs)
+
+
+def test_construction_makes_no_calls(tmp_path):
+    generator = make_generator(tmp_path)
+    assert generator.model is None
+    assert not (tmp_path / "model.json").exists()
+
+
+def test_probes_run_concurrently_and_prefer_the_first_working_model(run, tmp_path):
+    genai = FakeGenai(best=ProbedModel("best", 0.1, works=False),
+                      good=ProbedModel("good", 0.1, works=True),
+                      fallback=ProbedModel("fallback", 0.01, works=True))
+    generator = make_generator(tmp_path)
+    started = time.monotonic()
+    assert run(generator._resolve_name(genai)) == "good"
+    assert time.monotonic() - started < 0.2
+    assert all(model.probes == 1 for model in genai.models.values())
+    assert json.loads((tmp_path / "model.json").read_text())["model"] == "good"
+
+
+def test_a_hung_model_times_out(run, tmp_path):
+    genai = FakeGenai(best=ProbedModel("best", 10, works=True),
+                      good=ProbedModel("good", 0.01, works=True),
+                      fallback=ProbedModel("fallback", 0.01, works=True))
+    assert run(make_generator(tmp_path, probe_timeout=0.05)._resolve_name(genai)) == "good"
+
+
+def test_cached_choice_skips_the_probes(run, tmp_path):
+    genai = FakeGenai(**{name: ProbedModel(name, 0.01, works=True) for name in NAMES})
+    (tmp_path / "model.json").write_text(json.dumps({"model": "fallback", "resolved_at": time.time()}))
+    assert run(make_generator(tmp_path)._resolve_name(genai)) == "fallback"
+    assert all(model.probes == 0 for model in genai.models.values())
+
+
+@pytest.mark.parametrize("cached", [
+    {"model": "fallback", "resolved_at": 0},  # expired
+    {"model": "retired", "resolved_at": time.time()},  # no longer a candidate
+])
+def test_stale_cached_choice_is_probed_again(run, tmp_path, cached):
+    genai = FakeGenai(**{name: ProbedModel(name, 0.01, works=True) for name in NAMES})
+    (tmp_path / "model.json").write_text(json.dumps(cached))
+    assert run(make_generator(tmp_path)._resolve_name(genai)) == "best"
+
+
+def test_no_working_model(run, tmp_path):
+    genai = FakeGenai(**{name: ProbedModel(name, 0.01, works=False) for name in NAMES})
+    with pytest.raises(RuntimeError):
+        run(make_generator(tmp_path)._resolve_name(genai))
+    assert not (tmp_path / "model.json").exists()
+
+
+def test_missing_api_key_fails_on_first_use_only(run, tmp_path, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    generator = make_generator(tmp_path)
+    with pytest.raises(RuntimeError, match="GEMINI_API_KEY"):
+        run(generator.get_model())
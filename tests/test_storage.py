@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+import migrate_storage
+import storage
+from database import Article, AsyncSessionLocal, Quiz, ensure_schema
+from fake_llm import make_fake_quiz
+from quiz_cache import content_hash
+from scraper import parse_wikipedia_html
+from storage import load_article, load_quiz, new_quiz_row, save_quiz
+from tests.fakes import make_article_html
+
+FORMATS = ["text", "zlib", pytest.param("zstd", marks=pytest.mark.skipif(
+    storage.zstandard is None, reason="zstandard is not installed"))]
+
+
+def article(title: str) -> str:
+    return parse_wikipedia_html(make_article_html(title, sections=3))["content"]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip(run, database, unique, fmt):
+    content, quiz = article(unique), make_fake_quiz(unique)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            saved = await save_quiz(db, f"https://en.wikipedia.org/wiki/{unique}", unique, content_hash(content),
+                                    unique, content, quiz, fmt=fmt)
+            await db.commit()
+            row = await db.get(Quiz, saved.id)
+            return row, await load_article(db, content_hash(content))
+
+    row, stored_article = run(scenario())
+    assert row.storage_format == fmt
+    assert load_quiz(row) == quiz
+    assert stored_article == content
+
+
+def test_compressed_rows_are_smaller():
+    content, quiz = article("Compressed"), make_fake_quiz("Compressed", 10)
+    text = new_quiz_row("url", "key", "digest", "Compressed", content, quiz, fmt="text")
+    compressed = new_quiz_row("url", "key", "digest", "Compressed", content, quiz, fmt="zlib")
+    assert len(compressed.quiz_blob) < len(text.full_quiz_data) / 2
+    assert len(storage.article_values("digest", content, "zlib")["content"]) < len(content) / 2
+
+
+def test_quizzes_of_one_article_share_its_row(run, database, unique):
+    content = article(unique)
+    digest = content_hash(content)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            for i in range(3):
+                await save_quiz(db, f"https://en.wikipedia.org/wiki/{unique}_{i}", f"{unique}_{i}", digest,
+                                unique, content, make_fake_quiz(unique), fmt="zlib")
+            await db.commit()
+            return await db.scalar(select(func.count()).select_from(Article).where(Article.content_hash == digest))
+
+    assert run(scenario()) == 1
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        storage.check_format("bz2")
+
+
+def test_migration_between_formats(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    with engine.begin() as conn:
+        ensure_schema(conn)
+    sessions = sessionmaker(bind=engine)
+    monkeypatch.setattr(migrate_storage, "SessionLocal", sessions)
+    quizzes = {f"Article {i}": make_fake_quiz(f"Article {i}") for i in range(5)}
+    with sessions() as db:
+        for title, quiz in quizzes.items():
+            content = article(title)
+            db.add(new_quiz_row("url", title, content_hash(content), title, content, quiz, fmt="text"))
+        db.commit()
+
+    assert migrate_storage.migrate("zlib", batch_size=2, dry_run=False)["quizzes"] == 5
+    with sessions() as db:
+        rows = db.scalars(select(Quiz)).all()
+        assert {row.storage_format for row in rows} == {"zlib"}
+        assert {row.title: load_quiz(row) for row in rows} == quizzes
+        assert all(row.scraped_content is None and migrate_storage.article_content(db, row) for row in rows)
+
+    assert migrate_storage.migrate("text", batch_size=2, dry_run=False)["quizzes"] == 5
+    with sessions() as db:
+        rows = db.scalars(select(Quiz)).all()
+        assert {row.storage_format for row in rows} == {"text"}
+        assert {row.title: load_quiz(row) for row in rows} == quizzes
+        assert all(row.scraped_content == article(row.title) for row in rows)
+    engine.dispose()
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from fake_llm import make_fake_quiz
+from json_stream import stream_quiz_events
+from models import QuizOutput
+
+
+def ndjson(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_stream_sends_stages_questions_then_the_quiz(run, client, generator, unique):
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+    response = run(client.post("/generate_quiz/stream", json={"url": url}))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = ndjson(response)
+    names = [event["event"] for event in events]
+
+    assert names[:2] == ["stage", "stage"]
+    assert [event["data"] for event in events[:2]] == ["scraping", "generating"]
+    assert names[-1] == "quiz"
+    # Every question arrives on its own before the quiz that contains them
+    quiz = events[-1]["data"]
+    assert [event["data"] for event in events if event["event"] == "question"] == quiz["questions"]
+    assert names.index("question") < names.index("quiz")
+
+    # The streamed quiz was saved
+    assert run(client.post("/generate_quiz", json={"url": url})).json() == quiz
+    assert generator.calls == 1
+
+
+def test_cached_quiz_is_replayed(run, client, generator, unique):
+    url = f"https://en.wikipedia.org/wiki/{unique}"
+    quiz = run(client.post("/generate_quiz", json={"url": url})).json()
+    events = ndjson(run(client.post("/generate_quiz/stream", json={"url": url})))
+    assert "stage" not in [event["event"] for event in events]
+    assert events[-1] == {"event": "quiz", "data": quiz}
+    assert generator.calls == 1
+
+
+def test_server_sent_events(run, client, unique):
+    response = run(client.post("/generate_quiz/stream", params={"format": "sse"},
+                               json={"url": f"https://en.wikipedia.org/wiki/{unique}"}))
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = response.text.strip().split("\n\n")
+    assert blocks[0] == 'event: stage\ndata: "scraping"'
+    assert blocks[-1].startswith("event: quiz\ndata: {")
+
+
+def test_errors_arrive_as_events(run, client, generator):
+    events = ndjson(run(client.post("/generate_quiz/stream", json={"url": "https://example.com/wiki/Cat"})))
+    assert events[-1]["event"] == "error" and events[-1]["data"]["status"] == 400
+    assert generator.calls == 0
+
+
+def test_parser_is_independent_of_chunk_boundaries(run):
+    quiz = make_fake_quiz("Chunked").model_dump()
+    text = "Here is the quiz:\n```json\n" + json.dumps(quiz, indent=2) + "\n```"
+
+    async def events(size: int) -> list:
+        async def chunks():
+            for start in range(0, len(text), size):
+                yield text[start:start + size]
+        return [event async for event in stream_quiz_events(chunks())]
+
+    whole = run(events(len(text)))
+    assert whole[-1] == ("quiz", QuizOutput(**quiz))
+    for size in (1, 7, 64):
+        assert run(events(size)) == whole
+
+
+def test_truncated_response_is_an_error(run):
+    text = json.dumps(make_fake_quiz("Truncated").model_dump())[:-40]
+
+    async def chunks():
+        yield text
+
+    async def consume():
+        return [event async for event in stream_quiz_events(chunks())]
+
+    with pytest.raises(ValueError):
+        run(consume())
@@ -0,0 +1,121 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import AsyncSessionLocal, Usage
+
+logger = logging.getLogger(__name__)
+
+# Usage recording configuration (override through environment variables)
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "10"))
+
+COUNTERS = ("requests", "rejected", "llm_calls", "llm_tokens")
+
+# (client, endpoint) of the request being served. Tasks inherit it, so LLM
+# calls made on a request's behalf are charged to that client; a coalesced
+# generation is charged to the request that started it.
+current_client: contextvars.ContextVar[Optional[Tuple[str, str]]] = contextvars.ContextVar(
+    "current_client", default=None
+)
+
+
+class UsageRecorder:
+    """
+    Per-client usage counters, kept in memory and added to the usage table
+    every USAGE_FLUSH_SECONDS, so counting a request never costs a write.
+    """
+
+    def __init__(self, flush_interval: float = USAGE_FLUSH_SECONDS, session_factory=AsyncSessionLocal):
+        self.flush_interval = flush_interval
+        self._session_factory = session_factory
+        self._pending = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        self._lock = threading.Lock()
+        self._task = None
+
+    def record(self, client: str, endpoint: str, **counts):
+        day = datetime.now(timezone.utc).date()
+        with self._lock:
+            row = self._pending[(client, day, endpoint)]
+            for name, value in counts.items():
+                row[name] += value
+
+    def record_current(self, **counts):
+        """Charge the client of the current request, if there is one (job workers have none)"""
+        owner = current_client.get()
+        if owner is not None:
+            self.record(*owner, **counts)
+
+    async def start(self):
+        if self._task is None and self.flush_interval > 0:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Usage flush failed, will retry: %s", e)
+
+    async def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        if not pending:
+            return 0
+        rows = [dict(client=client, day=day, endpoint=endpoint, **counts)
+                for (client, day, endpoint), counts in pending.items()]
+        try:
+            async with self._session_factory() as db:
+                dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+                stmt = dialect.insert(Usage).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["client", "day", "endpoint"],
+                    set_={name: getattr(Usage, name) + getattr(stmt.excluded, name) for name in COUNTERS},
+                )
+                await db.execute(stmt)
+                await db.commit()
+        except Exception:
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                for key, counts in pending.items():
+                    for name, value in counts.items():
+                        self._pending[key][name] += value
+            raise
+        return len(rows)
+
+    async def for_client(self, client: str, days: int = 7) -> list:
+        """The client's daily rows for the last `days` days, including counts not flushed yet"""
+        since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+        async with self._session_factory() as db:
+            result = await db.execute(select(Usage).where(Usage.client == client, Usage.day >= since))
+            totals = {
+                (row.day, row.endpoint): {name: getattr(row, name) or 0 for name in COUNTERS}
+                for row in result.scalars()
+            }
+        with self._lock:
+            for (owner, day, endpoint), counts in self._pending.items():
+                if owner == client and day >= since:
+                    row = totals.setdefault((day, endpoint), dict.fromkeys(COUNTERS, 0))
+                    for name, value in counts.items():
+                        row[name] += value
+        return [
+            dict(day=day.isoformat(), endpoint=endpoint, **counts)
+            for (day, endpoint), counts in sorted(totals.items(), reverse=True)
+        ]
+
+usage_recorder = UsageRecorder()
@@ -0,0 +1,55 @@
+"""
+Generate and store quizzes for a list of articles ahead of the requests for
+them, e.g. today's trending pages. URLs already in the store are skipped,
+and LLM calls count against the prefetch daily budget.
+
+    python warm_cache.py trending.txt                       # one URL per line, # comments
+    python warm_cache.py trending.txt --concurrency 4 --daily-tokens 200000
+"""
+import argparse
+import asyncio
+
+from database import init_db
+from fetcher import wikipedia_fetcher
+from prefetch import Prefetcher, PREFETCH_DAILY_TOKENS
+from usage import usage_recorder
+
+
+def read_urls(path: str) -> list:
+    urls = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line and line not in urls:
+                urls.append(line)
+    return urls
+
+
+async def warm(args) -> dict:
+    await init_db()
+    prefetcher = Prefetcher(enabled=False, daily_tokens=args.daily_tokens)
+    try:
+        return await prefetcher.warm(read_urls(args.urls), args.concurrency)
+    finally:
+        # Record what was spent, so the budget holds across runs and the server
+        await usage_recorder.stop()
+        await wikipedia_fetcher.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the quiz store from a file of Wikipedia URLs")
+    parser.add_argument("urls", help="File with one article URL per line")
+    parser.add_argument("--concurrency", type=int, default=2, help="Quizzes generated at a time")
+    parser.add_argument("--daily-tokens", type=int, default=PREFETCH_DAILY_TOKENS,
+                        help="LLM tokens prefetching may spend today (0 = no limit)")
+    args = parser.parse_args()
+
+    outcomes = asyncio.run(warm(args))
+    print(f"✅ Warmed {sum(outcomes.values())} URLs: "
+          + ", ".join(f"{count} {outcome.replace('_', ' ')}" for outcome, count in sorted(outcomes.items())))
+    if outcomes.get("over_budget"):
+        print(f"⚠️ The daily budget of {args.daily_tokens} LLM tokens ran out; run again tomorrow or raise --daily-tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+MediaWiki markup stripped down to what the HTML scraper engines extract
+from a rendered page: prose paragraphs, the heading above each one and the
+articles they link to. Templates, tables, references, files, categories
+and lists are dropped, as the rendered-page engines drop infoboxes,
+navboxes, reference lists and <li> items.
+"""
+import html
+import re
+from typing import List
+
+from scraper import ExtractedPage, _subsection
+
+COMMENT_RE = re.compile(r'<!--.*?(?:-->|$)', re.S)
+REF_RE = re.compile(r'<ref\b[^>]*?/>|<ref\b[^>]*>.*?</ref\s*>', re.S | re.I)
+# Elements whose content is not prose
+DROPPED_ELEMENT_RE = re.compile(
+    r'<(gallery|math|chem|score|syntaxhighlight|source|pre|timeline|graph|mapframe|imagemap|references)\b'
+    r'[^>]*>.*?</\1\s*>',
+    re.S | re.I,
+)
+# Templates and parser functions ({{...}}) and tables ({| ... |} at line starts)
+# nest ("|}}" on its own line closes a template, not a table)
+NESTED_TOKEN_RE = re.compile(r'\{\{|\}\}|^[ \t]*:*\{\||^[ \t]*\|\}(?!\})', re.M)
+LINK_TOKEN_RE = re.compile(r'\[\[|\]\]')
+# Links that render as something other than inline text: files, categories, interlanguage links
+HIDDEN_LINK_RE = re.compile(r'\[\[\s*(?:file|image|media|category|[a-z]{2,3}(?:-[a-z]+)?)\s*:', re.I)
+WIKI_LINK_RE = re.compile(r'\[\[([^\[\]|]*)(?:\|([^\[\]]*))?\]\]([a-z]*)')
+EXTERNAL_LINK_RE = re.compile(r'\[(?:https?:)?//[^\s\]]*(?:\s+([^\]]*))?\]')
+TAG_RE = re.compile(r'</?[a-zA-Z][^>]*>')
+HEADING_RE = re.compile(r'^(={2,6})\s*(.*?)\s*\1\s*$')
+EMPHASIS_RE = re.compile(r"'{2,}")
+MAGIC_WORD_RE = re.compile(r'__[A-Z]+__')
+# Lists, indents, definition lists, table rows and rules are not paragraphs
+NON_PROSE_PREFIXES = ('*', '#', ':', ';', '|', '!', '----')
+
+
+def _drop_nested(text: str, token_re: re.Pattern, opens) -> str:
+    """Remove every outermost span between an opening and its matching closing token"""
+    parts = []
+    depth = 0
+    start = 0
+    for match in token_re.finditer(text):
+        if opens(match):
+            if depth == 0:
+                parts.append(text[start:match.start()])
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                start = match.end()
+    if depth == 0:
+        parts.append(text[start:])
+    return ''.join(parts)
+
+
+def _drop_hidden_links(text: str) -> str:
+    """Remove file, category and interlanguage links, whose captions can hold links of their own"""
+    parts = []
+    depth = 0
+    hidden_depth = None
+    start = 0
+    for match in LINK_TOKEN_RE.finditer(text):
+        if match.group() == '[[':
+            depth += 1
+            if hidden_depth is None and HIDDEN_LINK_RE.match(text, match.start()):
+                parts.append(text[start:match.start()])
+                hidden_depth = depth
+        elif depth:
+            if depth == hidden_depth:
+                hidden_depth = None
+                start = match.end()
+            depth -= 1
+    if hidden_depth is None:
+        parts.append(text[start:])
+    return ''.join(parts)
+
+
+def _inline_text(text: str, links: List[str]) -> str:
+    """Rendered text of a line of markup; appends the /wiki/ href of each link to links"""
+
+    def link(match):
+        target, label, trail = match.group(1).strip(), match.group(2), match.group(3)
+        if target and not target.startswith('#'):
+            # Titles are case-sensitive except for the first letter
+            href = target.lstrip(':').replace(' ', '_')
+            links.append('/wiki/' + href[:1].upper() + href[1:])
+        return (label if label else target.lstrip(':')) + trail
+
+    text = WIKI_LINK_RE.sub(link, text)
+    text = EXTERNAL_LINK_RE.sub(lambda match: match.group(1) or '', text)
+    text = TAG_RE.sub('', text)
+    text = EMPHASIS_RE.sub('', text)
+    return html.unescape(text)
+
+
+def extract_wikitext(title: str, text: str) -> ExtractedPage:
+    """The ExtractedPage a rendered-HTML engine would produce for this article's markup"""
+    text = COMMENT_RE.sub('', text)
+    text = REF_RE.sub('', text)
+    text = DROPPED_ELEMENT_RE.sub('', text)
+    text = _drop_nested(text, NESTED_TOKEN_RE, lambda match: match.group().endswith(('{{', '{|')))
+    text = _drop_hidden_links(text)
+    text = MAGIC_WORD_RE.sub('', text)
+
+    paragraphs = []
+    sections = []
+    links = []
+    h2 = heading = ''
+    lines = []
+
+    def end_paragraph():
+        if lines:
+            paragraph = _inline_text(' '.join(lines), links)
+            if paragraph.strip():
+                paragraphs.append(paragraph)
+                sections.append(heading)
+            lines.clear()
+
+    for line in text.split('\n'):
+        stripped = line.strip()
+        match = HEADING_RE.match(stripped)
+        if match:
+            end_paragraph()
+            name = _inline_text(match.group(2), [])
+            if len(match.group(1)) == 2:
+                h2 = heading = name
+            else:
+                heading = _subsection(h2, name)
+        elif not stripped or stripped.startswith(NON_PROSE_PREFIXES):
+            end_paragraph()
+        else:
+            lines.append(stripped)
+    end_paragraph()
+
+    return ExtractedPage(
+        title=title,
+        selector='wikitext',
+        paragraphs=paragraphs,
+        sections=sections,
+        area_text=lambda: '\n'.join(paragraphs),
+        links=links,
+    )